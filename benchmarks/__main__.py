@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+
+from benchmarks.runner import THRESHOLD, compare, dump, load, run
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Time the parser, router, serializer and sender hot '
+                    'paths and compare them with a stored baseline')
+    parser.add_argument('-k', '--filter',
+                        help='only cases with this substring in the name')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.02,
+                        help='seconds every repeat runs for at least')
+    parser.add_argument('-o', '--output', help='save the results as JSON')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='slowdown ratio over the baseline reported as '
+                             'a regression')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat, args.min_time)
+    if args.output:
+        dump(results, args.output)
+    if args.save_baseline:
+        dump(results, args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --save-baseline')
+        return 0
+
+    regressions = 0
+    print()
+    for name, base, now, ratio, status in compare(
+            results, load(args.baseline), args.threshold):
+        base = '-' if base is None else f'{base * 1e6:.2f}'
+        ratio = '-' if ratio is None else f'{ratio:.2f}x'
+        print(f'{name:<48} {base:>12} {now * 1e6:12.2f} us {ratio:>7} '
+              f'{status}')
+        regressions += status == 'REGRESSION'
+    if regressions:
+        print(f'\n{regressions} case(s) slower than the baseline by more '
+              f'than {args.threshold:.0%}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import argparse
+import timeit
+
+from ihttpy.requests.parser import RequestParser
+from ihttpy.requests.request import Request
+
+BROWSER_GET = (
+    b'GET /pictures/2000/09/27/me.png?size=large HTTP/1.1\r\n'
+    b'Host: localhost:8000\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Cache-Control: max-age=0\r\n'
+    b'sec-ch-ua: "Chromium";v="118", "Google Chrome";v="118"\r\n'
+    b'sec-ch-ua-mobile: ?0\r\n'
+    b'sec-ch-ua-platform: "macOS"\r\n'
+    b'Upgrade-Insecure-Requests: 1\r\n'
+    b'User-Agent: Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
+    b'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 '
+    b'Safari/537.36\r\n'
+    b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,'
+    b'image/avif,image/webp,*/*;q=0.8\r\n'
+    b'Sec-Fetch-Site: none\r\n'
+    b'Sec-Fetch-Mode: navigate\r\n'
+    b'Sec-Fetch-User: ?1\r\n'
+    b'Sec-Fetch-Dest: document\r\n'
+    b'Accept-Encoding: gzip, deflate, br\r\n'
+    b'Accept-Language: en-US,en;q=0.9,ru;q=0.8\r\n'
+    b'Cookie: session=6f1c2a9d4b7e; theme=dark\r\n\r\n')
+
+JSON_POST = (
+    b'POST /post HTTP/1.1\r\n'
+    b'Host: localhost:8000\r\n'
+    b'User-Agent: curl/8.4.0\r\n'
+    b'Accept: */*\r\n'
+    b'Content-Type: application/json\r\n'
+    b'Content-Length: 58\r\n\r\n'
+    b'{"title": "Dune", "author": "Frank Herbert", "read": true}')
+
+CURL_GET = (
+    b'GET /index.html HTTP/1.1\r\n'
+    b'Host: localhost:8000\r\n'
+    b'User-Agent: curl/8.4.0\r\n'
+    b'Accept: */*\r\n\r\n')
+
+CASES = {
+    'curl_get': CURL_GET,
+    'browser_get': BROWSER_GET,
+    'json_post': JSON_POST,
+}
+
+
+def legacy(raw):
+    req = Request()
+    for line in Request.split_keep_sep(raw, b'\n'):
+        if req.dynamic_fill(line):
+            return req
+
+
+def incremental(raw):
+    return RequestParser().feed(raw)
+
+
+def incremental_chunked(raw, size=64):
+    parser = RequestParser()
+    for i in range(0, len(raw), size):
+        req = parser.feed(raw[i:i + size])
+        if req:
+            return req
+
+
+PARSERS = {
+    'legacy': legacy,
+    'incremental': incremental,
+    'incremental_chunked': incremental_chunked,
+}
+
+
+def suite():
+    cases = {}
+    for case, raw in CASES.items():
+        for name, parse in PARSERS.items():
+            cases[f'{case}.{name}'] = lambda parse=parse, raw=raw: parse(raw)
+        cases[f'{case}.split_keep_sep'] = \
+            lambda raw=raw: Request.split_keep_sep(raw, b'\n')
+    return cases
+
+
+def bench(number, repeat):
+    results = {}
+    for case, raw in CASES.items():
+        for name, parse in PARSERS.items():
+            best = min(timeit.repeat(lambda: parse(raw),
+                                     number=number, repeat=repeat))
+            results[(case, name)] = best / number
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the legacy Request.dynamic_fill parser with '
+                    'the incremental RequestParser')
+    parser.add_argument('-n', '--number', type=int, default=200)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = bench(args.number, args.repeat)
+    for case in CASES:
+        base = results[(case, 'legacy')]
+        for name in PARSERS:
+            t = results[(case, name)]
+            print(f'{case:<12} {name:<20} {t * 1e6:10.1f} us '
+                  f'{base / t:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
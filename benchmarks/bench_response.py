@@ -0,0 +1,37 @@
+from collections import OrderedDict
+
+from ihttpy.requests.response import Response
+
+HEADERS = OrderedDict([
+    ('Content-Type', 'text/html; charset=utf-8'),
+    ('Content-Length', 1024),
+    ('Last-Modified', 'Wed, 21 Oct 2015 07:28:00 GMT'),
+    ('ETag', '"5d8c72a5edda8d6a"'),
+    ('Cache-Control', 'max-age=3600'),
+    ('Accept-Ranges', 'bytes'),
+    ('Vary', 'Accept-Encoding'),
+    ('Connection', 'keep-alive'),
+])
+
+
+class NullClient:
+    # a socket that takes everything at once
+    def getpeername(self):
+        return '127.0.0.1', 50000
+
+    def send(self, data):
+        return len(data)
+
+
+def suite():
+    client = NullClient()
+    small = Response(200, 'OK', OrderedDict(HEADERS), b'x' * 1024)
+    big = Response(200, 'OK', OrderedDict(HEADERS), b'x' * 64 * 1024)
+    big.headers['Content-Length'] = len(big.body)
+    return {
+        'headers_to_str': small.headers_to_str,
+        'head_to_bytes': small.head_to_bytes,
+        'to_bytes.1k': small.to_bytes,
+        'send_response.1k': lambda: Response.send_response(client, small),
+        'send_response.64k': lambda: Response.send_response(client, big),
+    }
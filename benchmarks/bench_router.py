@@ -0,0 +1,66 @@
+import os
+import tempfile
+
+from ihttpy.requests.parser import RequestParser
+from ihttpy.routing.page import Page
+from ihttpy.routing.router import Router
+
+SIZES = (10, 100, 1000, 10000)
+DATA = tempfile.TemporaryDirectory()
+
+
+def make_rules(n):
+    # a quarter of each: literal pages, css and image templates, literal api
+    rules = {}
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            rules[f'/page{i}.html'] = os.path.join(DATA.name, 'index.html')
+        elif kind == 1:
+            rules[f'/static{i}/[name].css'] = \
+                os.path.join(DATA.name, '[name].css')
+        elif kind == 2:
+            rules[f'/api/v{i}/items'] = os.path.join(DATA.name, 'index.html')
+        else:
+            rules[f'/img{i}/[name].[ext]'] = \
+                os.path.join(DATA.name, '[name].[ext]')
+    return {key: Page(path, {}) for key, path in rules.items()}
+
+
+def request(url):
+    return RequestParser().feed(f'GET {url} HTTP/1.1\r\nHost: x\r\n\r\n'
+                                .encode())
+
+
+def suite():
+    for name in ('index.html', 'style.css'):
+        with open(os.path.join(DATA.name, name), 'w') as f:
+            f.write('body {}')
+
+    cases = {}
+    for n in SIZES:
+        rules = make_rules(n)
+        last = (n - 1) // 4 * 4
+        # the last rules of the table are the slowest to reach
+        literal = request(f'/page{last}.html')
+        template = request(f'/static{last + 1 if last + 1 < n else 1}'
+                           f'/style.css')
+
+        router = Router()
+        router.compile(rules)
+        cold = Router(cache_size=0)
+        cold.compile(rules)
+        cases[f'find_handler.{n}.literal'] = \
+            lambda r=router, req=literal, rules=rules: \
+            r.find_handler(req, rules)
+        cases[f'find_handler.{n}.template'] = \
+            lambda r=router, req=template, rules=rules: \
+            r.find_handler(req, rules)
+        cases[f'find_handler.{n}.template_uncached'] = \
+            lambda r=cold, req=template, rules=rules: \
+            r.find_handler(req, rules)
+        cases[f'get_destination.{n}'] = \
+            lambda r=router, url=template.path, rules=rules: \
+            r.get_destination(url, rules, False)
+        cases[f'compile.{n}'] = lambda rules=rules: Router().compile(rules)
+    return cases
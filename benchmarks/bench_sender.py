@@ -0,0 +1,49 @@
+import json
+import os
+import tempfile
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.requests import sender
+from ihttpy.requests.parser import RequestParser
+from ihttpy.routing.configurator import Configurator
+
+DATA = tempfile.TemporaryDirectory()
+
+
+def request(url, *headers):
+    head = '\r\n'.join((f'GET {url} HTTP/1.1', 'Host: x') + headers)
+    return RequestParser().feed(f'{head}\r\n\r\n'.encode())
+
+
+def make_server():
+    page = os.path.join(DATA.name, 'index.html')
+    with open(page, 'w') as f:
+        f.write('<p>hello</p>\n' * 200)
+    config = os.path.join(DATA.name, 'config.json')
+    with open(config, 'w') as f:
+        json.dump({'_host': '127.0.0.1', '_port': 0, 'error-pages': {},
+                   'rules': {'/[name].html': os.path.join(DATA.name,
+                                                         '[name].html')}},
+                  f)
+    return Server(Configurator(config), loglevel=LogLevel.LOGGING,
+                  cache_max_size=0)
+
+
+def suite():
+    server = make_server()
+    plain = request('/index.html')
+    gzip = request('/index.html', 'Accept-Encoding: gzip')
+
+    def miss(req):
+        server.cache.clear()
+        return sender.handle(req, server)
+
+    for req in (plain, gzip):
+        sender.handle(req, server)
+    return {
+        'handle.hit': lambda: sender.handle(plain, server),
+        'handle.hit_gzip': lambda: sender.handle(gzip, server),
+        'handle.miss': lambda: miss(plain),
+        'handle.miss_gzip': lambda: miss(gzip),
+    }
@@ -0,0 +1,79 @@
+import importlib
+import json
+import platform
+import sys
+import time
+import timeit
+
+MODULES = ('parser', 'router', 'response', 'sender')
+THRESHOLD = 0.25
+
+
+def collect(pattern=None):
+    cases = {}
+    for module in MODULES:
+        suite = importlib.import_module(f'benchmarks.bench_{module}').suite
+        for name, func in suite().items():
+            name = f'{module}.{name}'
+            if not pattern or pattern in name:
+                cases[name] = func
+    return cases
+
+
+def measure(func, repeat=5, min_time=0.02):
+    # seconds per call, the best of repeat runs of at least min_time each
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        took = timer.timeit(number)
+        if took >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(took, 1e-9)))
+    return min(timer.repeat(repeat, number)) / number
+
+
+def run(pattern=None, repeat=5, min_time=0.02, out=sys.stdout):
+    results = {}
+    for name, func in collect(pattern).items():
+        results[name] = measure(func, repeat, min_time)
+        if out:
+            out.write(f'{name:<48} {results[name] * 1e6:12.2f} us\n')
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    rows = []
+    for name, now in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append((name, None, now, None, 'new'))
+            continue
+        ratio = now / base
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((name, base, now, ratio, status))
+    return rows
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
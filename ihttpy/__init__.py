@@ -1,16 +1,21 @@
 __all__ = [
-    'request', 'response', 'methods',
+    'request', 'response', 'methods', 'parser', 'body', 'multipart', 'mime',
     'logger',
     'errors',
-    'httpserver', 'router', 'page', 'configurator',
+    'httpserver', 'asyncserver', 'router', 'page', 'configurator',
 ]
 
 from ihttpy import httpserver
+from ihttpy import asyncserver
 from ihttpy.exceptions import errors
 from ihttpy.exceptions import logger
 from ihttpy.requests import request
 from ihttpy.requests import response
 from ihttpy.requests import methods
+from ihttpy.requests import parser
+from ihttpy.requests import body
+from ihttpy.requests import multipart
+from ihttpy.requests import mime
 from ihttpy.routing import router
 from ihttpy.routing import page
 from ihttpy.routing import configurator
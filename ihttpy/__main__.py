@@ -0,0 +1,16 @@
+import argparse
+import sys
+
+from ihttpy import bench
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='ihttpy')
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench.add_parser(commands)
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import asyncio
+import inspect
+import time
+
+from ihttpy.exceptions import build_error
+from ihttpy.exceptions.errors import Errors
+from ihttpy.exceptions.logger import Logger, LogLevel
+from ihttpy.requests.body import RequestBody, AsyncBodyStream
+from ihttpy.requests.cache import ResponseCache
+from ihttpy.requests.compression import Compressor
+from ihttpy.requests.mime import MimeResolver
+from ihttpy.requests.parser import RequestParser
+from ihttpy.requests.response import FileBody, ChunkedTransfer, \
+    MultiBody
+from ihttpy.metrics import Metrics, PAGE as INTERNAL_PAGE, \
+    cache_gauges, observe_request, serve_metrics
+from ihttpy.routing.router import Router, Routes
+
+
+class AsyncServer:
+    MAX_LINE = 64 * 1024
+
+    def __init__(self, configurator=None,
+                 loglevel=LogLevel.LOGGING,
+                 cache_max_size=4e9,
+                 memory_cache_size=ResponseCache.MAX_SIZE,
+                 server_log=None,
+                 debug_log=None,
+                 is_dev=False,
+                 body_spool_size=RequestBody.SPOOL_MAX_SIZE,
+                 executor=None,
+                 keep_alive_timeout=15,
+                 max_keep_alive_requests=100,
+                 compress_level=Compressor.LEVEL,
+                 compress_min_size=Compressor.MIN_SIZE,
+                 compress_types=Compressor.TYPES,
+                 metrics=True,
+                 metrics_path=None):
+
+        Logger.configure(level=loglevel, info_path=server_log,
+                         debug_path=debug_log)
+
+        Logger.debug_info(f'Running asyncio backend in '
+                          f'{"DEVELOPMENT" if is_dev else "PRODUCTION"} mode')
+
+        self.configurator = configurator
+
+        rules = self.configurator._get_rules()
+        router = Router()
+        router.load_handlers(rules)
+        router.compile(rules)
+        self.routes = Routes(getattr(self.configurator, 'config', None),
+                             rules, router)
+
+        self.cache = ResponseCache(memory_cache_size, cache_max_size)
+        self.mime = MimeResolver()
+        self.compressor = None
+        if compress_level:
+            self.compressor = Compressor(compress_level, compress_min_size,
+                                         compress_types)
+
+        self._host = self.configurator.get('_host')
+        self._port = self.configurator.get('_port')
+        self.address = (self._host, self._port)
+        self.body_spool_size = body_spool_size
+        self.executor = executor
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.loop = None
+        self.server = None
+        self.connections = 0
+        self.in_flight = 0
+        self.metrics = None
+        if metrics:
+            self.metrics = Metrics()
+            self.metrics.gauge('open_connections', 'Open client connections',
+                               lambda: self.connections)
+            self.metrics.gauge('in_flight_requests',
+                               'Requests being handled',
+                               lambda: self.in_flight)
+            cache_gauges(self.metrics, self.cache)
+        self.metrics_path = metrics_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type and exc_type is not KeyboardInterrupt:
+            Logger.exception(f'server is DOWN because of exception ')
+        else:
+            Logger.debug_info('server is DOWN with no exceptions')
+        return True
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(
+            self._serve_connection, self._host, self._port,
+            reuse_address=True)
+        Logger.debug_info(f'server is UP on {self._host}:{self._port}')
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def shutdown(self):
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    async def _serve_connection(self, reader, writer):
+        parser = RequestParser(self.body_spool_size, self._streams_body)
+        ip = writer.get_extra_info('peername')
+        Logger.debug_info('Connected %s', ip)
+        served = 0
+        self.connections += 1
+        try:
+            while True:
+                req = None
+                try:
+                    req = parser.feed()
+                    while not req:
+                        data = await asyncio.wait_for(
+                            reader.read(self.MAX_LINE),
+                            self.keep_alive_timeout)
+                        if not data:
+                            return
+                        if self.metrics:
+                            self.metrics.bytes_in += len(data)
+                        req = parser.feed(data)
+                    if parser.streaming:
+                        req.body = AsyncBodyStream(reader, parser)
+                    res = await self.serve_client(req, ip)
+                    served += 1
+                    if self.max_keep_alive_requests and \
+                            served >= self.max_keep_alive_requests:
+                        res.headers['Connection'] = 'close'
+                except asyncio.TimeoutError:
+                    Logger.debug_info('Keep-alive expired for %s', ip)
+                    return
+                except (ConnectionError, asyncio.CancelledError):
+                    return
+                except Exception as e:
+                    Logger.exception('Client handling failed')
+                    responses = build_error(e, self.configurator)
+                    if req:
+                        observe_request(self, req, responses[0].status)
+                    for res in responses:
+                        await self.send(writer, res)
+                    if not req:
+                        return
+                else:
+                    await self.send(writer, res)
+                if 'close' in (req.headers.get('Connection'),
+                               res.headers.get('Connection')):
+                    return
+                if parser.streaming:
+                    # whatever the handler left unread is skipped
+                    await asyncio.wait_for(req.body.discard(),
+                                           self.keep_alive_timeout)
+        except ConnectionError:
+            Logger.debug_info('Disconnected %s', ip)
+        except asyncio.TimeoutError:
+            Logger.debug_info('Unread body of %s timed out', ip)
+        except Exception:
+            # the head is already sent, the stream can only be cut short
+            Logger.exception('Response stream failed')
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve_client(self, req, ip=None):
+        Logger.debug_info('Request %s', req)
+        if self.metrics:
+            req.started = time.perf_counter()
+        if req.insufficient():
+            raise Errors.MALFORMED_REQ
+        self.in_flight += 1
+        try:
+            res = await self.handle_req(req)
+        finally:
+            self.in_flight -= 1
+        if self.compressor and res.is_stream():
+            # chunks are compressed one at a time while they are sent
+            res = self.compressor.apply(req, res)
+        elif self.compressor:
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(
+                self.executor, self.compressor.apply, req, res)
+        if res.is_stream():
+            res.start_stream(chunked=req.version != 'HTTP/1.0')
+        Logger.access(req.method, req.path, res.status, ip)
+        # last, anything failing before is observed by the error path
+        observe_request(self, req, res.status)
+        return res
+
+    def _streams_body(self, req):
+        try:
+            routes = self.routes
+            page, handle = routes.router.find_route(req, routes.rules)
+        except Exception:
+            return False
+        # a plain inline handler would block the loop on the reads
+        return page.stream_body and (
+            inspect.iscoroutinefunction(handle) or not page.inline)
+
+    @property
+    def router(self):
+        return self.routes.router
+
+    def find_route(self, req):
+        if self.metrics and req.path == self.metrics_path:
+            return INTERNAL_PAGE, serve_metrics
+        routes = req.routes = self.routes
+        page, handle = routes.router.find_route(req, routes.rules)
+        if not handle:
+            Logger.error('Handler not found', extra={'url': req.path})
+            raise Errors.NO_HANDLER
+        return page, handle
+
+    async def handle_req(self, req):
+        page, handle = self.find_route(req)
+        if inspect.iscoroutinefunction(handle) or page.inline:
+            res = handle(req, self)
+        else:
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(self.executor, handle, req, self)
+        if inspect.isawaitable(res):
+            res = await res
+        return res
+
+    async def send(self, writer, res):
+        if isinstance(res.body, (FileBody, MultiBody)):
+            self._write(writer, res.head_to_bytes())
+            parts = res.body.parts if isinstance(res.body, MultiBody) \
+                else [res.body]
+            for part in parts:
+                if isinstance(part, FileBody):
+                    await writer.drain()
+                    with open(part.path, 'rb') as file:
+                        sent = await asyncio.get_running_loop().sendfile(
+                            writer.transport, file, part.offset, part.count)
+                    if self.metrics:
+                        self.metrics.bytes_out += sent
+                else:
+                    self._write(writer, part)
+            await writer.drain()
+        elif res.is_stream():
+            self._write(writer, res.head_to_bytes())
+            await writer.drain()
+            chunked = res.headers.get('Transfer-Encoding') == 'chunked'
+            async for data in self._iterate(res.body):
+                if data:
+                    self._write(writer, ChunkedTransfer.frame(data, chunked))
+                    # waits while the transport buffer is over its limit
+                    await writer.drain()
+            if chunked:
+                self._write(writer, ChunkedTransfer.LAST_CHUNK)
+                await writer.drain()
+        else:
+            self._write(writer, res.to_bytes())
+            await writer.drain()
+
+    def _write(self, writer, data):
+        if self.metrics:
+            self.metrics.bytes_out += len(data)
+        writer.write(data)
+
+    @staticmethod
+    async def _iterate(body):
+        if hasattr(body, '__aiter__'):
+            async for data in body:
+                yield data
+        else:
+            for data in body:
+                yield data
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import multiprocessing
+import random
+import sys
+import time
+from array import array
+from collections import deque
+from urllib.parse import urlsplit
+
+PERCENTILES = (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9))
+BOUNDARY = 'ihttpybenchboundary'
+
+
+class RequestSpec:
+    # "METHOD PATH [weight=N] [body=SIZE] [upload=SIZE]"
+    def __init__(self, method='GET', path='/', weight=1, body=None,
+                 content_type=None):
+        self.method = method.upper()
+        self.path = path
+        self.weight = weight
+        self.body = body
+        self.content_type = content_type
+
+    @staticmethod
+    def parse(spec):
+        tokens = spec.split()
+        if len(tokens) < 2:
+            raise ValueError(f'Expected "METHOD PATH [key=value ...]", '
+                             f'got {spec!r}')
+        req = RequestSpec(tokens[0], tokens[1])
+        for option in tokens[2:]:
+            key, _, value = option.partition('=')
+            if key == 'weight':
+                req.weight = float(value)
+            elif key == 'body':
+                req.body = payload(int(value))
+                req.content_type = 'application/octet-stream'
+            elif key == 'upload':
+                req.body = multipart(int(value))
+                req.content_type = f'multipart/form-data; boundary={BOUNDARY}'
+            else:
+                raise ValueError(f'Unknown request option {key!r}')
+        return req
+
+    def to_bytes(self, host, keep_alive=True):
+        lines = [f'{self.method} {self.path} HTTP/1.1', f'Host: {host}',
+                 'User-Agent: ihttpy-bench',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        if self.body is not None:
+            lines.append(f'Content-Type: {self.content_type}')
+            lines.append(f'Content-Length: {len(self.body)}')
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        return head + (self.body or b'')
+
+
+def payload(size):
+    # the same bytes on every run, compressible about as much as a photo
+    rng = random.Random(size)
+    return rng.getrandbits(8 * size).to_bytes(size, 'little') if size \
+        else b''
+
+
+def multipart(size):
+    return (f'--{BOUNDARY}\r\n'
+            f'Content-Disposition: form-data; name="file"; '
+            f'filename="bench.bin"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + \
+        payload(size) + f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = array('d')
+        self.statuses = {}
+        self.errors = {}
+        self.bytes_received = 0
+        self.connections = 0
+
+    def record(self, status, latency, size):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_received += size
+        if status >= 400:
+            self.error('status')
+
+    def error(self, kind, n=1):
+        self.errors[kind] = self.errors.get(kind, 0) + n
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        for status, n in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + n
+        for kind, n in other.errors.items():
+            self.error(kind, n)
+        self.bytes_received += other.bytes_received
+        self.connections += other.connections
+
+
+def percentile(ordered, p):
+    # nearest rank
+    if not ordered:
+        return None
+    rank = max(int(len(ordered) * p / 100 + 0.5) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+async def read_response(reader, method):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    version, status = lines[0].split(b' ', 2)[:2]
+    status = int(status)
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower()] = value.strip().lower()
+    size = len(head)
+    close = headers.get(b'connection') == b'close' or \
+        (version == b'HTTP/1.0' and headers.get(b'connection') !=
+         b'keep-alive')
+    if method == 'HEAD' or status in (204, 304) or status < 200:
+        return status, close, size
+    if b'chunked' in headers.get(b'transfer-encoding', b''):
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            size += len(line)
+            n = int(line.split(b';')[0], 16)
+            if not n:
+                break
+            size += len(await reader.readexactly(n + 2))
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            size += len(line)
+            if line == b'\r\n':
+                break
+    elif b'content-length' in headers:
+        size += len(await reader.readexactly(int(headers[b'content-length'])))
+    else:
+        size += len(await reader.read())
+        close = True
+    return status, close, size
+
+
+class Client:
+    def __init__(self, host, port, specs, pipeline=1, keep_alive=True,
+                 timeout=10):
+        self.host = host
+        self.port = port
+        self.specs = specs
+        self.weights = [spec.weight for spec in specs]
+        authority = host if port == 80 else f'{host}:{port}'
+        self.payloads = [spec.to_bytes(authority, keep_alive)
+                         for spec in specs]
+        self.pipeline = pipeline if keep_alive else 1
+        self.timeout = timeout
+
+    async def run(self, duration, warmup, seed):
+        stats = Stats()
+        start = time.perf_counter()
+        measured = start + warmup
+        deadline = measured + duration
+        rng = random.Random(seed)
+        pending = deque()
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            if writer is None:
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port),
+                        self.timeout)
+                    stats.connections += 1
+                except (OSError, asyncio.TimeoutError):
+                    stats.error('connect')
+                    await asyncio.sleep(0.01)
+                    continue
+            # requests left unanswered by a closed connection are sent again
+            now = time.perf_counter()
+            batch = deque(pending)
+            while len(batch) < self.pipeline:
+                i = rng.choices(range(len(self.specs)), self.weights)[0]
+                batch.append((i, now))
+            pending = deque()
+            try:
+                for i, _ in batch:
+                    writer.write(self.payloads[i])
+                await writer.drain()
+                while batch:
+                    i, sent = batch[0]
+                    status, close, size = await asyncio.wait_for(
+                        read_response(reader, self.specs[i].method),
+                        self.timeout)
+                    batch.popleft()
+                    done = time.perf_counter()
+                    if done >= measured:
+                        stats.record(status, done - sent, size)
+                    if close:
+                        pending = batch
+                        break
+                else:
+                    continue
+            except asyncio.TimeoutError:
+                stats.error('timeout', len(batch))
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                stats.error('read', len(batch))
+            writer.close()
+            reader = writer = None
+        if writer is not None:
+            writer.close()
+        return stats
+
+
+async def _run_connections(client, connections, duration, warmup, seed):
+    results = await asyncio.gather(*(
+        client.run(duration, warmup, seed + i) for i in range(connections)))
+    stats = Stats()
+    for result in results:
+        stats.merge(result)
+    return stats
+
+
+def _work(args):
+    client, connections, duration, warmup, seed = args
+    return asyncio.run(_run_connections(client, connections, duration,
+                                        warmup, seed))
+
+
+def run(url, requests=('GET /',), concurrency=1, processes=1, pipeline=1,
+        duration=10, warmup=1, keep_alive=True, timeout=10, seed=0):
+    target = urlsplit(url if '//' in url else f'http://{url}')
+    specs = [r if isinstance(r, RequestSpec) else RequestSpec.parse(r)
+             for r in requests]
+    client = Client(target.hostname, target.port or 80, specs, pipeline,
+                    keep_alive, timeout)
+    processes = max(min(processes, concurrency), 1)
+    jobs = [(client, concurrency // processes +
+             (1 if n < concurrency % processes else 0),
+             duration, warmup, seed + n * concurrency)
+            for n in range(processes)]
+    if processes == 1:
+        results = [_work(jobs[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_work, jobs)
+    stats = Stats()
+    for result in results:
+        stats.merge(result)
+    return report(stats, duration, {
+        'url': url, 'requests': [r if isinstance(r, str) else
+                                 f'{r.method} {r.path}' for r in requests],
+        'concurrency': concurrency, 'processes': processes,
+        'pipeline': client.pipeline, 'duration': duration, 'warmup': warmup,
+        'keep_alive': keep_alive, 'seed': seed})
+
+
+def report(stats, duration, config):
+    ordered = sorted(stats.latencies)
+    latency = {'mean': sum(ordered) / len(ordered) if ordered else None}
+    for name, p in PERCENTILES:
+        latency[name] = percentile(ordered, p)
+    latency['max'] = ordered[-1] if ordered else None
+    return {
+        'config': config,
+        'requests': len(ordered),
+        'rps': len(ordered) / duration,
+        'latency_ms': {k: None if v is None else round(v * 1000, 3)
+                       for k, v in latency.items()},
+        'statuses': {str(k): v for k, v in sorted(stats.statuses.items())},
+        'errors': stats.errors,
+        'bytes_received': stats.bytes_received,
+        'connections': stats.connections,
+    }
+
+
+def add_parser(commands):
+    parser = commands.add_parser(
+        'bench', help='load a running server and report throughput and '
+                      'latency as JSON')
+    parser.add_argument('url', help='server address, e.g. '
+                                    'http://127.0.0.1:8000')
+    parser.add_argument('-r', '--request', action='append', dest='requests',
+                        metavar='SPEC',
+                        help='"METHOD PATH [weight=N] [body=SIZE] '
+                             '[upload=SIZE]", repeat for a request mix '
+                             '(default "GET /")')
+    parser.add_argument('-c', '--concurrency', type=int, default=16,
+                        help='open connections in total')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help='client processes the connections are split '
+                             'between')
+    parser.add_argument('--pipeline', type=int, default=1,
+                        help='requests in flight on a connection')
+    parser.add_argument('-d', '--duration', type=float, default=10,
+                        help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=1,
+                        help='seconds of load before the measurement')
+    parser.add_argument('--no-keep-alive', dest='keep_alive',
+                        action='store_false',
+                        help='a new connection for every request')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the request mix')
+    parser.add_argument('-o', '--output', help='write the JSON report here '
+                                               'instead of stdout')
+    parser.set_defaults(run=main)
+    return parser
+
+
+def main(args):
+    result = run(args.url, args.requests or ('GET /',), args.concurrency,
+                 args.processes, args.pipeline, args.duration, args.warmup,
+                 args.keep_alive, args.timeout, args.seed)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+    return 1 if result['errors'] else 0
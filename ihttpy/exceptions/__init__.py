@@ -3,6 +3,10 @@ from ihttpy.exceptions.logger import Logger
 
 
 def send_error(connection, err, config):
+    Response.send_response(connection, *build_error(err, config))
+
+
+def build_error(err, config):
     try:
         if err.page:
             with open(config.get("error-pages").get(err.page), 'rb') as p:
@@ -13,7 +17,7 @@ def send_error(connection, err, config):
                 err.status, err.reason,
                 (err.body or err.reason).encode('utf-8'))]
     except Exception as e:
-        Logger.error(f'Error during err creation', e)
+        Logger.error('Error during err creation: %s', e)
         res = [Response.build_err_res(500, b'Internal Server Error',
                                       b'Internal Server Error')]
-    Response.send_response(connection, *res)
+    return res
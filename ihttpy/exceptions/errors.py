@@ -11,6 +11,8 @@ class Errors(Error):
                          'Request line is too long')
     MALFORMED_REQ = Error(400, 'Bad request',
                           'Malformed request line')
+    MALFORMED_MULTIPART = Error(400, 'Bad request',
+                                'Malformed multipart body')
     HEADER_MISSING = Error(400, 'Bad request',
                            'Host header is missing')
     NOT_FOUND = Error(404, 'Not found', page="PAGE_NOT_FOUND")
@@ -21,6 +23,9 @@ class Errors(Error):
     METHOD_NOT_SUPPORTED = Error(500, 'HTTP method not supported')
     CONTENT_LENGTH_REQUIRED = Error(411, 'Proper Content-Length header '
                                          'required')
+    EXECUTOR_REQUIRED = Error(503, 'Service Unavailable',
+                              'Served only with an executor, building it '
+                              'would stall the serving loop')
 
 
 class KeepAliveExpire(Exception):
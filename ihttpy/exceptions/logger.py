@@ -1,5 +1,10 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+import threading
+import weakref
 from enum import Enum
 
 
@@ -18,11 +23,111 @@ class LogLevel(Enum):
         raise ValueError(s)
 
 
+class BatchFileHandler(logging.Handler):
+    BATCH_SIZE = 512
+    BUFFER_SIZE = 64 * 1024
+    QUEUE_SIZE = 64 * 1024
+
+    def __init__(self, path, mode='a'):
+        super().__init__()
+        self.file = open(path, mode, buffering=self.BUFFER_SIZE,
+                         encoding='utf-8')
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.dropped = 0
+        self.closed = False
+        self._start()
+        _batch_handlers.add(self)
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name='log-writer')
+        self.thread.start()
+
+    def _restart(self):
+        if not self.closed:
+            self.queue = queue.Queue(self.QUEUE_SIZE)
+            self._start()
+
+    def emit(self, record):
+        # the message is rendered now, its arguments (requests, responses)
+        # keep changing on other threads, the layout is left to the writer
+        try:
+            record.msg = record.getMessage()
+            record.args = None
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # the writer fell behind or died, dropping beats a stalled loop
+            self.dropped += 1
+
+    def _run(self):
+        records = self.queue
+        while True:
+            batch = [records.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(records.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                if record is None:
+                    self._write(lines)
+                    return
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+            self._write(lines)
+
+    def _write(self, lines):
+        if lines:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.thread.is_alive() and \
+                    self.thread is not threading.current_thread():
+                self.queue.put(None)
+                self.thread.join()
+            self.file.close()
+        _batch_handlers.discard(self)
+        super().close()
+
+
+# the process wide hooks walk the open handlers, hooks registered per handler
+# would keep every closed one alive
+_batch_handlers = weakref.WeakSet()
+
+
+def _close_batch_handlers():
+    for handler in list(_batch_handlers):
+        handler.close()
+
+
+def _restart_batch_handlers():
+    for handler in list(_batch_handlers):
+        handler._restart()
+
+
+atexit.register(_close_batch_handlers)
+if hasattr(os, 'register_at_fork'):
+    # threads do not survive fork, workers need their own writer
+    os.register_at_fork(after_in_child=_restart_batch_handlers)
+
+
 class Logger:
     LEVEL = LogLevel.LOGGING
     EXTRA = {'url', 'code', 'method', 'ip'}
+    BLANK_EXTRA = dict.fromkeys(EXTRA, '')
     INFO_LOGGER: logging.Logger = None
     DEBUG_LOGGER: logging.Logger = None
+    DEBUG = False
 
     @staticmethod
     def setup_logger(name, log_file, level=logging.INFO,
@@ -31,11 +136,15 @@ class Logger:
 
         logger = logging.getLogger(name)
         logger.setLevel(level)
+        for old in list(logger.handlers):
+            # configure() may run once per server, keep a single handler
+            logger.removeHandler(old)
+            old.close()
         handler = None
 
         if Logger.LEVEL == LogLevel.LOGGING or log_file:
             if log_file:
-                handler = logging.FileHandler(log_file, mode='w+')
+                handler = BatchFileHandler(log_file, mode='w+')
                 formater = logging.Formatter(fmt=fmt, datefmt=datefmt)
                 handler.setFormatter(formater)
             else:
@@ -61,15 +170,26 @@ class Logger:
 
         Logger.DEBUG_LOGGER = Logger.setup_logger(
             'debug_logger', debug_path, logging.DEBUG)
+        Logger.DEBUG = Logger.DEBUG_LOGGER is not None
 
     @staticmethod
     def prepare_extra(extra=None):
-        if extra is None:
-            extra = {}
-        res = {k: extra.get(k) if extra.get(k) is not None else ''
-               for k in Logger.EXTRA}
+        if not extra:
+            return Logger.BLANK_EXTRA
+        res = dict(Logger.BLANK_EXTRA)
+        for k, v in extra.items():
+            if v is not None:
+                res[k] = v
         return res
 
+    @staticmethod
+    def access(method, url, code, ip):
+        if Logger.INFO_LOGGER:
+            Logger.INFO_LOGGER.info(
+                'Source Requested',
+                extra={'method': method, 'url': url, 'code': code,
+                       'ip': ip if ip is not None else ''})
+
     @staticmethod
     def info(*args, extra=None):
         if Logger.INFO_LOGGER:
@@ -83,12 +203,12 @@ class Logger:
     @staticmethod
     def error(*args, extra=None):
         if Logger.DEBUG_LOGGER:
-            Logger.DEBUG_LOGGER.error(args, extra=Logger.prepare_extra(extra))
+            Logger.DEBUG_LOGGER.error(*args, extra=Logger.prepare_extra(extra))
 
     @staticmethod
-    def exception(args, extra=None):
+    def exception(*args, extra=None):
         if Logger.DEBUG_LOGGER:
-            Logger.DEBUG_LOGGER.exception(args,
+            Logger.DEBUG_LOGGER.exception(*args,
                                           extra=Logger.prepare_extra(extra))
 
     # todo warn
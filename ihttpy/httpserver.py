@@ -1,22 +1,35 @@
+import functools
 import os
 import selectors
+import signal
 import socket
 import threading
 import time
-
-from diskcache import Cache
+from collections import deque
 
 from ihttpy.exceptions.errors import Errors
-from ihttpy.routing.router import Router
+from ihttpy.routing.router import Router, Routes
 from ihttpy.exceptions.logger import Logger, LogLevel
-from ihttpy.exceptions import send_error
+from ihttpy.exceptions import build_error
+from ihttpy.requests.body import RequestBody, BodyStream
+from ihttpy.requests.cache import ResponseCache
+from ihttpy.requests.compression import Compressor
+from ihttpy.requests.mime import MimeResolver
+from ihttpy.requests.parser import RequestParser
 from ihttpy.requests.request import Request
-from ihttpy.requests.response import Response
+from ihttpy.requests.response import FileBody, FileTransfer, \
+    ChunkedTransfer, MultiBody
 from ihttpy.exceptions.errors import KeepAliveExpire
+from ihttpy.memory import PAGE as MEMORY_PAGE, serve_memory
+from ihttpy.metrics import Metrics, PAGE as INTERNAL_PAGE, \
+    cache_gauges, observe_request, route_label, serve_metrics
+from ihttpy.timers import TimerWheel
+from ihttpy.workers import Master
 
 
 class Server:
     MAX_LINE = 64 * 1024
+    TRANSFERS = (FileTransfer, ChunkedTransfer)
     MAX_SEND_SIZE = 1024
     MAX_HEADERS = 100
     BREAKLINE = [b'', b'\n']
@@ -25,9 +38,26 @@ class Server:
                  loglevel=LogLevel.LOGGING,
                  refresh_rate=0.1,
                  cache_max_size=4e9,
+                 memory_cache_size=ResponseCache.MAX_SIZE,
                  server_log=None,
                  debug_log=None,
-                 is_dev=False):
+                 is_dev=False,
+                 workers=1,
+                 reuse_port=False,
+                 body_spool_size=RequestBody.SPOOL_MAX_SIZE,
+                 executor=None,
+                 keep_alive_timeout=15,
+                 max_keep_alive_requests=100,
+                 compress_level=Compressor.LEVEL,
+                 compress_min_size=Compressor.MIN_SIZE,
+                 compress_types=Compressor.TYPES,
+                 metrics=True,
+                 metrics_path=None,
+                 profiler=None,
+                 memory=None,
+                 memory_path=None,
+                 hot_reload=False,
+                 watch_interval=None):
 
         Logger.configure(level=loglevel, info_path=server_log,
                          debug_path=debug_log)
@@ -37,35 +67,97 @@ class Server:
 
         self.configurator = configurator
 
-        self.router = Router()
-        self.router.load_handlers(self.configurator._get_rules())
+        rules = self.configurator._get_rules()
+        router = Router()
+        router.load_handlers(rules)
+        router.compile(rules)
+        self.routes = Routes(getattr(self.configurator, 'config', None),
+                             rules, router)
 
-        self.cache = Cache(size_limit=int(cache_max_size))
+        self.cache = ResponseCache(memory_cache_size, cache_max_size)
+        self.mime = MimeResolver()
+        self.compressor = None
+        if compress_level:
+            self.compressor = Compressor(compress_level, compress_min_size,
+                                         compress_types)
 
         self._host = self.configurator.get('_host')
         self._port = self.configurator.get('_port')
         self.address = (self._host, self._port)
         self._running = True
         self.refresh_rate = refresh_rate
+        self.workers = workers
+        self.body_spool_size = body_spool_size
+        self.reuse_port = reuse_port
+        self._is_worker = False
         self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.poller = selectors.DefaultSelector()
         socket.setdefaulttimeout(refresh_rate)
         self.conns = {}
         self.requests = {}
         self.out_buff = {}
+        self.closing = set()
+        self.corked = set()
+        self.executor = executor
+        self.in_flight = set()
+        self.completed = deque()
+        self.drained = deque()
+        self.paused = set()
+        self._waker = None
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+        self.served = {}
+        self.timers = TimerWheel(now=time.monotonic())
+        self.metrics = None
+        if metrics:
+            self.metrics = Metrics()
+            self.metrics.gauge('open_connections', 'Open client connections',
+                               lambda: len(self.out_buff))
+            self.metrics.gauge('in_flight_requests',
+                               'Requests running on the executor',
+                               lambda: len(self.in_flight))
+            cache_gauges(self.metrics, self.cache)
+        self.metrics_path = metrics_path
+        self.profiler = profiler
+        self.memory = memory
+        self.memory_path = memory_path
+        self.hot_reload = hot_reload or bool(watch_interval)
+        self.watch_interval = watch_interval
+        self.reloaded = deque()
+        self._reload_lock = threading.Lock()
 
     def __enter__(self):
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server.bind(self.address)
-        self.server.listen()
-        self.server.setblocking(False)
+        self._bind(self.server)
         Logger.debug_info(f'server is UP on {self._host}:{self._port}')
         return self
 
+    def _bind(self, sock):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(self.address)
+        sock.listen()
+        sock.setblocking(False)
+
+    def _become_worker(self, reuse_port=False):
+        self._is_worker = True
+        self.cache.close()
+        self.poller = selectors.DefaultSelector()
+        if reuse_port:
+            self.server.close()
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._bind(self.server)
+        Logger.debug_info(f'Worker {os.getpid()} is UP on '
+                          f'{self._host}:{self._port}')
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._running = False
         self.poller.close()
         self.server.close()
+        for sock in self._waker or ():
+            sock.close()
+        if self.memory:
+            self.memory.stop()
         if exc_type and exc_type is not KeyboardInterrupt:
             Logger.exception(f'server is DOWN because of exception ')
         else:
@@ -77,100 +169,469 @@ class Server:
         self._running = False
 
     def run(self):
+        if self.workers > 1 and not self._is_worker:
+            return Master(self, self.workers, self.reuse_port).run()
+
+        if self.profiler:
+            self.profiler.install()
+        if self.memory:
+            self.memory.start()
+        if self.hot_reload and \
+                threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload())
+        if self.watch_interval:
+            threading.Thread(target=self._watch_config, daemon=True,
+                             name='config-watcher').start()
+
         self.conns[self.server.fileno()] = self.server
         self.poller.register(self.server, selectors.EVENT_READ, self._accept)
+        if self.executor:
+            self._waker = socket.socketpair()
+            for sock in self._waker:
+                sock.setblocking(False)
+            self.conns[self._waker[0].fileno()] = self._waker[0]
+            self.poller.register(self._waker[0], selectors.EVENT_READ,
+                                 self._wake)
 
         while self._running:
             poll = self.poller.select(self.refresh_rate)
             for key, mask in poll:
                 try:
-                    callback = key.data
-                    callback(key.fileobj)
+                    if mask & selectors.EVENT_WRITE:
+                        self._write(key.fileobj)
+                    if mask & selectors.EVENT_READ and key.fd in self.conns:
+                        callback = key.data
+                        callback(key.fileobj)
                 except socket.error as e:
                     if e.errno == 54:
-                        Logger.debug_info(f'Disconnected {key.fileobj}')
+                        Logger.debug_info('Disconnected %s', key.fileobj)
+            now = time.monotonic()
+            for num in self.timers.advance(now):
+                self._expire(num)
+            if self.memory:
+                self.memory.tick(now)
+            if self.profiler:
+                self.profiler.tick()
+            if self.reloaded:
+                self._swap_routes()
+
+    def _touch(self, num):
+        if self.keep_alive_timeout:
+            self.timers.touch(num, self.keep_alive_timeout, time.monotonic())
+
+    def _expire(self, num):
+        client = self.conns.get(num)
+        if client is None:
+            return
+        if num in self.in_flight:
+            self._touch(num)
+            return
+        Logger.debug_info('Keep-alive expired for %s', client)
+        self.close(client)
 
     def _accept(self, sock):
         (client, addr) = sock.accept()
+        Logger.debug_info('Connected %s', addr)
+        self._register(client)
+        Logger.debug_info('EVENT_READ Registered %s', addr)
+
+    def _register(self, client):
         num = client.fileno()
         self.conns[num] = client
-        self.requests[num] = Request()
-        self.out_buff[num] = []
-        Logger.debug_info(f'Connected {addr}')
+        self.requests[num] = RequestParser(self.body_spool_size,
+                                          self._streams_body)
+        self.out_buff[num] = deque()
 
         client.setblocking(False)
         self.poller.register(client,
                              selectors.EVENT_READ,
                              self._read)
-        Logger.debug_info(f'EVENT_READ Registered {addr}')
+        self._touch(num)
 
     def _read(self, client):
         try:
             line: bytes = client.recv(self.MAX_LINE)
             if not line:
-                self.poller.unregister(client)
-                del self.conns[client.fileno()]
+                self.close(client)
                 return
             num = client.fileno()
-            req_builder: Request = self.requests[num]
-            split = Request.split_keep_sep(line, bytes(os.linesep, 'utf-8'))
-
-            for s in split:
-                if req_builder.dynamic_fill(s):
-                    self.requests[num] = Request()
-                    # todo Request() change to req_builder
-                    return self.serve_client(client, req_builder)
-            print(req_builder)
+            self._touch(num)
+            if self.metrics:
+                self.metrics.bytes_in += len(line)
+            self.requests[num].buffer += line
+            self._process(client)
         except Exception as e:
             Logger.exception('Read from client failed')
-            send_error(client, e, self.configurator)
+            # the stream can not be resynchronised after a broken request
+            self.closing.add(client.fileno())
+            self.send(client, *build_error(e, self.configurator))
+
+    def _process(self, client):
+        num = client.fileno()
+        parser = self.requests[num]
+        self.corked.add(num)
+        try:
+            while (num not in self.in_flight and num not in self.closing
+                   and self.conns.get(num) is client):
+                req = parser.feed()
+                if not req:
+                    break
+                if parser.streaming:
+                    req.body = parser.sink = BodyStream(
+                        req._body_to_read,
+                        on_drain=lambda: self._drained(client, num))
+                self.serve_client(client, req)
+            # the body of a request in flight keeps flowing to its handler
+            parser.pump()
+        finally:
+            self.corked.discard(num)
+        if self.conns.get(num) is not client:
+            return
+        if parser.sink is not None and parser.sink.stall():
+            # stop reading until the handler consumed the buffered body
+            self.paused.add(num)
+        self._write(client)
+
+    def send(self, client, *responses):
+        num = client.fileno()
+        queue = self.out_buff.get(num)
+        if queue is None:
+            return
+        for response in responses:
+            if isinstance(response.body, FileBody):
+                queue.append(memoryview(response.head_to_bytes()))
+                queue.append(response.body.open())
+            elif isinstance(response.body, MultiBody):
+                queue.append(memoryview(response.head_to_bytes()))
+                for part in response.body.parts:
+                    queue.append(part.open() if isinstance(part, FileBody)
+                                 else memoryview(part))
+            elif response.is_stream():
+                chunked = response.headers.get('Transfer-Encoding')
+                transfer = ChunkedTransfer(response.body, chunked == 'chunked')
+                queue.append(memoryview(response.head_to_bytes()))
+                queue.append(transfer)
+            else:
+                queue.append(memoryview(response.to_bytes()))
+        if num not in self.corked:
+            # pipelined responses are flushed together by _process
+            self._write(client)
+
+    def _write(self, client):
+        num = client.fileno()
+        queue = self.out_buff.get(num)
+        if queue is None:
+            return
+        total = 0
+        try:
+            while queue:
+                chunk = queue[0]
+                try:
+                    if isinstance(chunk, self.TRANSFERS):
+                        sent = chunk.send(client)
+                        done = not chunk.remaining
+                    else:
+                        sent = client.send(chunk)
+                        queue[0] = chunk = chunk[sent:]
+                        done = not chunk
+                except BlockingIOError:
+                    break
+                total += sent
+                if done:
+                    queue.popleft()
+                    if isinstance(chunk, self.TRANSFERS):
+                        chunk.close()
+            self._touch(num)
+        except socket.error:
+            Logger.exception('Write to client failed')
+            return self.close(client)
+        except Exception:
+            # the head is already sent, the stream can only be cut short
+            Logger.exception('Response stream failed')
+            return self.close(client)
+        finally:
+            if self.metrics:
+                self.metrics.bytes_out += total
+
+        if queue:
+            self._watch(client, selectors.EVENT_WRITE)
+        elif num in self.closing:
+            self.close(client)
+        else:
+            self._watch(client, 0)
+
+    def _watch(self, client, events):
+        if client.fileno() not in self.paused:
+            events |= selectors.EVENT_READ
+        try:
+            key = self.poller.get_key(client)
+        except KeyError:
+            key = None
+        if key is None:
+            if events:
+                self.poller.register(client, events, self._read)
+        elif not events:
+            self.poller.unregister(client)
+        elif key.events != events:
+            self.poller.modify(client, events, key.data)
 
     def close(self, connection):
+        num = connection.fileno()
         try:
             self.poller.unregister(connection)
-            del self.conns[connection.fileno()]
         except Exception:
             Logger.debug_info('Socket disconnected by timeout')
+        self.conns.pop(num, None)
+        parser = self.requests.pop(num, None)
+        if parser is not None and parser.sink is not None:
+            parser.sink.abort(
+                ConnectionError('Connection closed while reading the body'))
+        for chunk in self.out_buff.pop(num, ()):
+            if isinstance(chunk, self.TRANSFERS):
+                chunk.close()
+        self.closing.discard(num)
+        self.in_flight.discard(num)
+        self.paused.discard(num)
+        self.served.pop(num, None)
+        self.timers.cancel(num)
         connection.close()
-        Logger.debug_info(f'Socket Disconnected in thread '
-                          f'{threading.current_thread().ident}')
+        if Logger.DEBUG:
+            Logger.debug_info('Socket Disconnected in thread %s',
+                              threading.current_thread().ident)
 
     def serve_client(self, client, req: Request):
         try:
-            Logger.debug_info(f'Request {req}')
+            Logger.debug_info('Request %s', req)
+            if self.metrics:
+                req.started = time.perf_counter()
+            if self.profiler:
+                req.trace = self.profiler.begin()
             if req.insufficient():
                 raise Errors.MALFORMED_REQ
 
-            a = time.perf_counter()
-            res = self.handle_req(req)
-            Logger.debug_info(f'Request handling time {time.perf_counter() - a}')
-            Logger.debug_info(f'Response prepared {res}')
-
-            Response.send_response(client, res)
-            Logger.debug_info(f'Response sent')
-
-            Logger.info(f'Source Requested',
-                        extra={'method': req.method,
-                               'url': req.path,
-                               'code': res.status,
-                               'ip': client.getpeername()})
+            page, handle = self.find_route(req)
+            if req.trace:
+                req.trace.mark('route')
+                self.profiler.sample(req.trace, route_label(self, req))
+            if self.executor and not page.inline:
+                num = client.fileno()
+                self.in_flight.add(num)
+                future = self.executor.submit(self._call, handle, req)
+                future.add_done_callback(
+                    lambda f: self._complete(client, num, req, f))
+                return
 
-            if req.headers.get('Connection') == 'keep-alive':
-                client.setsockopt(socket.SOL_SOCKET,
-                                  socket.SO_KEEPALIVE, 1)
-            if req.headers.get('Connection') == 'close':
-                self.close(client)
+            res = self._call(handle, req)
+            self.respond(client, req, res)
         except KeepAliveExpire:
             self.close(client)
         except Exception as e:
-            Logger.exception(f'Client handling failed')
-            send_error(client, e, self.configurator)
+            self._fail(client, req, e)
 
-    def handle_req(self, req):
-        rules = self.configurator._get_rules()
-        handle = self.router.find_handler(req, rules)
-        if handle:
-            return handle(req, self)
+    def respond(self, client, req, res):
+        Logger.debug_info('Response prepared %s', res)
+        if Logger.INFO_LOGGER:
+            Logger.access(req.method, req.path, res.status,
+                          client.getpeername())
+
+        if req.headers.get('Connection') == 'keep-alive':
+            client.setsockopt(socket.SOL_SOCKET,
+                              socket.SO_KEEPALIVE, 1)
+        if res.is_stream():
+            res.start_stream(chunked=req.version != 'HTTP/1.0')
+        try:
+            self._count_request(client.fileno())
+        except KeepAliveExpire:
+            res.headers['Connection'] = 'close'
+        if res.headers.get('Connection') == 'close':
+            self.closing.add(client.fileno())
+        if req.headers.get('Connection') == 'close':
+            self.closing.add(client.fileno())
+        self.send(client, res)
+        Logger.debug_info('Response queued')
+        # after send, a failure there is observed by _fail instead
+        observe_request(self, req, res.status)
+        if req.trace:
+            self.profiler.finish(req.trace, req, res.status)
+
+    def _count_request(self, num):
+        served = self.served.get(num, 0) + 1
+        self.served[num] = served
+        if self.max_keep_alive_requests and \
+                served >= self.max_keep_alive_requests:
+            raise KeepAliveExpire(num)
+
+    def _streams_body(self, req):
+        if not self.executor:
+            return False
+        try:
+            routes = self.routes
+            page = routes.router.find_page_description(req.url.path,
+                                                       routes.rules)
+        except Exception:
+            return False
+        return page.stream_body and not page.inline
+
+    def _fail(self, client, req, err):
+        Logger.exception('Client handling failed')
+        self._finish_body(client.fileno(), req)
+        if req.headers.get('Connection') == 'close':
+            self.closing.add(client.fileno())
+        responses = build_error(err, self.configurator)
+        observe_request(self, req, responses[0].status)
+        self.send(client, *responses)
+        if req.trace:
+            self.profiler.finish(req.trace, req, responses[0].status)
+
+    def _call(self, handle, req):
+        a = time.perf_counter()
+        if self.memory:
+            handle = functools.partial(self.memory.call,
+                                       route_label(self, req), handle)
+        trace = req.trace
+        if trace:
+            trace.mark('queue')
+            res = self.profiler.call(trace, handle, req, self)
+            trace.mark('handler')
         else:
+            res = handle(req, self)
+        if self.compressor:
+            res = self.compressor.apply(req, res)
+            if trace:
+                trace.mark('compress')
+        Logger.debug_info('Request handling time %s', time.perf_counter() - a)
+        return res
+
+    def _complete(self, client, num, req, future):
+        # runs on an executor thread, the loop picks the result up
+        self.completed.append((client, num, req, future))
+        self._notify()
+
+    def _drained(self, client, num):
+        # runs on an executor thread once a stalled body stream has room
+        self.drained.append((client, num))
+        self._notify()
+
+    def _notify(self):
+        try:
+            self._waker[1].send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _wake(self, sock):
+        try:
+            while sock.recv(self.MAX_LINE):
+                pass
+        except BlockingIOError:
+            pass
+        while self.completed:
+            client, num, req, future = self.completed.popleft()
+            if self.conns.get(num) is not client:
+                continue
+            self.in_flight.discard(num)
+            if req.trace:
+                req.trace.mark('wait')
+            try:
+                res = future.result()
+                self._finish_body(num, req)
+                self.respond(client, req, res)
+            except KeepAliveExpire:
+                self.close(client)
+            except Exception as e:
+                self._fail(client, req, e)
+            if num in self.conns:
+                self._resume(client)
+        while self.drained:
+            client, num = self.drained.popleft()
+            if self.conns.get(num) is client and num in self.paused:
+                self.paused.discard(num)
+                self._resume(client)
+
+    def _resume(self, client):
+        # requests pipelined behind a finished one are parsed here, a broken
+        # one must not take the loop down
+        try:
+            self._process(client)
+        except Exception as e:
+            Logger.exception('Processing pipelined request failed')
+            self.closing.add(client.fileno())
+            self.send(client, *build_error(e, self.configurator))
+
+    def _finish_body(self, num, req):
+        if isinstance(req.body, BodyStream):
+            # whatever the handler left unread is skipped
+            req.body.close()
+            self.paused.discard(num)
+
+    @property
+    def router(self):
+        return self.routes.router
+
+    def find_route(self, req):
+        if self.metrics and req.path == self.metrics_path:
+            return INTERNAL_PAGE, serve_metrics
+        if self.memory and req.path == self.memory_path:
+            return MEMORY_PAGE, serve_memory
+        # the handler reads the same snapshot through req.routes
+        routes = req.routes = self.routes
+        page, handle = routes.router.find_route(req, routes.rules)
+        if not handle:
             Logger.error('Handler not found', extra={'url': req.path})
             raise Errors.NO_HANDLER
+        return page, handle
+
+    def reload(self):
+        # the new routes are built on a thread, the loop swaps them in
+        thread = threading.Thread(target=self._build_routes, daemon=True,
+                                  name='config-reload')
+        thread.start()
+        return thread
+
+    def _build_routes(self):
+        if not hasattr(self.configurator, 'load'):
+            Logger.error('Configurator %s can not be reloaded',
+                         type(self.configurator).__name__)
+            return
+        with self._reload_lock:
+            try:
+                config, rules = self.configurator.load()
+                router = Router(self.router.cache_size)
+                router.load_handlers(rules, previous=self.router)
+                router.compile(rules)
+            except Exception:
+                Logger.exception('Config reload failed, the old one is kept')
+                return
+            if self.cache.l2 is not None:
+                # the disk is cleared here, the swap only drops the memory
+                self.cache.l2.clear()
+            self.reloaded.append((config, rules, router))
+        if self._waker:
+            self._notify()
+
+    def _swap_routes(self):
+        # runs on the loop between two events, requests in flight keep the
+        # handlers they were given
+        config, rules, router = self.reloaded.pop()
+        self.reloaded.clear()
+        self.routes = Routes(config, rules, router)
+        self.configurator.apply(config, rules)
+        self.cache.invalidate()
+        Logger.debug_info('Config reloaded, %s rules', len(rules))
+
+    def _fingerprint(self):
+        paths = [getattr(self.configurator, 'cfg_path', None),
+                 *self.router.mtimes]
+        return [Router.get_mtime(path) for path in paths]
+
+    def _watch_config(self):
+        seen = self._fingerprint()
+        while self._running:
+            time.sleep(self.watch_interval)
+            current = self._fingerprint()
+            if current != seen:
+                seen = current
+                self._build_routes()
+
+    def handle_req(self, req):
+        _, handle = self.find_route(req)
+        return handle(req, self)
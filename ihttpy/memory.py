@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from ihttpy.exceptions.errors import Errors
+from ihttpy.metrics import UNMATCHED
+from ihttpy.requests.body import BodyStream, RequestBody
+from ihttpy.requests.response import Response
+from ihttpy.routing.page import Page
+
+# allocations of the tracer itself and of the import machinery are noise
+IGNORED = (tracemalloc.__file__, '<frozen importlib._bootstrap>',
+           '<frozen importlib._bootstrap_external>', '<unknown>')
+# a report walks every traced block and takes seconds, it is built on the
+# executor and refused without one
+PAGE = Page({}, {})
+
+
+class MemoryTracker:
+    FRAMES = 16
+    INTERVAL = 10
+    HISTORY = 120
+
+    def __init__(self, frames=FRAMES, interval=INTERVAL, history=HISTORY):
+        self.frames = frames
+        self.interval = interval
+        self.history = deque(maxlen=history)
+        self.routes = {}
+        self.baseline = None
+        self._next = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        self.baseline = self.take()
+        self._next = time.monotonic() + self.interval
+        self._record(time.monotonic())
+
+    def stop(self):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def take(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces(
+            [tracemalloc.Filter(False, name) for name in IGNORED])
+
+    def tick(self, now):
+        # called from the serving loop, the traced total every interval
+        if self._next is None or now < self._next:
+            return
+        self._next = now + self.interval
+        self._record(now)
+
+    def _record(self, now):
+        current, peak = tracemalloc.get_traced_memory()
+        self.history.append((round(now, 3), current, peak))
+
+    def call(self, route, func, *args):
+        # change of the process wide traced total while the handler ran,
+        # whatever other threads allocated meanwhile is counted in too
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            return func(*args)
+        finally:
+            delta = tracemalloc.get_traced_memory()[0] - before
+            route = route or UNMATCHED
+            with self._lock:
+                stat = self.routes.get(route)
+                if stat is None:
+                    stat = self.routes[route] = {
+                        'calls': 0, 'allocated': 0, 'max': 0}
+                stat['calls'] += 1
+                stat['allocated'] += delta
+                stat['max'] = max(stat['max'], delta)
+
+    def top(self, limit=10, snapshot=None):
+        snapshot = snapshot or self.take()
+        return [{
+            'site': site(stat.traceback),
+            'size': stat.size,
+            'count': stat.count,
+        } for stat in snapshot.statistics('lineno')[:limit]]
+
+    def growth(self, limit=10, snapshot=None):
+        # what is held now on top of what was held at start()
+        snapshot = snapshot or self.take()
+        diffs = [diff for diff in snapshot.compare_to(self.baseline, 'lineno')
+                 if diff.size_diff > 0]
+        return [{
+            'site': site(diff.traceback),
+            'size_diff': diff.size_diff,
+            'count_diff': diff.count_diff,
+            'size': diff.size,
+        } for diff in diffs[:limit]]
+
+    def report(self, server=None, limit=10):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self.take()
+        with self._lock:
+            routes = {k: dict(v) for k, v in self.routes.items()}
+        report = {
+            'pid': os.getpid(),
+            'traced': {'current': current, 'peak': peak},
+            'history': list(self.history),
+            'top': self.top(limit, snapshot),
+            'growth': self.growth(limit, snapshot),
+            'routes': routes,
+        }
+        if server is not None:
+            report['connections'] = connection_state(server)
+        return report
+
+
+def site(traceback):
+    frame = traceback[0]
+    return f'{frame.filename}:{frame.lineno}'
+
+
+def connection_state(server):
+    # every per-connection table should shrink back when clients leave
+    state = {
+        'connections': len(server.out_buff),
+        'tables': {
+            name: len(getattr(server, name))
+            for name in ('conns', 'requests', 'out_buff', 'served',
+                         'closing', 'in_flight', 'paused', 'timers')
+            if hasattr(server, name)
+        },
+        'parser_buffer_bytes': 0,
+        'body_memory_bytes': 0,
+        'spooled_bodies': 0,
+        'streamed_body_bytes': 0,
+        'queued_bytes': 0,
+    }
+    for parser in list(getattr(server, 'requests', {}).values()):
+        state['parser_buffer_bytes'] += len(parser.buffer)
+        body = parser.request.body if parser.request else None
+        if isinstance(body, RequestBody):
+            if body.in_memory:
+                state['body_memory_bytes'] += body.size
+            else:
+                state['spooled_bodies'] += 1
+        if isinstance(parser.sink, BodyStream):
+            state['streamed_body_bytes'] += parser.sink.buffered
+    for queue in list(getattr(server, 'out_buff', {}).values()):
+        for chunk in list(queue):
+            if isinstance(chunk, memoryview):
+                state['queued_bytes'] += chunk.nbytes
+    return state
+
+
+def serve_memory(req, server):
+    if getattr(server, 'executor', None) is None:
+        raise Errors.EXECUTOR_REQUIRED
+    body = json.dumps(server.memory.report(server), indent=2).encode('utf-8')
+    return Response(200, 'OK', {
+        'Content-Type': 'application/json',
+        'Content-Length': len(body),
+        'Cache-Control': 'no-store',
+    }, body)
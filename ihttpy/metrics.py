@@ -0,0 +1,156 @@
+import threading
+import time
+from bisect import bisect_left
+
+from ihttpy.defenitions import SUPPORTED_METHODS
+from ihttpy.requests.response import Response
+from ihttpy.routing.page import Page
+
+UNMATCHED = '<unmatched>'
+OTHER_METHOD = 'OTHER'
+# the metrics text is rendered from counters, cheap enough for the loop
+PAGE = Page({'inline': True}, {})
+
+
+class Histogram:
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+               0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        # the last slot counts the observations above every bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, out = 0, []
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum,
+                'buckets': self.cumulative()}
+
+
+class Metrics:
+    PREFIX = 'ihttpy'
+
+    def __init__(self, buckets=Histogram.BUCKETS):
+        self.buckets = buckets
+        self.latency = {}
+        self.responses = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds):
+        route = route or UNMATCHED
+        # clients choose the method, a label each would grow without bound
+        if method not in SUPPORTED_METHODS:
+            method = OTHER_METHOD
+        with self._lock:
+            hist = self.latency.get((route, method))
+            if hist is None:
+                hist = self.latency[(route, method)] = Histogram(self.buckets)
+            hist.observe(seconds)
+            key = (route, method, int(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def gauge(self, name, description, read, kind='gauge'):
+        # read() is evaluated on every snapshot, nothing is kept up to date
+        self.gauges[name] = (description, read, kind)
+
+    def snapshot(self):
+        with self._lock:
+            data = {
+                'latency': {k: h.snapshot() for k, h in self.latency.items()},
+                'responses': dict(self.responses),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+            }
+        for name, (_, read, _) in self.gauges.items():
+            data[name] = read()
+        return data
+
+    def to_prometheus(self):
+        p = self.PREFIX
+        data = self.snapshot()
+        lines = [
+            f'# HELP {p}_request_duration_seconds Request handling latency',
+            f'# TYPE {p}_request_duration_seconds histogram',
+        ]
+        for (route, method), hist in sorted(data['latency'].items()):
+            labels = f'route="{escape(route)}",method="{escape(method)}"'
+            for bound, n in hist['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{p}_request_duration_seconds_bucket'
+                             f'{{{labels},le="{le}"}} {n}')
+            lines.append(f'{p}_request_duration_seconds_sum{{{labels}}} '
+                         f'{hist["sum"]!r}')
+            lines.append(f'{p}_request_duration_seconds_count{{{labels}}} '
+                         f'{hist["count"]}')
+        lines += [f'# HELP {p}_responses_total Responses by status code',
+                  f'# TYPE {p}_responses_total counter']
+        for (route, method, code), n in sorted(data['responses'].items()):
+            lines.append(f'{p}_responses_total{{route="{escape(route)}",'
+                         f'method="{escape(method)}",code="{code}"}} {n}')
+        lines += [f'# HELP {p}_received_bytes_total Bytes read from clients',
+                  f'# TYPE {p}_received_bytes_total counter',
+                  f'{p}_received_bytes_total {data["bytes_in"]}',
+                  f'# HELP {p}_sent_bytes_total Bytes written to clients',
+                  f'# TYPE {p}_sent_bytes_total counter',
+                  f'{p}_sent_bytes_total {data["bytes_out"]}']
+        for name, (description, _, kind) in sorted(self.gauges.items()):
+            lines += [f'# HELP {p}_{name} {description}',
+                      f'# TYPE {p}_{name} {kind}',
+                      f'{p}_{name} {data[name]}']
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"')\
+        .replace('\n', r'\n')
+
+
+def route_label(server, req):
+    # the rule key labels a route, raw paths would never add up
+    if req.path is not None and req.path in (
+            server.metrics_path, getattr(server, 'memory_path', None)):
+        return req.path
+    routes = req.routes or server.routes
+    return routes.router.find_rule(req.path, routes.rules)
+
+
+def observe_request(server, req, status):
+    if server.metrics is None or req.started is None:
+        return
+    server.metrics.observe(route_label(server, req), req.method, status,
+                           time.perf_counter() - req.started)
+
+
+def cache_gauges(metrics, cache):
+    for field, kind in (('hits', 'counter'), ('misses', 'counter'),
+                        ('evictions', 'counter'), ('entries', 'gauge'),
+                        ('size', 'gauge')):
+        name = f'cache_{field}_total' if kind == 'counter' \
+            else f'cache_{field}'
+        metrics.gauge(name, f'Response cache {field}',
+                      lambda field=field: cache.stats()[field], kind)
+
+
+def serve_metrics(req, server):
+    body = server.metrics.to_prometheus().encode('utf-8')
+    return Response(200, 'OK', {
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+        'Content-Length': len(body),
+        'Cache-Control': 'no-store',
+    }, body)
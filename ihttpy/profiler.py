@@ -0,0 +1,159 @@
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import signal
+import threading
+import time
+from collections import deque
+
+from ihttpy.exceptions.logger import BatchFileHandler, Logger
+from ihttpy.metrics import UNMATCHED
+
+
+class Trace:
+    __slots__ = ('route', 'profile', 'start', 'last', 'phases')
+
+    def __init__(self):
+        self.route = UNMATCHED
+        self.profile = False
+        self.start = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        # time spent since the previous mark is booked to phase
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.start
+
+
+class Profiler:
+    SAMPLE_RATE = 0.01
+    SLOW_KEEP = 256
+
+    def __init__(self, sample_rate=SAMPLE_RATE, routes=None,
+                 slow_threshold=None, slow_log=None, dump_dir='.',
+                 dump_signal=None, seed=None):
+        self.sample_rate = sample_rate
+        self.routes = set(routes) if routes else None
+        self.slow_threshold = slow_threshold
+        self.dump_dir = dump_dir
+        self.dump_signal = dump_signal
+        self.dump_pending = False
+        self.stats = {}
+        self.samples = {}
+        self.slow = deque(maxlen=self.SLOW_KEEP)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # only one cProfile can be enabled at a time
+        self._profiling = threading.Lock()
+        self._log = None
+        if slow_log:
+            self._log = logging.getLogger(f'slow_logger.{slow_log}')
+            self._log.setLevel(logging.INFO)
+            self._log.propagate = False
+            handler = BatchFileHandler(slow_log)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._log.addHandler(handler)
+
+    def begin(self):
+        return Trace()
+
+    def sample(self, trace, route):
+        trace.route = route or UNMATCHED
+        if self.routes is not None and route not in self.routes:
+            return
+        trace.profile = self._random.random() < self.sample_rate
+
+    def call(self, trace, func, *args):
+        if not trace.profile or not self._profiling.acquire(blocking=False):
+            return func(*args)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            self._profiling.release()
+            self._add(trace.route, profile)
+
+    def _add(self, route, profile):
+        with self._lock:
+            stats = self.stats.get(route)
+            if stats is None:
+                self.stats[route] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self.samples[route] = self.samples.get(route, 0) + 1
+
+    def finish(self, trace, req, status):
+        trace.mark('respond')
+        if self.slow_threshold is None or trace.total < self.slow_threshold:
+            return
+        record = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'method': req.method,
+            'path': req.path,
+            'route': trace.route,
+            'status': int(status),
+            'total_ms': round(trace.total * 1000, 3),
+            'phases_ms': {phase: round(took * 1000, 3)
+                          for phase, took in trace.phases},
+        }
+        self.slow.append(record)
+        if self._log:
+            self._log.info('%s', json.dumps(record))
+        else:
+            Logger.info('Slow request %s', json.dumps(record),
+                        extra={'url': req.path, 'method': req.method,
+                               'code': status})
+
+    def dump(self, directory=None):
+        directory = directory or self.dump_dir
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        with self._lock:
+            for route, stats in self.stats.items():
+                name = re.sub(r'[^\w.-]+', '_', route).strip('_') or 'root'
+                path = os.path.join(directory,
+                                    f'{os.getpid()}-{name}.pstats')
+                stats.dump_stats(path)
+                paths.append(path)
+        return paths
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.samples.clear()
+        self.slow.clear()
+
+    def close(self):
+        if self._log:
+            for handler in list(self._log.handlers):
+                self._log.removeHandler(handler)
+                handler.close()
+
+    def tick(self):
+        # called from the serving loop, dumps what the signal asked for
+        if not self.dump_pending:
+            return
+        self.dump_pending = False
+        try:
+            self.dump()
+        except OSError:
+            Logger.exception('Dumping profiles failed')
+
+    def install(self):
+        # called from the serving process, every worker dumps its own files.
+        # The signal may land while _add holds the lock, so it only flags
+        if self.dump_signal is not None and \
+                threading.current_thread() is threading.main_thread():
+            signal.signal(self.dump_signal, self._request_dump)
+
+    def _request_dump(self, signum, frame):
+        self.dump_pending = True
@@ -0,0 +1,220 @@
+import asyncio
+import io
+import mmap
+import tempfile
+import threading
+from collections import deque
+
+
+class RequestBody:
+    SPOOL_MAX_SIZE = 1024 * 1024
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, length=None, spool_max_size=None):
+        if spool_max_size is None:
+            spool_max_size = self.SPOOL_MAX_SIZE
+        self.spool_max_size = spool_max_size
+        self.size = 0
+        if length is not None and length > spool_max_size:
+            self.file = tempfile.TemporaryFile(mode='w+b')
+        else:
+            self.file = io.BytesIO()
+        self._map = None
+
+    @property
+    def in_memory(self):
+        return isinstance(self.file, io.BytesIO)
+
+    def write(self, data):
+        if self.in_memory and self.size + len(data) > self.spool_max_size:
+            self.rollover()
+        written = self.file.write(data)
+        self.size += written
+        return written
+
+    def rollover(self):
+        if not self.in_memory:
+            return
+        file = tempfile.TemporaryFile(mode='w+b')
+        file.write(self.file.getbuffer())
+        self.file = file
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        self.seek(0)
+        return iter(lambda: self.read(self.CHUNK_SIZE), b'')
+
+    def __bytes__(self):
+        return bytes(self.getbuffer())
+
+    def getbuffer(self):
+        if self.in_memory:
+            return self.file.getbuffer()[:self.size]
+        if not self.size:
+            return memoryview(b'')
+        if self._map is None:
+            self.file.flush()
+            self._map = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        return memoryview(self._map)[:self.size]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.close()
+
+
+class BodyStream:
+    LIMIT = 256 * 1024
+
+    def __init__(self, length, limit=LIMIT, on_drain=None):
+        self.length = length
+        self.limit = limit
+        self.on_drain = on_drain
+        self.chunks = deque()
+        self.buffered = 0
+        self.done = False
+        self.closed = False
+        self.error = None
+        self._stalled = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(lambda: self.read(RequestBody.CHUNK_SIZE), b'')
+
+    def space(self):
+        if self.closed:
+            # nobody reads anymore, the rest of the body is dropped
+            return self.length
+        return max(self.limit - self.buffered, 0)
+
+    def write(self, data):
+        with self._cond:
+            if not self.closed:
+                self.chunks.append(bytes(data))
+                self.buffered += len(data)
+                self._cond.notify_all()
+        return len(data)
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def abort(self, error):
+        with self._cond:
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def stall(self):
+        with self._cond:
+            self._stalled = not self.closed and self.buffered >= self.limit
+            return self._stalled
+
+    def read(self, size=-1):
+        with self._cond:
+            while not self.done and (
+                    not self.chunks or size < 0) and not self.closed:
+                self._cond.wait()
+            if self.error and not self.chunks:
+                raise self.error
+            data = self._take(size)
+            drained = self._stalled and self.buffered < self.limit
+            if drained:
+                self._stalled = False
+        if drained and self.on_drain:
+            self.on_drain()
+        return data
+
+    def _take(self, size):
+        if size < 0:
+            data = b''.join(self.chunks)
+            self.chunks.clear()
+        else:
+            parts = []
+            left = size
+            while self.chunks and left:
+                chunk = self.chunks.popleft()
+                if len(chunk) > left:
+                    self.chunks.appendleft(chunk[left:])
+                    chunk = chunk[:left]
+                parts.append(chunk)
+                left -= len(chunk)
+            data = b''.join(parts)
+        self.buffered -= len(data)
+        return data
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self.chunks.clear()
+            self.buffered = 0
+            stalled, self._stalled = self._stalled, False
+            self._cond.notify_all()
+        if stalled and self.on_drain:
+            self.on_drain()
+
+
+class AsyncBodyStream:
+    def __init__(self, reader, parser):
+        self.reader = reader
+        self.parser = parser
+        self.length = parser.body_remaining
+        self.loop = asyncio.get_running_loop()
+
+    def __len__(self):
+        return self.length
+
+    async def read(self, size=-1):
+        if size < 0:
+            parts = []
+            while True:
+                data = await self.read(RequestBody.CHUNK_SIZE)
+                if not data:
+                    return b''.join(parts)
+                parts.append(data)
+        data = self.parser.take_body(size)
+        if data or not self.parser.streaming:
+            return data
+        # the asyncio reader pauses the transport when its buffer is full
+        data = await self.reader.read(min(size, self.parser.body_remaining))
+        if not data:
+            raise ConnectionError('Connection closed while reading the body')
+        self.parser.buffer += data
+        return self.parser.take_body(size)
+
+    async def __aiter__(self):
+        while True:
+            data = await self.read(RequestBody.CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+    def __iter__(self):
+        # for handlers running on executor threads
+        while True:
+            data = asyncio.run_coroutine_threadsafe(
+                self.read(RequestBody.CHUNK_SIZE), self.loop).result()
+            if not data:
+                return
+            yield data
+
+    async def discard(self):
+        while self.parser.streaming:
+            await self.read(RequestBody.CHUNK_SIZE)
@@ -0,0 +1,181 @@
+import os
+import threading
+from collections import OrderedDict
+
+from ihttpy.exceptions.logger import Logger
+from ihttpy.requests.response import FileBody
+
+try:
+    from diskcache import Cache
+except ImportError:
+    Cache = None
+
+
+class CacheEntry:
+    OVERHEAD = 512
+
+    def __init__(self, stats, response):
+        # (path, stat) of every file the response depends on
+        self.files = [(path, stat.st_mtime_ns, stat.st_size)
+                      for path, stat in stats]
+        self.response = response
+        body = response.body
+        self.cost = self.OVERHEAD + (
+            0 if isinstance(body, FileBody) else len(body or b''))
+
+    def is_valid(self):
+        for path, mtime, size in self.files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if stat.st_mtime_ns != mtime or stat.st_size != size:
+                return False
+        return True
+
+
+class ResponseCache:
+    MAX_SIZE = 64 * 1024 * 1024
+    INLINE_MAX_SIZE = 256 * 1024
+    PROTECTED_RATIO = 0.8
+
+    def __init__(self, max_size=MAX_SIZE, l2_max_size=None,
+                 inline_max_size=INLINE_MAX_SIZE):
+        self.max_size = max_size
+        self.protected_max_size = int(max_size * self.PROTECTED_RATIO)
+        self.inline_max_size = inline_max_size
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.size = 0
+        self.protected_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.l2_hits = 0
+        # bumped by invalidate(), entries of older generations are not read
+        self.generation = 0
+        self.l2 = None
+        if l2_max_size and Cache:
+            self.l2 = Cache(size_limit=int(l2_max_size))
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._get_l1(key)
+        if entry is None and self.l2 is not None:
+            entry = self.l2.get(self._l2_key(key))
+            if entry is not None:
+                with self._lock:
+                    self.l2_hits += 1
+                    self._put_l1(key, entry)
+        if entry is not None and not entry.is_valid():
+            self.discard(key)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry.response
+
+    def set(self, key, path, response):
+        body = response.body
+        # a precompressed sibling may be sent instead of path itself
+        sent = body.path if isinstance(body, FileBody) else path
+        try:
+            stats = [(name, os.stat(name))
+                     for name in dict.fromkeys((path, sent))]
+        except OSError:
+            return
+        stat = stats[-1][1]
+        if (isinstance(body, FileBody) and body.count == stat.st_size
+                and stat.st_size <= self.inline_max_size):
+            response.body = bytes(body)
+            if len(response.body) != stat.st_size:
+                return
+        entry = CacheEntry(stats, response)
+        with self._lock:
+            self._put_l1(key, entry)
+        if self.l2 is not None:
+            self.l2.set(self._l2_key(key), entry)
+        Logger.debug_info('Cache updated for %s', key)
+
+    def discard(self, key):
+        with self._lock:
+            self._pop_l1(key)
+        if self.l2 is not None:
+            self.l2.delete(self._l2_key(key))
+
+    def clear(self):
+        self.invalidate()
+        if self.l2 is not None:
+            self.l2.clear()
+
+    def invalidate(self):
+        # cheap enough for the serving loop, what L2 holds is left on disk
+        # for clear()
+        with self._lock:
+            self.probation.clear()
+            self.protected.clear()
+            self.size = self.protected_size = 0
+            self.generation += 1
+
+    def close(self):
+        if self.l2 is not None:
+            self.l2.close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'l2_hits': self.l2_hits,
+            'entries': len(self.probation) + len(self.protected),
+            'size': self.size,
+        }
+
+    def __len__(self):
+        return len(self.probation) + len(self.protected)
+
+    def _l2_key(self, key):
+        return self.generation, key
+
+    def _get_l1(self, key):
+        entry = self.protected.get(key)
+        if entry is not None:
+            self.protected.move_to_end(key)
+            return entry
+        entry = self.probation.pop(key, None)
+        if entry is None:
+            return None
+        # second hit promotes the entry to the protected segment
+        self.protected[key] = entry
+        self.protected_size += entry.cost
+        while self.protected_size > self.protected_max_size:
+            old_key, old = self.protected.popitem(last=False)
+            self.protected_size -= old.cost
+            self.probation[old_key] = old
+        return entry
+
+    def _put_l1(self, key, entry):
+        self._pop_l1(key)
+        if entry.cost > self.max_size:
+            return
+        self.probation[key] = entry
+        self.size += entry.cost
+        while self.size > self.max_size:
+            segment = self.probation or self.protected
+            _, old = segment.popitem(last=False)
+            self.size -= old.cost
+            if segment is self.protected:
+                self.protected_size -= old.cost
+            self.evictions += 1
+
+    def _pop_l1(self, key):
+        entry = self.probation.pop(key, None)
+        if entry is None:
+            entry = self.protected.pop(key, None)
+            if entry is not None:
+                self.protected_size -= entry.cost
+        if entry is not None:
+            self.size -= entry.cost
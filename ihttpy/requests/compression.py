@@ -0,0 +1,150 @@
+import os
+import zlib
+
+from ihttpy.requests.response import FileBody, Response
+
+WBITS = {'gzip': 31, 'deflate': 15}
+SUFFIXES = {'gzip': '.gz'}
+
+
+class Compressor:
+    LEVEL = 6
+    MIN_SIZE = 1024
+    MAX_STATIC_SIZE = 16 * 1024 * 1024
+    TYPES = ('text/', 'application/json', 'application/javascript',
+             'application/xml', 'application/xhtml+xml', 'image/svg+xml')
+    SKIP_STATUSES = {204, 206, 304}
+
+    def __init__(self, level=LEVEL, min_size=MIN_SIZE, types=TYPES,
+                 max_static_size=MAX_STATIC_SIZE):
+        self.level = level
+        self.min_size = min_size
+        self.types = tuple(types)
+        self.max_static_size = max_static_size
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        if not accept_encoding:
+            return None
+        qs = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.strip().partition(';')
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0
+            qs[coding.strip().lower()] = q
+        star = qs.get('*', 0)
+        best, best_q = None, 0
+        # gzip comes first and wins ties
+        for coding in WBITS:
+            q = qs.get(coding, star)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def accepts_type(self, content_type):
+        content_type = (content_type or '').lower()
+        return any(content_type.startswith(t) for t in self.types)
+
+    def compress(self, data, encoding):
+        c = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+        return c.compress(data) + c.flush()
+
+    def compress_stream(self, chunks, encoding):
+        c = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+        for data in chunks:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            data = c.compress(data)
+            if data:
+                yield data
+        yield c.flush()
+
+    async def compress_async_stream(self, chunks, encoding):
+        c = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[encoding])
+        async for data in chunks:
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            data = c.compress(data)
+            if data:
+                yield data
+        yield c.flush()
+
+    def apply(self, req, res):
+        headers = res.headers
+        if int(res.status) in self.SKIP_STATUSES or \
+                'Content-Encoding' in headers or \
+                not self.accepts_type(headers.get('Content-Type')):
+            return res
+        vary = headers.get('Vary') or ''
+        if 'accept-encoding' in vary.lower():
+            # the response was negotiated already (static files)
+            return res
+        body = res.body
+        if isinstance(body, FileBody):
+            return res
+        stream = res.is_stream()
+        if not stream and len(body or b'') < self.min_size:
+            return res
+        add_vary(headers)
+        encoding = self.negotiate(req.headers.get('Accept-Encoding'))
+        if not encoding:
+            return res
+        if not stream:
+            res.body = self.compress(bytes(body), encoding)
+            headers['Content-Length'] = len(res.body)
+        elif hasattr(body, '__aiter__'):
+            res.body = self.compress_async_stream(body, encoding)
+        else:
+            res.body = self.compress_stream(body, encoding)
+        set_encoding(headers, encoding)
+        return res
+
+    def static(self, req, path, res):
+        # compressed variant of a static file response, None if there is
+        # nothing better than the identity one
+        if int(res.status) != 200 or \
+                not self.accepts_type(res.headers.get('Content-Type')):
+            return None
+        add_vary(res.headers)
+        encoding = self.negotiate(req.headers.get('Accept-Encoding'))
+        if not encoding:
+            return None
+        suffix = SUFFIXES.get(encoding)
+        if suffix and is_fresh(path + suffix, path):
+            body = FileBody(path + suffix)
+        elif self.min_size <= len(res.body) <= self.max_static_size:
+            body = self.compress(bytes(res.body), encoding)
+        else:
+            return None
+        headers = type(res.headers)(res.headers)
+        headers['Content-Length'] = len(body)
+        set_encoding(headers, encoding)
+        return Response(res.status, res.reason, headers, body)
+
+
+def add_vary(headers):
+    vary = headers.get('Vary')
+    if not vary:
+        headers['Vary'] = 'Accept-Encoding'
+    elif 'accept-encoding' not in vary.lower():
+        headers['Vary'] = f'{vary}, Accept-Encoding'
+
+
+def set_encoding(headers, encoding):
+    headers['Content-Encoding'] = encoding
+    etag = headers.get('ETag')
+    if etag and etag.endswith('"'):
+        # a representation per coding, RFC 7232 section 2.3.3
+        headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+
+
+def is_fresh(sibling, path):
+    try:
+        return os.stat(sibling).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
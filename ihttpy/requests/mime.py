@@ -0,0 +1,41 @@
+import mimetypes
+import os
+import threading
+
+import magic
+
+from ihttpy.utils import LRUCache
+
+
+class MimeResolver:
+    CACHE_SIZE = 4096
+    DEFAULT = 'application/octet-stream'
+    # built in table only, /etc/mime.types would make lookups host dependent
+    TYPES = dict(mimetypes.MimeTypes().types_map[True])
+
+    def __init__(self, types=None, cache_size=CACHE_SIZE):
+        self.types = dict(self.TYPES)
+        self.types.update(types or {})
+        self.cache = LRUCache(cache_size)
+        self._magic = None
+        self._lock = threading.Lock()
+
+    def resolve(self, path):
+        _, ext = os.path.splitext(path)
+        content_type = self.types.get(ext.lower())
+        if content_type:
+            return content_type
+        return self.sniff(path)
+
+    def sniff(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        content_type = self.cache.get(key)
+        if content_type is None:
+            with self._lock:
+                # libmagic handles are not safe to share between threads
+                if self._magic is None:
+                    self._magic = magic.Magic(mime=True)
+                content_type = self._magic.from_file(path) or self.DEFAULT
+            self.cache.set(key, content_type)
+        return content_type
@@ -0,0 +1,206 @@
+import os
+import re
+import tempfile
+from collections import deque
+
+from ihttpy.exceptions.errors import Errors
+
+PART = 'part'
+DATA = 'data'
+END = 'end'
+
+BOUNDARY = re.compile(r'boundary=(?:"([^"]+)"|([^;\s]+))', re.I)
+PARAM = re.compile(r';\s*([\w*-]+)\s*=\s*(?:"((?:[^"\\]|\\.)*)"|([^;]*))')
+
+
+def get_boundary(content_type):
+    m = BOUNDARY.search(content_type or '')
+    if not m:
+        raise Errors.MALFORMED_MULTIPART
+    return (m.group(1) or m.group(2)).encode('latin-1')
+
+
+def parse_options(value):
+    kind, _, _ = value.partition(';')
+    options = {}
+    for m in PARAM.finditer(value):
+        v = m.group(2) if m.group(2) is not None else m.group(3).strip()
+        options[m.group(1).lower()] = re.sub(r'\\(.)', r'\1', v)
+    return kind.strip().lower(), options
+
+
+class MultipartParser:
+    MAX_HEADERS_SIZE = 16 * 1024
+
+    PREAMBLE = 0
+    AFTER_BOUNDARY = 1
+    HEADERS = 2
+    BODY = 3
+    DONE = 4
+
+    def __init__(self, boundary):
+        self.delimiter = b'\r\n--' + boundary
+        self.buffer = bytearray()
+        self.state = self.PREAMBLE
+
+    def feed(self, data):
+        self.buffer += data
+        return list(self._parse())
+
+    def close(self):
+        if self.state != self.DONE:
+            raise Errors.MALFORMED_MULTIPART
+
+    def _parse(self):
+        buf = self.buffer
+        delimiter = self.delimiter
+        while True:
+            if self.state == self.BODY:
+                end = buf.find(delimiter)
+                if end == -1:
+                    # the tail may be the start of a delimiter
+                    safe = len(buf) - len(delimiter) + 1
+                    if safe > 0:
+                        yield DATA, bytes(buf[:safe])
+                        del buf[:safe]
+                    return
+                if end:
+                    yield DATA, bytes(buf[:end])
+                del buf[:end + len(delimiter)]
+                self.state = self.AFTER_BOUNDARY
+
+            elif self.state == self.PREAMBLE:
+                # the first delimiter may come without the leading CRLF
+                start = buf.find(delimiter[2:])
+                if start == -1:
+                    del buf[:max(len(buf) - len(delimiter), 0)]
+                    return
+                del buf[:start + len(delimiter) - 2]
+                self.state = self.AFTER_BOUNDARY
+
+            elif self.state == self.AFTER_BOUNDARY:
+                if len(buf) < 2:
+                    return
+                if buf[:2] == b'--':
+                    buf.clear()
+                    self.state = self.DONE
+                    yield END, None
+                    return
+                # transport padding is allowed before the line break
+                end = buf.find(b'\r\n')
+                if end == -1:
+                    if len(buf) > self.MAX_HEADERS_SIZE:
+                        raise Errors.MALFORMED_MULTIPART
+                    return
+                del buf[:end + 2]
+                self.state = self.HEADERS
+
+            elif self.state == self.HEADERS:
+                if buf[:2] == b'\r\n':
+                    end = 0
+                else:
+                    end = buf.find(b'\r\n\r\n')
+                    if end == -1:
+                        if len(buf) > self.MAX_HEADERS_SIZE:
+                            raise Errors.MALFORMED_MULTIPART
+                        return
+                headers = self._headers(bytes(buf[:end]))
+                del buf[:end + (2 if end == 0 else 4)]
+                self.state = self.BODY
+                yield PART, headers
+
+            else:
+                # epilogue after the last delimiter is ignored
+                buf.clear()
+                return
+
+    @staticmethod
+    def _headers(raw):
+        headers = {}
+        for line in raw.split(b'\r\n'):
+            if not line:
+                continue
+            name, sep, value = line.partition(b':')
+            if not sep:
+                raise Errors.MALFORMED_MULTIPART
+            try:
+                value = value.decode('utf-8')
+            except UnicodeDecodeError:
+                value = value.decode('latin-1')
+            headers[name.strip().decode('latin-1').title()] = value.strip()
+        return headers
+
+
+class Part:
+    def __init__(self, reader, headers):
+        self.reader = reader
+        self.headers = headers
+        _, options = parse_options(
+            headers.get('Content-Disposition', ''))
+        self.name = options.get('name')
+        self.filename = options.get('filename')
+        self.content_type = headers.get('Content-Type', 'text/plain')
+
+    def __repr__(self):
+        return f'<Part {self.name} {self.filename or ""}>'
+
+    def __iter__(self):
+        while self.reader._peek()[0] == DATA:
+            yield self.reader._pop()[1]
+
+    def read(self):
+        return b''.join(self)
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for data in self:
+                    file.write(data)
+                    size += len(data)
+            # the target only appears once the part is complete
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return size
+
+
+class MultipartReader:
+    def __init__(self, body, boundary):
+        self.chunks = iter(body)
+        self.parser = MultipartParser(boundary)
+        self.events = deque()
+        self.part = None
+
+    @staticmethod
+    def from_request(req):
+        boundary = get_boundary(req.headers.get('Content-Type'))
+        return MultipartReader(req.body or (), boundary)
+
+    def __iter__(self):
+        while True:
+            if self.part is not None:
+                # skip what is left unread of the previous part
+                for _ in self.part:
+                    pass
+            kind, headers = self._pop()
+            if kind == END:
+                return
+            self.part = Part(self, headers)
+            yield self.part
+
+    def _peek(self):
+        while not self.events:
+            data = next(self.chunks, None)
+            if data is None:
+                # the body ended before the closing delimiter
+                raise Errors.MALFORMED_MULTIPART
+            self.events.extend(self.parser.feed(data))
+        return self.events[0]
+
+    def _pop(self):
+        self._peek()
+        return self.events.popleft()
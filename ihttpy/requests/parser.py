@@ -0,0 +1,165 @@
+from urllib.parse import urlparse, parse_qs
+
+from ihttpy.exceptions.errors import Errors
+from ihttpy.requests.request import Request
+
+
+class RequestParser:
+    MAX_LINE = 64 * 1024
+    MAX_HEADERS = 100
+
+    START_LINE = 0
+    HEADERS = 1
+    BODY = 2
+    STREAM = 3
+
+    def __init__(self, spool_max_size=None, streams=None):
+        self.spool_max_size = spool_max_size
+        self.streams = streams
+        self.buffer = bytearray()
+        self.state = self.START_LINE
+        self.request = None
+        self.sink = None
+        self._body_to_read = 0
+        self._last_header = None
+
+    def feed(self, data=b''):
+        self.buffer += data
+        return self._parse()
+
+    @property
+    def streaming(self):
+        return self.state == self.STREAM
+
+    @property
+    def body_remaining(self):
+        return self._body_to_read
+
+    def take_body(self, size):
+        if not self.streaming:
+            return b''
+        size = min(size, len(self.buffer), self._body_to_read)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self._body_to_read -= size
+        if not self._body_to_read:
+            self.state = self.START_LINE
+        return data
+
+    def pump(self):
+        # moves buffered bytes of a streamed body to its sink, as far as
+        # the sink has room
+        sink = self.sink
+        if sink is not None:
+            data = self.take_body(sink.space())
+            if data:
+                sink.write(data)
+            if not self.streaming:
+                sink.finish()
+                self.sink = None
+        return not self.streaming
+
+    def _parse(self):
+        while True:
+            if self.state == self.STREAM:
+                if not self.pump():
+                    return None
+            if self.state == self.BODY:
+                if not self._read_body():
+                    return None
+                return self._complete()
+
+            end = self.buffer.find(b'\n')
+            if end == -1:
+                if len(self.buffer) > self.MAX_LINE:
+                    raise (Errors.REQ_TOO_LONG
+                           if self.state == self.START_LINE
+                           else Errors.HEADER_TOO_LARGE)
+                return None
+            if end > self.MAX_LINE:
+                raise (Errors.REQ_TOO_LONG if self.state == self.START_LINE
+                       else Errors.HEADER_TOO_LARGE)
+            line = bytes(self.buffer[:end])
+            del self.buffer[:end + 1]
+            if line.endswith(b'\r'):
+                line = line[:-1]
+
+            if self.state == self.START_LINE:
+                # empty lines before the request line are ignored (RFC 7230)
+                if line:
+                    self._start_line(line)
+            elif line:
+                self._header_line(line)
+            elif self._headers_done():
+                return self._complete()
+
+    def _start_line(self, line):
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise Errors.MALFORMED_REQ
+        req = Request()
+        req.method, req.target, req.version = parts
+        req.url = urlparse(req.target)
+        req.path = req.url.path
+        req.query = parse_qs(req.url.query)
+        self.request = req
+        self.state = self.HEADERS
+
+    def _header_line(self, line):
+        headers = self.request.headers
+        if line[:1] in (b' ', b'\t') and self._last_header:
+            value = line.strip().decode('latin-1')
+            headers[self._last_header] += f' {value}'
+            return
+        name, sep, value = line.partition(b':')
+        if not sep or not name.strip():
+            raise Errors.MALFORMED_REQ
+        if len(headers) >= self.MAX_HEADERS:
+            raise Errors.TOO_MANY_HEADERS
+        name = name.strip().decode('latin-1')
+        headers[name] = value.strip().decode('latin-1')
+        self._last_header = name
+
+    def _headers_done(self):
+        req = self.request
+        content_type = req.headers.get('Content-Type') or ''
+        if content_type.startswith('multipart'):
+            req._multipart = True
+
+        length = req.headers.get('Content-Length')
+        if not length:
+            return True
+        try:
+            self._body_to_read = int(length)
+        except ValueError:
+            raise Errors.CONTENT_LENGTH_REQUIRED
+        if self._body_to_read < 0:
+            raise Errors.CONTENT_LENGTH_REQUIRED
+        req._body_to_read = self._body_to_read
+        if not self._body_to_read:
+            return True
+        if self.streams and self.streams(req):
+            # the request goes out now, the body follows through take_body
+            self.state = self.STREAM
+            return True
+        req.prepare_body(self._body_to_read, self.spool_max_size)
+        self.state = self.BODY
+        return False
+
+    def _read_body(self):
+        if self.buffer:
+            size = min(len(self.buffer), self._body_to_read)
+            self.request.body.write(memoryview(self.buffer)[:size])
+            del self.buffer[:size]
+            self._body_to_read -= size
+            self.request._body_to_read = self._body_to_read
+        return not self._body_to_read
+
+    def _complete(self):
+        req = self.request
+        req.filled = True
+        self.request = None
+        if self.state != self.STREAM:
+            self.state = self.START_LINE
+        self._last_header = None
+        return req
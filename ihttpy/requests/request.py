@@ -1,6 +1,6 @@
+import io
 import json
 import re
-import tempfile
 from email.message import Message
 from email.parser import Parser
 from urllib.parse import urlparse, parse_qs
@@ -8,6 +8,7 @@ from urllib.parse import urlparse, parse_qs
 import chardet
 
 from ihttpy.exceptions.logger import Logger
+from ihttpy.requests.body import RequestBody
 
 
 class Request:
@@ -22,13 +23,30 @@ class Request:
         self.path = None
         self.query = None
 
-        self.body_file = tempfile.TemporaryFile(mode='w+b')
+        self.body = None
 
         self._body_to_read = None
 
         self._multipart = False
 
         self.filled = False
+        # perf_counter() of the moment the request got to the server
+        self.started = None
+        # phase timings when the server runs with a profiler
+        self.trace = None
+        # the Routes the server found the handler with
+        self.routes = None
+
+    @property
+    def body_file(self):
+        if self.body is None:
+            return io.BytesIO()
+        return self.body
+
+    def prepare_body(self, length, spool_max_size=None):
+        if self.body is None:
+            self.body = RequestBody(length, spool_max_size)
+        return self.body
 
     def dynamic_fill(self, line: bytes):
         if not self._body_to_read:
@@ -53,6 +71,7 @@ class Request:
                     if self._body_to_read == 0:
                         self.filled = True
                         return True
+                    self.prepare_body(self._body_to_read)
                 else:
                     self.filled = True
                     return True
@@ -112,8 +131,6 @@ class Request:
                 return r
 
     def get_json(self):
-        self.body_file.seek(0)
-        body = self.body_file.read()
-        body = Request.decode(body)
+        body = Request.decode(bytes(self.body_file.getbuffer()))
         Logger.debug_info(f'PUT -> {body}')
         return json.loads(body)
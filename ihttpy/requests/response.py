@@ -1,12 +1,177 @@
+import errno
+import mmap
 import os
+import select
 import socket
-import time
+import threading
 from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
 
 from ihttpy.exceptions.logger import Logger
 
 
+class FileMaps:
+    MAX_MAPS = 32
+
+    def __init__(self, max_maps=MAX_MAPS):
+        self.max_maps = max_maps
+        self.maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def view(self, path, offset, count):
+        stat = os.stat(path)
+        if not stat.st_size or not count:
+            return memoryview(b'')
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            m = self.maps.get(key)
+            if m is not None:
+                self.maps.move_to_end(key)
+        if m is None:
+            with open(path, 'rb') as file:
+                m = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            with self._lock:
+                self.maps[key] = m
+                # evicted maps are unmapped once their last view is gone
+                while len(self.maps) > self.max_maps:
+                    self.maps.popitem(last=False)
+        return memoryview(m)[offset:offset + count]
+
+    def clear(self):
+        with self._lock:
+            self.maps.clear()
+
+
+class FileBody:
+    MAPS = FileMaps()
+
+    def __init__(self, path, offset=0, count=None):
+        self.path = path
+        self.offset = offset
+        if count is None:
+            count = os.path.getsize(path) - offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __bytes__(self):
+        return bytes(self.view())
+
+    def __repr__(self):
+        return f'<FileBody {self.path} [{self.offset}:+{self.count}]>'
+
+    def view(self):
+        return self.MAPS.view(self.path, self.offset, self.count)
+
+    def open(self):
+        return FileTransfer(open(self.path, 'rb'), self.offset, self.count)
+
+
+class MultiBody:
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __bytes__(self):
+        return b''.join(bytes(part) for part in self.parts)
+
+    def __repr__(self):
+        return f'<MultiBody {len(self.parts)} parts>'
+
+
+class FileTransfer:
+    CHUNK_SIZE = 64 * 1024
+    SENDFILE_UNSUPPORTED = {errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK,
+                            errno.EOPNOTSUPP}
+
+    def __init__(self, file, offset, count):
+        self.file = file
+        self.offset = offset
+        self.remaining = count
+        self._pending = b''
+
+    def send(self, client):
+        if hasattr(os, 'sendfile') and hasattr(client, 'fileno'):
+            try:
+                sent = os.sendfile(client.fileno(), self.file.fileno(),
+                                   self.offset, self.remaining)
+            except OSError as e:
+                if e.errno not in self.SENDFILE_UNSUPPORTED:
+                    raise
+                sent = self._send_copy(client)
+        else:
+            sent = self._send_copy(client)
+        if sent == 0:
+            # file got shorter than announced, nothing more to send
+            self.remaining = 0
+        self.offset += sent
+        self.remaining -= sent
+        return sent
+
+    def _send_copy(self, client):
+        if not self._pending:
+            self.file.seek(self.offset)
+            self._pending = self.file.read(
+                min(self.remaining, self.CHUNK_SIZE))
+        sent = client.send(self._pending)
+        self._pending = self._pending[sent:]
+        return sent
+
+    def close(self):
+        self.file.close()
+
+
+class ChunkedTransfer:
+    LAST_CHUNK = b'0\r\n\r\n'
+
+    def __init__(self, chunks, chunked=True):
+        self.chunks = iter(chunks)
+        self.chunked = chunked
+        self.remaining = True
+        self._pending = b''
+        self._exhausted = False
+
+    @staticmethod
+    def frame(data, chunked=True):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not chunked:
+            return data
+        return b'%x\r\n%b\r\n' % (len(data), data)
+
+    def send(self, client):
+        # the next chunk is only produced once the previous one is sent
+        if not self._pending:
+            self._pending = memoryview(self._next())
+        sent = client.send(self._pending) if self._pending else 0
+        self._pending = self._pending[sent:]
+        if self._exhausted and not self._pending:
+            self.remaining = False
+        return sent
+
+    def _next(self):
+        for data in self.chunks:
+            if data:
+                return self.frame(data, self.chunked)
+        self._exhausted = True
+        return self.LAST_CHUNK if self.chunked else b''
+
+    def close(self):
+        close = getattr(self.chunks, 'close', None)
+        if close:
+            close()
+
+
 class Response:
+    SEND_TIMEOUT = 1
+    WEAK_ETAGS = False
+    MAX_RANGES = 16
+    NOT_MODIFIED_HEADERS = {'cache-control', 'content-location', 'date',
+                            'expires', 'vary'}
+
     def __init__(self, status, reason, headers=None, body=None):
         self.status = status
         self.reason = reason
@@ -27,40 +192,197 @@ class Response:
                          ('Content-Length', len(body))]), body)
 
     @staticmethod
-    def build_file_res(req, path, content_type, add_headers=None):
+    def build_file_res(req, path, content_type, add_headers=None,
+                       conditional=True):
         connection = req.headers.get('Connection')
-        start, end, size = None, None, None
-
-        range_header = req.headers.get('Range')
-        with open(path, 'rb') as file:
-            if range_header:
-                _, v = range_header.split('=')
-                start, end = v.split('-', maxsplit=1)
-                if not end:
-                    end = os.path.getsize(path)
-                if not start:
-                    start = int(end)
-                    end = os.path.getsize(path)
-                    start = end - start
-                start, end = int(start), int(end)
-                file.seek(start, 0)
-                body = file.read(end - start)
-            else:
-                body = file.read()
-        filename = os.path.basename(path)
-        headers = {('Content-Type', f'{content_type}'),
-                   ('Content-Disposition', f'inline; filename={filename}'),
-                   ('Content-Length', len(body)), ('Connection', connection)}
-        if range_header:
-            headers.add(('Content-Range',
-                         f'{start}-{end}/{os.stat(path).st_size}'))
-        headers = OrderedDict(headers)
 
+        stat = os.stat(path)
+        size = stat.st_size
+        validators = Response.file_validators(stat)
+        if conditional and Response.is_not_modified(req, *validators):
+            return Response.build_not_modified(
+                validators, connection, add_headers)
+
+        ranges = None
+        if Response.range_applies(req, *validators):
+            ranges = Response.parse_ranges(req.headers['Range'], size)
+        if ranges == []:
+            headers = OrderedDict([('Content-Range', f'bytes */{size}'),
+                                   ('Content-Length', 0),
+                                   ('Connection', connection)])
+            return Response(416, 'Range Not Satisfiable', headers, b'')
+
+        filename = os.path.basename(path)
+        etag, last_modified = validators
+        headers = OrderedDict([
+            ('Content-Type', f'{content_type}'),
+            ('Content-Disposition', f'inline; filename={filename}'),
+            ('Content-Length', size), ('Connection', connection),
+            ('Accept-Ranges', 'bytes'),
+            ('ETag', etag), ('Last-Modified', last_modified)])
         for (name, value) in add_headers or []:
             headers[name] = value
-        if range_header:
-            return Response(206, 'Partial Content', headers, body)
-        return Response(200, 'OK', headers, body)
+
+        if not ranges:
+            return Response(200, 'OK', headers, FileBody(path, 0, size))
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            body = FileBody(path, start, end - start + 1)
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            boundary = os.urandom(12).hex()
+            body = Response.byteranges(path, headers['Content-Type'],
+                                       ranges, size, boundary)
+            headers['Content-Type'] = \
+                f'multipart/byteranges; boundary={boundary}'
+        headers['Content-Length'] = len(body)
+        return Response(206, 'Partial Content', headers, body)
+
+    @staticmethod
+    def range_applies(req, etag, last_modified):
+        if 'Range' not in req.headers or \
+                req.method not in (None, 'GET'):
+            return False
+        if_range = req.headers.get('If-Range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', 'W/')):
+            # only a strong validator can select a range, RFC 7233 3.2
+            return not etag.startswith('W/') and if_range == etag
+        since = Response._parse_date(if_range)
+        return since is not None and \
+            since == Response._parse_date(last_modified)
+
+    @staticmethod
+    def parse_ranges(header, size):
+        unit, sep, spec = header.partition('=')
+        if not sep or unit.strip().lower() != 'bytes':
+            return None
+        ranges = []
+        specs = [s.strip() for s in spec.split(',') if s.strip()]
+        if not specs or len(specs) > Response.MAX_RANGES:
+            return None
+        for item in specs:
+            first, dash, last = item.partition('-')
+            first, last = first.strip(), last.strip()
+            if not dash or not (first.isdigit() or last.isdigit()) or \
+                    (first and not first.isdigit()) or \
+                    (last and not last.isdigit()):
+                # a syntactically invalid header is ignored
+                return None
+            if not first:
+                suffix = int(last)
+                if suffix:
+                    ranges.append((max(size - suffix, 0), size - 1))
+                continue
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+            if start < size:
+                ranges.append((start, end))
+        return [r for r in ranges if r[0] <= r[1]]
+
+    @staticmethod
+    def byteranges(path, content_type, ranges, size, boundary):
+        parts = []
+        for start, end in ranges:
+            parts.append(
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+                .encode('latin-1'))
+            parts.append(FileBody(path, start, end - start + 1))
+        parts.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+        # the first delimiter does not need the leading CRLF
+        parts[0] = parts[0][2:]
+        return MultiBody(parts)
+
+    @staticmethod
+    def file_validators(stat):
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if Response.WEAK_ETAGS:
+            etag = f'W/{etag}'
+        return etag, formatdate(stat.st_mtime, usegmt=True)
+
+    @staticmethod
+    def is_not_modified(req, etag, last_modified):
+        if req.method not in ('GET', 'HEAD'):
+            return False
+        if_none_match = req.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if if_none_match.strip() == '*':
+                return True
+            if not etag:
+                return False
+            # weak comparison, RFC 7232 section 2.3.2
+            etag = Response._opaque_tag(etag)
+            return any(Response._opaque_tag(tag) == etag
+                       for tag in if_none_match.split(','))
+        if_modified_since = req.headers.get('If-Modified-Since')
+        if if_modified_since and last_modified:
+            since = Response._parse_date(if_modified_since)
+            modified = Response._parse_date(last_modified)
+            return since is not None and modified is not None and \
+                modified <= since
+        return False
+
+    @staticmethod
+    def build_not_modified(validators, connection=None, add_headers=None):
+        etag, last_modified = validators
+        headers = OrderedDict([('ETag', etag),
+                               ('Last-Modified', last_modified),
+                               ('Connection', connection)])
+        for (name, value) in add_headers or []:
+            if name.lower() in Response.NOT_MODIFIED_HEADERS:
+                headers[name] = value
+        return Response(304, 'Not Modified', headers)
+
+    @staticmethod
+    def check_not_modified(req, res):
+        validators = (res.headers.get('ETag'),
+                      res.headers.get('Last-Modified'))
+        if validators[0] is None and validators[1] is None:
+            return None
+        if Response.is_not_modified(req, *validators):
+            return Response.build_not_modified(
+                validators, req.headers.get('Connection'),
+                [(k, v) for k, v in res.headers.items()])
+        return None
+
+    @staticmethod
+    def _opaque_tag(tag):
+        tag = tag.strip()
+        return tag[2:] if tag.startswith('W/') else tag
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    @staticmethod
+    def is_stream_body(body):
+        if body is None or isinstance(
+                body, (bytes, bytearray, memoryview, str, FileBody,
+                       MultiBody)):
+            return False
+        return hasattr(body, '__iter__') or hasattr(body, '__aiter__')
+
+    def is_stream(self):
+        return Response.is_stream_body(self.body)
+
+    def start_stream(self, chunked=True):
+        self.headers.pop('Content-Length', None)
+        if chunked:
+            self.headers['Transfer-Encoding'] = 'chunked'
+        else:
+            # without chunked coding the end of the body is the end of
+            # the connection
+            self.headers.pop('Transfer-Encoding', None)
+            self.headers['Connection'] = 'close'
 
     def headers_to_str(self):
         return ''.join(f'{k}: {v}\r\n' for (k, v) in self.headers.items())
@@ -68,6 +390,24 @@ class Response:
     def status_to_str(self):
         return f'HTTP/1.1 {self.status} {self.reason}\r\n'
 
+    def head_to_bytes(self):
+        return b''.join((
+            self.status_to_str().encode('utf-8'),
+            self.headers_to_str().encode('utf-8'),
+            b'\r\n'
+        ))
+
+    def to_bytes(self):
+        if self.is_stream():
+            self.start_stream()
+            return self.head_to_bytes() + b''.join(
+                ChunkedTransfer.frame(data) for data in self.body if data
+            ) + ChunkedTransfer.LAST_CHUNK
+        body = self.body or b''
+        if isinstance(body, (FileBody, MultiBody)):
+            body = bytes(body)
+        return self.head_to_bytes() + body
+
     @staticmethod
     def send_response(client, *res):
         try:
@@ -78,23 +418,17 @@ class Response:
             return
 
         for response in res:
-            contents = b''.join((
-                response.status_to_str().encode('utf-8'),
-                response.headers_to_str().encode('utf-8'),
-                b'\r\n',
-                response.body or b''
-            ))
+            contents = memoryview(response.to_bytes())
             while contents:
                 try:
                     bytes_sent = client.send(contents)
                     contents = contents[bytes_sent:]
                     Logger.debug_info(f'{bytes_sent}B sent to {ip}')
+                except BlockingIOError:
+                    Logger.error('Resource temporarily unavailable waiting')
+                    select.select([], [client], [], Response.SEND_TIMEOUT)
                 except socket.error as e:
-                    if e.errno == 35:
-                        Logger.error(
-                            'Resource temporarily unavailable Sleeping')
-                        time.sleep(0.1)
-                    elif e.errno == 32:
+                    if e.errno == 32:
                         msg = f'client stopped receiving'
                         Logger.error(msg)
                         raise
@@ -1,6 +1,5 @@
 import urllib
-
-import magic
+from collections import OrderedDict
 
 from ihttpy.exceptions.errors import Errors
 from ihttpy.exceptions.logger import Logger
@@ -9,32 +8,50 @@ from ihttpy.requests.response import Response
 from ihttpy.httpserver import Server
 
 
-EXPIRE = 1
-
-
 def handle(req: Request, server: Server):
     if req.path.startswith('/') and req.method == 'GET':
-        rules = server.configurator._get_rules()
+        # the routes the handler was found with, not whatever is live now
+        routes = req.routes or server.routes
+        router, rules = routes.router, routes.rules
 
         path = urllib.parse.unquote(req.path)
-        res = server.cache.get(path)
-        if res:
-            Logger.debug_info(f'Cache found for {path}')
-            return res
-        page = server.router.find_page_description(path, rules)
-        destination = server.router.get_destination(path, rules, True)
+        cacheable = 'Range' not in req.headers
+        compressor = server.compressor
+        key = path
+        if cacheable and compressor:
+            encoding = compressor.negotiate(req.headers.get('Accept-Encoding'))
+            if encoding:
+                # every coding is a separate representation
+                key = (path, encoding)
+        if cacheable:
+            res = server.cache.get(key)
+            if res:
+                Logger.debug_info('Cache found for %s', path)
+                return Response.check_not_modified(req, res) or reuse(res, req)
+        page = router.find_page_description(path, rules)
+        destination = router.get_destination(path, rules, True)
         content_type = page.get_mime()
         if destination:
             if not content_type:
-                mime = magic.Magic(mime=True)
-                content_type = mime.from_file(destination)
-                server.cache.close()
+                content_type = server.mime.resolve(destination)
+            negotiated = cacheable and compressor
+            # the validators of the coding chosen below are compared then
             res = Response.build_file_res(
                 req, destination, content_type,
-                add_headers=page.get_headers())
-            if int(res.status) == 200:
-                Logger.debug_info(f'Updating cache for {path}')
-                server.cache.set(path, res, expire=EXPIRE, tag='data')
-                server.cache.cull()
+                add_headers=page.get_headers(), conditional=not negotiated)
+            if negotiated:
+                res = compressor.static(req, destination, res) or res
+            if cacheable and int(res.status) == 200:
+                Logger.debug_info('Updating cache for %s', path)
+                server.cache.set(key, destination, res)
+            if negotiated:
+                return Response.check_not_modified(req, res) or res
             return res
         raise Errors.NOT_FOUND
+
+
+def reuse(res: Response, req: Request):
+    headers = OrderedDict(res.headers)
+    if 'Connection' in headers:
+        headers['Connection'] = req.headers.get('Connection')
+    return Response(res.status, res.reason, headers, res.body)
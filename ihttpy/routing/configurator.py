@@ -22,12 +22,20 @@ class Configurator:
         self.refresh()
 
     def refresh(self):
+        self.apply(*self.load())
+
+    def load(self):
+        # a fresh config and rules, the ones in use are not touched
         with open(self.cfg_path) as cfg:
             config = json.load(cfg)
-            self.check(config)
-            self.config = config
-            for route, description in self.config.get('rules').items():
-                self.rules[route] = Page(description, {})
+        self.check(config)
+        rules = {route: Page(description, {})
+                 for route, description in config.get('rules').items()}
+        return config, rules
+
+    def apply(self, config, rules):
+        # readers get either the old rules or the new ones, never a mix
+        self.config, self.rules = config, rules
 
     def _get_rules(self):
         return self.rules
@@ -69,7 +77,7 @@ class ConfiguratorRouteState:
         self.__parent__: FluentConfigurator = parent
         self._methods: Method = methods
 
-    def at(self, url):
+    def at(self, url, inline=False, stream_body=False):
         def inner(func):
             page = self.__parent__._rules.get(url)
             if page:
@@ -77,6 +85,8 @@ class ConfiguratorRouteState:
                     page.handler[m.to_simple_str()] = func.__name__
                     page.handlers[m] = func
                     page.func_names[m.to_simple_str()] = func.__name__
+                page.inline = page.inline or inline
+                page.stream_body = page.stream_body or stream_body
             else:
                 handler = {
                     'source': os.path.abspath(inspect.getfile(func)),
@@ -86,7 +96,9 @@ class ConfiguratorRouteState:
                     handler[m.to_simple_str()] = func.__name__
                     method_handlers[m] = func
                 desc = {
-                    'handler': handler
+                    'handler': handler,
+                    'inline': inline,
+                    'stream_body': stream_body,
                 }
                 page_description = Page(desc, method_handlers)
                 self.__parent__._rules[url] = page_description
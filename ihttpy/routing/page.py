@@ -12,6 +12,8 @@ class Page:
         self.mime = None
         self.headers = None
         self.handler_path = None
+        self.inline = False
+        self.stream_body = False
         self.func_names = {}
         if not isinstance(config_description, dict):
             self.path = config_description
@@ -20,6 +22,8 @@ class Page:
         self.path = config_description.get('path')
         self.mime = config_description.get('mime')
         self.headers = config_description.get('headers')
+        self.inline = config_description.get('inline', False)
+        self.stream_body = config_description.get('stream_body', False)
 
         self.handler = config_description.get('handler') or {}
         self.handler_path = self.handler.get('source')
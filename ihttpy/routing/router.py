@@ -1,43 +1,65 @@
 import os
 import re
+import sys
 
 from ihttpy.exceptions.errors import Errors
 from ihttpy.requests.request import Request
 from ihttpy.routing.page import Page
+from ihttpy.routing.table import RouteTable, to_pattern
 from ihttpy.exceptions.logger import Logger
 from ihttpy.defenitions import ROOT_DIR, SUPPORTED_METHODS
 from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_file_location
+
+
+class Routes:
+    # what a request is routed with, replaced as a whole on a reload so a
+    # request never sees the router of one config next to the rules of
+    # another
+    __slots__ = ('config', 'rules', 'router')
+
+    def __init__(self, config, rules, router):
+        self.config = config
+        self.rules = rules
+        self.router = router
 
 
 class Router:
-    URL_TO_RULE = {}
+    CACHE_SIZE = RouteTable.CACHE_SIZE
 
-    def __init__(self):
-        self.reg_sub = re.compile(r'(?P<txt>.*?)\[(?P<group>.*?)\]')
+    def __init__(self, cache_size=CACHE_SIZE):
         self.handlers = {}
+        self.mtimes = {}
+        self.cache_size = cache_size
+        self.table = None
+
+    def compile(self, rules) -> RouteTable:
+        self.table = RouteTable(rules, self.cache_size)
+        return self.table
+
+    def get_table(self, rules) -> RouteTable:
+        table = self.table
+        if table is None or not table.is_fresh(rules):
+            table = self.compile(rules)
+        return table
 
     def get_destination(self, url, rules, absolute=True):
-        Logger.debug_info(f'Url processing {url}')
-        for key, page in rules.items():
-            path = page.get_path()
-
-            rule = self.to_template(key)
-            match = re.fullmatch(rule, url)
-            if match:
-                for k, v in match.groupdict().items():
-                    pattern = re.compile(rf'\[{k}\]')
-                    path = re.sub(pattern, v, path)
-
-                if absolute:
-                    path = self.to_abs_path(path)
-
-                self.URL_TO_RULE[url] = key
-                if os.path.isfile(path):
-                    Logger.debug_info(f'Path found {path}', extra={'url': url})
-                    return path
-                else:
-                    Logger.error(f'Path matched by rule {rule} but file not '
-                                 f'found {path}', extra={'url': url})
+        Logger.debug_info('Url processing %s', url)
+        table = self.get_table(rules)
+        for i, groups in table.matches(url):
+            path = table.page(i).get_path()
+            for k, v in groups.items():
+                path = path.replace(f'[{k}]', v)
+
+            if absolute:
+                path = self.to_abs_path(path)
+
+            if os.path.isfile(path):
+                Logger.debug_info('Path found %s', path, extra={'url': url})
+                return path
+            else:
+                Logger.error('Path matched by rule %s but file not found %s',
+                             table.keys[i], path, extra={'url': url})
         raise FileNotFoundError(url, rules)
 
     def to_abs_path(self, path):
@@ -46,40 +68,79 @@ class Router:
         return os.path.join(ROOT_DIR, path)
 
     def to_template(self, key):
-        key = re.sub(r'\.', r'\.', key)
-        replaced = re.sub(self.reg_sub, rf'\1(?P<\2>\\w*)', key)
-        reg_rep = re.compile(replaced)
-        return reg_rep
+        return re.compile(to_pattern(key))
 
     def get_type(self, url, rules):
-        if url in self.URL_TO_RULE:
-            page: Page = rules[self.URL_TO_RULE[url]]
+        table = self.get_table(rules)
+        found = table.match(url)
+        if found:
+            page: Page = table.page(found[0])
             return page.mime
 
-    def load_handlers(self, rules):
+    def load_handlers(self, rules, previous=None):
+        # modules of previous that did not change on disk are reused
         for key, page in rules.items():
             path = page.get_abs_handler_path()
-            if path and path not in self.handlers:
-                try:
-                    module = SourceFileLoader(f'{key}.handler', path)\
-                        .load_module()
-                    self.handlers[path] = module
-                    Logger.debug_info(f'Handler {path} imported',
-                                      extra={'url': page.get_path()})
-                except ImportError as e:
-                    Logger.exception('Handler module import failed')
+            if not path or path in self.handlers:
+                continue
+            mtime = self.get_mtime(path)
+            if previous is not None and path in previous.handlers and \
+                    previous.mtimes.get(path) == mtime:
+                self.handlers[path] = previous.handlers[path]
+                self.mtimes[path] = mtime
+                continue
+            try:
+                self.handlers[path] = self.import_handler(f'{key}.handler',
+                                                          path)
+                self.mtimes[path] = mtime
+                Logger.debug_info(f'Handler {path} imported',
+                                  extra={'url': page.get_path()})
+            except ImportError as e:
+                Logger.exception('Handler module import failed')
+
+    @staticmethod
+    def import_handler(name, path):
+        # always a new module object, functions already handed out keep
+        # the globals of the version they were defined in
+        spec = spec_from_file_location(
+            name, path, loader=SourceFileLoader(name, path))
+        module = module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[name] = module
+        return module
+
+    @staticmethod
+    def get_mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except (OSError, TypeError):
+            return None
 
     def find_page_description(self, url, rules) -> Page:
-        for key, page in rules.items():
-            if re.fullmatch(self.to_template(key), url):
-                return page
+        table = self.get_table(rules)
+        found = table.match(url)
+        if found:
+            return table.page(found[0])
         raise Errors.NOT_FOUND
 
+    def find_rule(self, url, rules):
+        # the rule key of the route serving url, None if nothing matches
+        if url is None:
+            return None
+        table = self.get_table(rules)
+        found = table.match(url)
+        if found:
+            return table.keys[found[0]]
+        return None
+
     def find_handler(self, req: Request, rules):
+        return self.find_route(req, rules)[1]
+
+    def find_route(self, req: Request, rules):
         url = req.url.path
 
+        page = self.find_page_description(url, rules)
         try:
-            page = self.find_page_description(url, rules)
             path = page.get_abs_handler_path()
             handler_module = self.handlers.get(path)
             if not handler_module:
@@ -88,18 +149,16 @@ class Router:
                 f_name = page.get_function_name_for_method(req.method)
             else:
                 raise Errors.METHOD_NOT_SUPPORTED
-            Logger.debug_info(f'Custom handler found: {f_name}(...) in '
-                              f'{handler_module.__dict__["__file__"]}')
-            return handler_module.__dict__[f_name]
+            Logger.debug_info('Custom handler found: %s(...) in %s', f_name,
+                              handler_module.__file__)
+            return page, handler_module.__dict__[f_name]
         except Exception as e:
             if e == Errors.METHOD_NOT_SUPPORTED:
                 raise e
             elif e == Errors.NO_HANDLER:
                 Logger.debug_info(e)
-                Logger.debug_info(f'Default file sender available only')
+                Logger.debug_info('Default file sender available only')
                 from ihttpy.requests.sender import handle
-                return handle
+                return page, handle
             else:
                 raise e
-
-
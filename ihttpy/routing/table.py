@@ -0,0 +1,103 @@
+import re
+
+from ihttpy.utils import LRUCache
+
+TEMPLATE_GROUP = re.compile(r'(?P<txt>.*?)\[(?P<group>.*?)\]')
+REGEX_CHARS = frozenset('\\^$*+?{}[]()|')
+QUANTIFIERS = frozenset('*+?{')
+MISSING = object()
+
+
+def to_pattern(key):
+    key = re.sub(r'\.', r'\.', key)
+    return re.sub(TEMPLATE_GROUP, rf'\1(?P<\2>\\w*)', key)
+
+
+def literal_prefix(key):
+    if '|' in key:
+        return ''
+    for n, char in enumerate(key):
+        if char in REGEX_CHARS:
+            # a quantifier makes the char before it optional as well
+            return key[:n - 1 if char in QUANTIFIERS else n]
+    return key
+
+
+class RouteTable:
+    CACHE_SIZE = 4096
+
+    def __init__(self, rules, cache_size=CACHE_SIZE):
+        self.rules = rules
+        self.size = len(rules)
+        self.keys = list(rules)
+        self.pages = list(rules.values())
+        self.templates = []
+        self.literals = {}
+        self.trie = {}
+        self.cache = LRUCache(cache_size)
+
+        for i, key in enumerate(self.keys):
+            self.templates.append(re.compile(to_pattern(key)))
+            if REGEX_CHARS.isdisjoint(key):
+                self.literals[key] = i
+            else:
+                self._insert(literal_prefix(key), i)
+
+        # a pattern rule declared before a literal one wins for its url
+        for key, i in self.literals.items():
+            found = self._match_pattern(key)
+            if found and found[0] < i:
+                self.literals[key] = found[0]
+
+    def _insert(self, prefix, i):
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(i)
+
+    def is_fresh(self, rules):
+        return rules is self.rules and len(rules) == self.size
+
+    def match(self, url):
+        found = self.cache.get(url, MISSING)
+        if found is MISSING:
+            found = self._match(url)
+            self.cache.set(url, found)
+        return found
+
+    def matches(self, url):
+        found = self.match(url)
+        if not found:
+            return
+        yield found
+        for i in range(found[0] + 1, self.size):
+            m = self.templates[i].fullmatch(url)
+            if m:
+                yield i, m.groupdict()
+
+    def page(self, i):
+        return self.pages[i]
+
+    def candidates(self, url):
+        node = self.trie
+        found = list(node.get(None, ()))
+        for char in url:
+            node = node.get(char)
+            if node is None:
+                break
+            found.extend(node.get(None, ()))
+        found.sort()
+        return found
+
+    def _match(self, url):
+        i = self.literals.get(url)
+        if i is not None:
+            return i, self.templates[i].fullmatch(url).groupdict()
+        return self._match_pattern(url)
+
+    def _match_pattern(self, url):
+        for i in self.candidates(url):
+            m = self.templates[i].fullmatch(url)
+            if m:
+                return i, m.groupdict()
+        return None
@@ -0,0 +1,51 @@
+class TimerWheel:
+    TICK = 0.5
+    SLOTS = 512
+
+    def __init__(self, tick=TICK, slots=SLOTS, now=0.0):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.deadlines = {}
+        self.current = int(now / tick)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def touch(self, key, timeout, now):
+        # moving the key between slots is deferred until its slot comes up
+        if key in self.deadlines:
+            self.deadlines[key][0] = now + timeout
+        else:
+            self._insert(key, now + timeout)
+
+    def cancel(self, key):
+        entry = self.deadlines.pop(key, None)
+        if entry:
+            self.slots[entry[1]].discard(key)
+
+    def advance(self, now):
+        expired = []
+        target = int(now / self.tick)
+        steps = min(target - self.current, len(self.slots))
+        self.current = target - steps
+        for _ in range(steps):
+            self.current += 1
+            slot = self.slots[self.current % len(self.slots)]
+            for key in list(slot):
+                deadline = self.deadlines[key][0]
+                slot.discard(key)
+                if deadline <= now:
+                    del self.deadlines[key]
+                    expired.append(key)
+                else:
+                    self._insert(key, deadline)
+        return expired
+
+    def _insert(self, key, deadline):
+        tick = max(int(deadline / self.tick), self.current + 1)
+        index = tick % len(self.slots)
+        self.slots[index].add(key)
+        self.deadlines[key] = [deadline, index]
@@ -1,6 +1,8 @@
 import functools
 import sys
+import threading
 import warnings
+from collections import OrderedDict
 
 
 def deprecated_after(major: int, minor: int = 0, micro: int = 0):
@@ -21,3 +23,35 @@ def deprecated_after(major: int, minor: int = 0, micro: int = 0):
                 return func(*args, **kwargs)
             return new_func
     return inner
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
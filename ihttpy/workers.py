@@ -0,0 +1,131 @@
+import os
+import signal
+import time
+
+from ihttpy.exceptions.logger import Logger
+
+
+class Master:
+    RESPAWN_DELAY = 1
+    STOP_TIMEOUT = 10
+    STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT)
+
+    def __init__(self, server, workers, reuse_port=False):
+        self.server = server
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.pids = {}
+        self._running = True
+        self._restart = False
+        self._previous_handlers = {}
+
+    def run(self):
+        self._install_signals()
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            if self.reuse_port:
+                # workers bind their own sockets, the master one would
+                # only steal connections it never accepts
+                self.server.server.close()
+            while self._running:
+                self.reap()
+                if self._restart:
+                    self._restart = False
+                    self.kill(signal.SIGTERM)
+                while self._running and len(self.pids) < self.workers:
+                    self.spawn()
+                time.sleep(self.server.refresh_rate)
+        finally:
+            self.stop()
+            self._restore_signals()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        born = self.pids.get(pid)
+        self.pids[pid] = time.monotonic()
+        Logger.debug_info(f'Worker {pid} spawned'
+                          f'{" again" if born else ""}')
+        return pid
+
+    def reap(self):
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.pids.clear()
+                return
+            if not pid:
+                return
+            born = self.pids.pop(pid, None)
+            Logger.debug_info(f'Worker {pid} exited with status {status}')
+            if (self._running and born is not None and
+                    time.monotonic() - born < self.RESPAWN_DELAY):
+                time.sleep(self.RESPAWN_DELAY)
+
+    def kill(self, sig):
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.pids.pop(pid, None)
+
+    def stop(self):
+        self._running = False
+        self.kill(signal.SIGTERM)
+        deadline = time.monotonic() + self.STOP_TIMEOUT
+        while self.pids and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(self.server.refresh_rate)
+        self.kill(signal.SIGKILL)
+        while self.pids:
+            self.reap()
+            time.sleep(self.server.refresh_rate)
+
+    def _run_worker(self):
+        code = 0
+        try:
+            self._restore_signals()
+            for sig in self.STOP_SIGNALS:
+                signal.signal(sig, self._stop_worker)
+            self.server._become_worker(self.reuse_port)
+            self.server.run()
+        except Exception:
+            Logger.exception('Worker failed')
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop_worker(self, signum, frame):
+        self.server.shutdown()
+
+    def _install_signals(self):
+        for sig in self.STOP_SIGNALS:
+            self._previous_handlers[sig] = signal.signal(sig, self._on_stop)
+        self._previous_handlers[signal.SIGHUP] = signal.signal(
+            signal.SIGHUP, self._on_hup)
+        profiler = getattr(self.server, 'profiler', None)
+        if profiler and profiler.dump_signal is not None:
+            # every worker dumps the profiles it collected
+            sig = profiler.dump_signal
+            self._previous_handlers[sig] = signal.signal(
+                sig, lambda signum, frame: self.kill(signum))
+
+    def _restore_signals(self):
+        for sig, handler in self._previous_handlers.items():
+            signal.signal(sig, handler)
+
+    def _on_stop(self, signum, frame):
+        Logger.debug_info(f'Master got signal {signum}, stopping workers')
+        self._running = False
+
+    def _on_hup(self, signum, frame):
+        if getattr(self.server, 'hot_reload', False):
+            # workers reload the config without dropping connections
+            Logger.debug_info('Master got SIGHUP, reloading workers')
+            self.kill(signal.SIGHUP)
+            return
+        Logger.debug_info('Master got SIGHUP, restarting workers')
+        self._restart = True
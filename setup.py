@@ -38,7 +38,8 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/irusland/httpserver",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=('benchmarks',
+                                               'benchmarks.*')),
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -46,6 +47,9 @@ setuptools.setup(
     ],
     python_requires='>=3.6',
     install_requires=required,
+    entry_points={
+        'console_scripts': ['ihttpy=ihttpy.__main__:main'],
+    },
     cmdclass={
         'verify': VerifyVersionCommand,
     }
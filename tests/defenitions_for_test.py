@@ -1,4 +1,7 @@
+import json
 import os
+import socket
+import tempfile
 
 
 TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,7 +24,8 @@ CONFIG_PATTERN = (f'''
       "handler": {{
         "source": "{handlers_dir}/upload.py",
         "POST": "save"
-      }}
+      }},
+      "stream_body": true
     }},
     "/show_files": {{
       "handler": {{
@@ -29,6 +33,59 @@ CONFIG_PATTERN = (f'''
         "GET": "show"
       }}
     }},
+    "/sleep": {{
+      "handler": {{
+        "source": "{handlers_dir}/slow.py",
+        "GET": "sleep"
+      }}
+    }},
+    "/sleep_inline": {{
+      "handler": {{
+        "source": "{handlers_dir}/slow.py",
+        "GET": "sleep"
+      }},
+      "inline": true
+    }},
+    "/pid": {{
+      "handler": {{
+        "source": "{handlers_dir}/slow.py",
+        "GET": "pid"
+      }},
+      "inline": true
+    }},
+    "/async": {{
+      "handler": {{
+        "source": "{handlers_dir}/coroutines.py",
+        "GET": "hello",
+        "POST": "echo"
+      }}
+    }},
+    "/stream": {{
+      "handler": {{
+        "source": "{handlers_dir}/stream.py",
+        "GET": "numbers"
+      }}
+    }},
+    "/astream": {{
+      "handler": {{
+        "source": "{handlers_dir}/stream.py",
+        "GET": "anumbers"
+      }}
+    }},
+    "/digest": {{
+      "handler": {{
+        "source": "{handlers_dir}/stream.py",
+        "POST": "digest"
+      }},
+      "stream_body": true
+    }},
+    "/adigest": {{
+      "handler": {{
+        "source": "{handlers_dir}/stream.py",
+        "POST": "adigest"
+      }},
+      "stream_body": true
+    }},
     "/my_guest_book": "{data_dir}/my_guest_book.html",
     "/posts": {{
       "handler": {{
@@ -89,3 +146,20 @@ CONFIG_PATTERN = (f'''
 
 def get_config():
     return CONFIG_PATTERN
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def write_config(**fields):
+    config = json.loads(get_config())
+    config['_host'] = '127.0.0.1'
+    config['_port'] = free_port()
+    config.update(fields)
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.json',
+                                     delete=False) as f:
+        json.dump(config, f)
+    return f.name, config
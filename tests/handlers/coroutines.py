@@ -0,0 +1,23 @@
+import asyncio
+
+from ihttpy.requests.request import Request
+from ihttpy.requests.response import Response
+
+
+async def hello(req: Request, server):
+    await asyncio.sleep(float(req.query.get('t', ['0'])[0]))
+    body = b'hello'
+    headers = [
+        ('Content-Type', 'text/plain'),
+        ('Content-Length', len(body)),
+    ]
+    return Response(200, 'OK', headers, body)
+
+
+async def echo(req: Request, server):
+    body = bytes(req.body_file.getbuffer())
+    headers = [
+        ('Content-Type', 'application/octet-stream'),
+        ('Content-Length', len(body)),
+    ]
+    return Response(200, 'OK', headers, body)
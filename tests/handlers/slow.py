@@ -0,0 +1,25 @@
+import os
+import threading
+import time
+
+from ihttpy.requests.request import Request
+from ihttpy.requests.response import Response
+
+
+def sleep(req: Request, server):
+    time.sleep(float(req.query.get('t', ['0'])[0]))
+    body = f'{threading.get_ident()}'.encode()
+    headers = [
+        ('Content-Type', 'text/plain'),
+        ('Content-Length', len(body)),
+    ]
+    return Response(200, 'OK', headers, body)
+
+
+def pid(req: Request, server):
+    body = f'{os.getpid()}'.encode()
+    headers = [
+        ('Content-Type', 'text/plain'),
+        ('Content-Length', len(body)),
+    ]
+    return Response(200, 'OK', headers, body)
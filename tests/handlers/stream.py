@@ -0,0 +1,38 @@
+import asyncio
+import hashlib
+
+from ihttpy.requests.request import Request
+from ihttpy.requests.response import Response
+
+
+def numbers(req: Request, server):
+    n = int(req.query.get('n', ['3'])[0])
+    body = (f'{i}\n'.encode() for i in range(n))
+    return Response(200, 'OK', [('Content-Type', 'text/plain')], body)
+
+
+async def anumbers(req: Request, server):
+    n = int(req.query.get('n', ['3'])[0])
+
+    async def body():
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield f'{i}\n'.encode()
+
+    return Response(200, 'OK', [('Content-Type', 'text/plain')], body())
+
+
+def digest(req: Request, server):
+    h = hashlib.sha256()
+    for chunk in req.body:
+        h.update(chunk)
+    body = h.hexdigest().encode()
+    return Response(200, 'OK', [('Content-Length', len(body))], body)
+
+
+async def adigest(req: Request, server):
+    h = hashlib.sha256()
+    async for chunk in req.body:
+        h.update(chunk)
+    body = h.hexdigest().encode()
+    return Response(200, 'OK', [('Content-Length', len(body))], body)
@@ -3,10 +3,8 @@ import urllib.parse
 
 import os
 
-import magic
-
-from ihttpy.exceptions.errors import Errors
 from ihttpy.exceptions.logger import Logger
+from ihttpy.requests.multipart import MultipartReader
 from ihttpy.requests.request import Request
 from ihttpy.requests.response import Response
 from ihttpy.defenitions import ROOT_DIR
@@ -28,47 +26,16 @@ def show(req: Request, server):
 
 
 def save(req: Request, server):
-    h = re.compile(b'-+?.+?\r\n'
-                   b'Content-Disposition: form-data; '
-                   b'name=\"(?P<name>.*?)\"; '
-                   b'filename=\"(?P<filename>.*?)\"\r\n'
-                   b'.+?: (?P<ct>.+?)\r\n'
-                   b'\r\n', re.S)
-
-    tail_pos = 3
-    while True:
-        req.body_file.seek(-tail_pos, 2)
-        tail = req.body_file.tell()
-        t = req.body_file.read(tail_pos)
-        if t.startswith(b'\r\n'):
-            break
-        tail_pos += 1
-
-    head_crlf_count = 4
-    head = b''
+    saved = os.path.join(ROOT_DIR, 'tmp', 'saved')
+    fname = None
+    for part in MultipartReader.from_request(req):
+        if not part.filename:
+            continue
+        fname = os.path.basename(part.filename)
+        part.save(os.path.join(saved, fname))
+        Logger.debug_info(f'{part.name} saved as {fname} ')
 
-    req.body_file.seek(0)
-    i = 0
-    while True:
-        if i == head_crlf_count:
-            break
-        head += req.body_file.read(1)
-        if head.endswith(b'\r\n'):
-            i += 1
-
-    data_start = req.body_file.tell()
-
-    match = h.search(head)
-    if not match:
-        raise Errors.MALFORMED_REQ
-    groups = match.groupdict()
-    ftype = groups.get('name')
-    fname = Request.decode(groups.get('filename'))
     if fname:
-        with open(os.path.join(ROOT_DIR, 'tmp', 'saved', fname), 'wb') as f:
-            f.write(req.body_file.read(tail - data_start))
-        Logger.debug_info(f'{ftype} saved as {fname} ')
-
         body = f'{os.path.join(ROOT_DIR, "tmp", "saved")}' \
                f' - >' \
                f' {os.listdir(os.path.join(ROOT_DIR, "tmp", "saved"))}'
@@ -87,7 +54,7 @@ def load(req: Request, server):
     filename = re.sub('/load/', '', req.target)
     destination = os.path.join(ROOT_DIR, "tmp", "saved",
                                urllib.parse.unquote(filename))
-    content_type = magic.Magic(mime=True).from_file(destination)
+    content_type = server.mime.resolve(destination)
     res = Response.build_file_res(
         req, destination, content_type)
     return res
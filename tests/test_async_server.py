@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import unittest
+
+from ihttpy.asyncserver import AsyncServer
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import TEST_DATA_DIR, write_config
+
+
+class AsyncServerTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_path, config = write_config()
+        self.address = (config['_host'], config['_port'])
+        self.server = AsyncServer(Configurator(self.cfg_path),
+                                  loglevel=LogLevel.LOGGING)
+        self.thread = threading.Thread(target=self.server.run)
+        self.thread.start()
+        while not self.server.server:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        os.unlink(self.cfg_path)
+
+    async def fetch(self, raw, expected=1):
+        reader, writer = await asyncio.open_connection(*self.address)
+        writer.write(raw)
+        await writer.drain()
+        responses = []
+        for _ in range(expected):
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            responses.append((head, await reader.readexactly(length)))
+        writer.close()
+        return responses
+
+    def run_async(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, 5))
+
+    def test_coroutine_handler(self):
+        [(head, body)] = self.run_async(self.fetch(
+            b'GET /async HTTP/1.1\r\nHost: x\r\n\r\n'))
+        self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        self.assertEqual(body, b'hello')
+
+    def test_coroutine_handlers_run_concurrently(self):
+        raw = b'GET /async?t=0.5 HTTP/1.1\r\nHost: x\r\n\r\n'
+
+        async def many():
+            return await asyncio.gather(*(self.fetch(raw) for _ in range(20)))
+
+        a = time.monotonic()
+        results = self.run_async(many())
+        self.assertLess(time.monotonic() - a, 2)
+        self.assertTrue(all(body == b'hello' for [(_, body)] in results))
+
+    def test_keep_alive_body_and_static_file(self):
+        raw = (b'POST /async HTTP/1.1\r\nContent-Length: 4\r\n\r\nping'
+               b'GET /c.png HTTP/1.1\r\nHost: x\r\n\r\n')
+        (_, echo), (head, png) = self.run_async(self.fetch(raw, 2))
+        self.assertEqual(echo, b'ping')
+        self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        with open(os.path.join(TEST_DATA_DIR, 'c.png'), 'rb') as f:
+            self.assertEqual(png, f.read())
+
+    def test_compression_runs_off_the_loop(self):
+        threads = []
+        apply = self.server.compressor.apply
+        self.server.compressor.apply = lambda req, res: \
+            threads.append(threading.get_ident()) or apply(req, res)
+        [(head, body)] = self.run_async(self.fetch(
+            b'GET /async HTTP/1.1\r\nHost: x\r\n'
+            b'Accept-Encoding: gzip\r\n\r\n'))
+        self.assertEqual(body, b'hello')
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], self.thread.ident)
+
+    def test_metrics(self):
+        self.run_async(self.fetch(b'GET /async HTTP/1.1\r\nHost: x\r\n\r\n'))
+        data = self.server.metrics.snapshot()
+        self.assertEqual(data['responses'][('/async', 'GET', 200)], 1)
+        self.assertEqual(data['latency'][('/async', 'GET')]['count'], 1)
+        self.assertGreater(data['bytes_out'], len(b'hello'))
+        self.assertEqual(data['in_flight_requests'], 0)
+
+    async def fetch_chunked(self, raw):
+        reader, writer = await asyncio.open_connection(*self.address)
+        writer.write(raw)
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        body = b''
+        while True:
+            size = int(await reader.readuntil(b'\r\n'), 16)
+            data = await reader.readexactly(size + 2)
+            if not size:
+                break
+            body += data[:-2]
+        writer.close()
+        return head, body
+
+    def test_async_iterator_body_is_chunked(self):
+        for path in (b'/astream', b'/stream'):
+            head, body = self.run_async(self.fetch_chunked(
+                b'GET ' + path + b'?n=4 HTTP/1.1\r\nHost: x\r\n\r\n'))
+            self.assertIn(b'Transfer-Encoding: chunked', head)
+            self.assertEqual(body, b'0\n1\n2\n3\n')
+
+    def test_streamed_body(self):
+        data = os.urandom(300 * 1024)
+        for path in (b'/adigest', b'/digest'):
+            [(_, body)] = self.run_async(self.fetch(
+                b'POST ' + path + b' HTTP/1.1\r\nContent-Length: '
+                + str(len(data)).encode() + b'\r\n\r\n' + data))
+            self.assertEqual(body, hashlib.sha256(data).hexdigest().encode())
+
+    def test_malformed_request(self):
+        [(head, body)] = self.run_async(self.fetch(b'GARBAGE\r\n\r\n'))
+        self.assertTrue(head.startswith(b'HTTP/1.1 400 Bad request'))
+        self.assertEqual(body, b'Malformed request line')
+
+
+if __name__ == '__main__':
+    unittest.main()
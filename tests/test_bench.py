@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+import unittest
+import zlib
+
+from ihttpy import bench
+from ihttpy.__main__ import main
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import write_config
+
+
+class BenchHelpersTests(unittest.TestCase):
+    def test_percentile(self):
+        ordered = list(range(1, 1001))
+        self.assertEqual(bench.percentile(ordered, 50), 500)
+        self.assertEqual(bench.percentile(ordered, 99.9), 999)
+        self.assertEqual(bench.percentile([7], 99), 7)
+        self.assertIsNone(bench.percentile([], 50))
+
+    def test_request_spec(self):
+        spec = bench.RequestSpec.parse('post /save upload=100 weight=2')
+        self.assertEqual((spec.method, spec.path, spec.weight),
+                         ('POST', '/save', 2))
+        raw = spec.to_bytes('x')
+        head, _, body = raw.partition(b'\r\n\r\n')
+        self.assertIn(f'Content-Length: {len(body)}'.encode(), head)
+        self.assertIn(b'multipart/form-data; boundary=', head)
+        self.assertEqual(bench.payload(5000), bench.payload(5000))
+        for size in (100, 5000, 100000):
+            data = bench.payload(size)
+            self.assertEqual(len(data), size)
+            self.assertGreater(len(zlib.compress(data)), size * 0.95)
+        with self.assertRaises(ValueError):
+            bench.RequestSpec.parse('GET / size=1')
+
+    def test_read_chunked_response(self):
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'HTTP/1.1 200 OK\r\n'
+                             b'Transfer-Encoding: chunked\r\n\r\n'
+                             b'3\r\nabc\r\n0\r\n\r\n'
+                             b'HTTP/1.1 404 Not found\r\n'
+                             b'Content-Length: 2\r\n'
+                             b'Connection: close\r\n\r\nno')
+            return [await bench.read_response(reader, 'GET')
+                    for _ in range(2)]
+
+        (status, close, _), (status2, close2, _) = asyncio.run(read())
+        self.assertEqual((status, close), (200, False))
+        self.assertEqual((status2, close2), (404, True))
+
+
+class BenchTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_path, config = write_config()
+        self.url = f'http://{config["_host"]}:{config["_port"]}'
+        self.server = Server(Configurator(self.cfg_path),
+                             loglevel=LogLevel.LOGGING,
+                             max_keep_alive_requests=10)
+        self.server.__enter__()
+        self.loop = threading.Thread(target=self.server.run)
+        self.loop.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.loop.join()
+        self.server.__exit__(None, None, None)
+        os.unlink(self.cfg_path)
+
+    def test_pipelined_mix(self):
+        result = bench.run(self.url, ['GET /index.html weight=3',
+                                      'GET /missing_page'],
+                           concurrency=2, pipeline=4, duration=0.3,
+                           warmup=0.1)
+        self.assertGreater(result['requests'], 0)
+        failed = sum(n for status, n in result['statuses'].items()
+                     if status != '200')
+        self.assertTrue(failed)
+        self.assertEqual(result['errors'], {'status': failed})
+        # connections are closed after 10 requests and opened again
+        self.assertGreater(result['connections'], 2)
+        latency = result['latency_ms']
+        self.assertLessEqual(latency['p50'], latency['p99'])
+        self.assertLessEqual(latency['p999'], latency['max'])
+
+    def test_cli(self):
+        out = f'{self.cfg_path}.out.json'
+        try:
+            code = main(['bench', self.url, '-c', '1', '-d', '0.2',
+                         '--warmup', '0', '--no-keep-alive', '-o', out])
+            with open(out) as f:
+                report = f.read()
+        finally:
+            if os.path.exists(out):
+                os.unlink(out)
+        self.assertEqual(code, 0)
+        self.assertIn('"rps"', report)
+
+
+if __name__ == '__main__':
+    unittest.main()
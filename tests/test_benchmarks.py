@@ -0,0 +1,22 @@
+import unittest
+
+from benchmarks.runner import compare, measure
+
+
+class BenchmarkRunnerTests(unittest.TestCase):
+    def test_measure(self):
+        took = measure(lambda: sum(range(100)), repeat=2, min_time=0.001)
+        self.assertGreater(took, 0)
+        self.assertLess(took, 0.01)
+
+    def test_compare(self):
+        baseline = {'results': {'a': 1.0, 'b': 1.0, 'c': 1.0}}
+        results = {'results': {'a': 1.2, 'b': 1.3, 'c': 0.5, 'd': 1.0}}
+        statuses = {name: status for name, _, _, _, status
+                    in compare(results, baseline, threshold=0.25)}
+        self.assertEqual(statuses, {'a': 'ok', 'b': 'REGRESSION',
+                                    'c': 'faster', 'd': 'new'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+from ihttpy.requests.body import RequestBody, BodyStream
+from ihttpy.requests.parser import RequestParser
+from ihttpy.requests.request import Request
+
+
+class RequestBodyTests(unittest.TestCase):
+    def test_small_body_stays_in_memory(self):
+        body = RequestBody(5, spool_max_size=10)
+        body.write(b'12345')
+        self.assertTrue(body.in_memory)
+        self.assertEqual(len(body), 5)
+        self.assertEqual(bytes(body), b'12345')
+        self.assertEqual(body.getbuffer().tobytes(), b'12345')
+        body.seek(0)
+        self.assertEqual(body.read(), b'12345')
+
+    def test_large_body_goes_to_disk(self):
+        body = RequestBody(20, spool_max_size=10)
+        self.assertFalse(body.in_memory)
+        body.write(b'0123456789' * 2)
+        self.assertEqual(bytes(body), b'0123456789' * 2)
+        self.assertEqual(body.getbuffer()[10:12].tobytes(), b'01')
+        body.close()
+
+    def test_rolls_over_when_length_unknown(self):
+        body = RequestBody(spool_max_size=4)
+        body.write(b'123')
+        self.assertTrue(body.in_memory)
+        body.write(b'456')
+        self.assertFalse(body.in_memory)
+        self.assertEqual(bytes(body), b'123456')
+        body.close()
+
+    def test_request_without_body_has_no_storage(self):
+        req = RequestParser().feed(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertIsNone(req.body)
+        self.assertEqual(req.body_file.read(), b'')
+
+    def test_parser_spools_by_content_length(self):
+        raw = (b'POST / HTTP/1.1\r\nContent-Length: 6\r\n\r\n'
+               b'{"a":1}')
+        req = RequestParser(spool_max_size=1).feed(raw)
+        self.assertFalse(req.body.in_memory)
+        req = RequestParser().feed(raw)
+        self.assertTrue(req.body.in_memory)
+        self.assertEqual(bytes(req.body), b'{"a":1')
+
+    def test_get_json(self):
+        req = RequestParser().feed(b'PUT / HTTP/1.1\r\nContent-Length: 7'
+                                   b'\r\n\r\n{"a":1}')
+        self.assertDictEqual(req.get_json(), {'a': 1})
+        self.assertIsInstance(req, Request)
+
+
+class BodyStreamTests(unittest.TestCase):
+    def test_reads_chunks_in_order(self):
+        stream = BodyStream(6)
+        stream.write(b'abc')
+        stream.write(b'def')
+        stream.finish()
+        self.assertEqual(stream.read(2), b'ab')
+        self.assertEqual(list(stream), [b'cdef'])
+
+    def test_stall_and_drain(self):
+        drained = []
+        stream = BodyStream(8, limit=4, on_drain=lambda: drained.append(1))
+        stream.write(b'1234')
+        self.assertEqual(stream.space(), 0)
+        self.assertTrue(stream.stall())
+        self.assertEqual(stream.read(2), b'12')
+        self.assertEqual(drained, [1])
+        self.assertEqual(stream.space(), 2)
+
+    def test_closed_stream_drops_data(self):
+        stream = BodyStream(8, limit=4)
+        stream.write(b'1234')
+        stream.close()
+        self.assertEqual(stream.space(), 8)
+        stream.write(b'5678')
+        self.assertEqual(stream.buffered, 0)
+        self.assertFalse(stream.stall())
+
+    def test_abort_wakes_reader(self):
+        stream = BodyStream(8)
+        stream.abort(ConnectionError('gone'))
+        with self.assertRaises(ConnectionError):
+            stream.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from ihttpy.requests.cache import ResponseCache
+from ihttpy.requests.compression import Compressor
+from ihttpy.requests.request import Request
+from ihttpy.requests.response import FileBody, Response
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def make_file(self, name, data):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    @staticmethod
+    def file_res(path):
+        return Response.build_file_res(Request(), path, 'text/plain')
+
+    def test_hit_is_served_from_memory(self):
+        cache = ResponseCache()
+        path = self.make_file('a.txt', b'hello')
+        cache.set('/a', path, self.file_res(path))
+
+        res = cache.get('/a')
+
+        self.assertEqual(res.body, b'hello')
+        self.assertIsNone(cache.get('/b'))
+        self.assertDictEqual(
+            {k: v for k, v in cache.stats().items()
+             if k in ('hits', 'misses', 'evictions')},
+            {'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_large_files_stay_file_backed(self):
+        cache = ResponseCache(inline_max_size=2)
+        path = self.make_file('a.txt', b'hello')
+        cache.set('/a', path, self.file_res(path))
+        self.assertIsInstance(cache.get('/a').body, FileBody)
+
+    def test_changed_file_invalidates_entry(self):
+        cache = ResponseCache()
+        path = self.make_file('a.txt', b'hello')
+        cache.set('/a', path, self.file_res(path))
+        stat = os.stat(path)
+        self.make_file('a.txt', b'hello!')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        self.assertIsNone(cache.get('/a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        body = b'x' * 1000
+        cost = 1000 + 512
+        cache = ResponseCache(max_size=3 * cost)
+        paths = [self.make_file(f'{i}.txt', body) for i in range(4)]
+        for i in range(3):
+            cache.set(f'/{i}', paths[i], self.file_res(paths[i]))
+        cache.get('/0')
+
+        cache.set('/3', paths[3], self.file_res(paths[3]))
+
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNotNone(cache.get('/0'))
+        self.assertIsNone(cache.get('/1'))
+        self.assertLessEqual(cache.size, cache.max_size)
+
+    def test_protected_segment_survives_a_scan(self):
+        body = b'x' * 1000
+        cache = ResponseCache(max_size=5 * (1000 + 512))
+        hot = self.make_file('hot.txt', body)
+        cache.set('/hot', hot, self.file_res(hot))
+        cache.get('/hot')
+        for i in range(20):
+            path = self.make_file(f'{i}.txt', body)
+            cache.set(f'/{i}', path, self.file_res(path))
+        self.assertIsNotNone(cache.get('/hot'))
+
+    def test_l2_is_used_after_l1_eviction(self):
+        cache = ResponseCache(max_size=1, l2_max_size=1e6)
+        try:
+            path = self.make_file('a.txt', b'hello')
+            cache.set('/a', path, self.file_res(path))
+            self.assertEqual(len(cache), 0)
+            self.assertEqual(cache.get('/a').body, b'hello')
+            self.assertEqual(cache.l2_hits, 1)
+        finally:
+            cache.clear()
+            cache.close()
+
+    def test_invalidate_skips_l2_without_clearing_it(self):
+        cache = ResponseCache(max_size=1, l2_max_size=1e6)
+        try:
+            path = self.make_file('a.txt', b'hello')
+            cache.set('/a', path, self.file_res(path))
+            cache.invalidate()
+            self.assertEqual(len(cache.l2), 1)
+            self.assertIsNone(cache.get('/a'))
+            cache.set('/a', path, self.file_res(path))
+            self.assertEqual(cache.get('/a').body, b'hello')
+        finally:
+            cache.clear()
+            cache.close()
+
+    def test_replaced_gz_sibling_invalidates(self):
+        cache = ResponseCache()
+        path = self.make_file('a.css', b'body {}\n' * 200)
+        gz = self.make_file('a.css.gz', gzip.compress(b'body {}\n' * 200))
+        req = Request()
+        req.headers['Accept-Encoding'] = 'gzip'
+        res = Compressor().static(req, path, self.file_res(path))
+        cache.set('/a.css', path, res)
+        self.assertIsNotNone(cache.get('/a.css'))
+
+        stat = os.stat(gz)
+        with open(gz, 'wb') as f:
+            f.write(gzip.compress(b'body { color: red }\n' * 200))
+        os.utime(gz, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertIsNone(cache.get('/a.css'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import gzip
+import os
+import tempfile
+import unittest
+import zlib
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.requests.compression import Compressor
+from ihttpy.requests.parser import RequestParser
+from ihttpy.requests.response import FileBody, Response
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import TEST_DATA_DIR, write_config
+
+TEXT = b'<p>compress me</p>\n' * 200
+
+
+def request(accept_encoding=None, path='/', if_none_match=None):
+    raw = f'GET {path} HTTP/1.1\r\nHost: x\r\n'
+    if accept_encoding is not None:
+        raw += f'Accept-Encoding: {accept_encoding}\r\n'
+    if if_none_match is not None:
+        raw += f'If-None-Match: {if_none_match}\r\n'
+    return RequestParser().feed(f'{raw}\r\n'.encode())
+
+
+def text_response(body=TEXT, content_type='text/html'):
+    return Response(200, 'OK', [('Content-Type', content_type),
+                                ('Content-Length', len(body))], body)
+
+
+class CompressorTests(unittest.TestCase):
+    def test_negotiate(self):
+        negotiate = Compressor.negotiate
+        self.assertEqual(negotiate('gzip, deflate, br'), 'gzip')
+        self.assertEqual(negotiate('deflate, gzip;q=0.5'), 'deflate')
+        self.assertEqual(negotiate('*'), 'gzip')
+        self.assertEqual(negotiate('*, gzip;q=0'), 'deflate')
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate('br, gzip;q=0'))
+        self.assertIsNone(negotiate(None))
+
+    def test_dynamic_response_compressed(self):
+        res = Compressor().apply(request('gzip'), text_response())
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(res.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(res.headers['Content-Length'], len(res.body))
+        self.assertEqual(gzip.decompress(res.body), TEXT)
+
+        res = Compressor().apply(request('deflate'), text_response())
+        self.assertEqual(zlib.decompress(res.body), TEXT)
+
+    def test_dynamic_response_left_alone(self):
+        compressor = Compressor()
+        res = compressor.apply(request('gzip'), text_response(b'tiny'))
+        self.assertNotIn('Content-Encoding', res.headers)
+        res = compressor.apply(request('gzip'),
+                               text_response(content_type='image/png'))
+        self.assertNotIn('Content-Encoding', res.headers)
+        res = compressor.apply(request(), text_response())
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.headers['Vary'], 'Accept-Encoding')
+
+    def test_stream_compressed(self):
+        res = Response(200, 'OK', [('Content-Type', 'text/plain')],
+                       iter([TEXT, b'', TEXT]))
+        res = Compressor().apply(request('gzip'), res)
+        self.assertEqual(gzip.decompress(b''.join(res.body)), TEXT * 2)
+
+    def test_static_uses_fresh_gz_sibling(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'a.css')
+            with open(path, 'wb') as f:
+                f.write(TEXT)
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(TEXT))
+            res = Response.build_file_res(request('gzip'), path, 'text/css')
+            etag = res.headers['ETag']
+            res = Compressor().static(request('gzip'), path, res)
+            self.assertIsInstance(res.body, FileBody)
+            self.assertEqual(res.body.path, path + '.gz')
+            self.assertEqual(res.headers['Content-Length'],
+                             os.path.getsize(path + '.gz'))
+            self.assertNotEqual(res.headers['ETag'], etag)
+
+
+class ServerCompressionTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_path, _ = write_config()
+        self.server = Server(Configurator(self.cfg_path),
+                             loglevel=LogLevel.LOGGING, compress_min_size=0)
+
+    def tearDown(self):
+        os.unlink(self.cfg_path)
+
+    def test_static_file_compressed_once(self):
+        with open(os.path.join(TEST_DATA_DIR, 'index.html'), 'rb') as f:
+            html = f.read()
+        for hits in (0, 1):
+            res = self.server.handle_req(request('gzip', '/index.html'))
+            self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(bytes(res.body)), html)
+            self.assertEqual(self.server.cache.hits, hits)
+
+        res = self.server.handle_req(request(None, '/index.html'))
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(bytes(res.body), html)
+
+    def test_not_modified_compares_the_chosen_coding(self):
+        res = self.server.handle_req(request('gzip', '/index.html'))
+        etag = res.headers['ETag']
+        self.assertTrue(etag.endswith('-gzip"'))
+
+        server = Server(Configurator(self.cfg_path),
+                        loglevel=LogLevel.LOGGING, compress_min_size=0)
+        res = server.handle_req(request('gzip', '/index.html', etag))
+        self.assertEqual(res.status, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+        # the identity representation does not match the gzip tag
+        res = server.handle_req(request(None, '/index.html', etag))
+        self.assertEqual(res.status, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import write_config
+
+
+class ExecutorTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_path, config = write_config()
+        self.address = (config['_host'], config['_port'])
+        self.executor = ThreadPoolExecutor(2)
+        self.server = Server(Configurator(self.cfg_path),
+                             loglevel=LogLevel.LOGGING,
+                             executor=self.executor)
+        self.server.__enter__()
+        self.loop = threading.Thread(target=self.server.run)
+        self.loop.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.loop.join()
+        self.server.__exit__(None, None, None)
+        self.executor.shutdown()
+        os.unlink(self.cfg_path)
+
+    def request(self, path):
+        conn = socket.create_connection(self.address, timeout=5)
+        conn.sendall(f'GET {path} HTTP/1.1\r\nHost: x\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        return conn
+
+    @staticmethod
+    def read(conn):
+        data = b''
+        with conn:
+            while True:
+                chunk = conn.recv(Server.MAX_LINE)
+                if not chunk:
+                    return data
+                data += chunk
+
+    def test_slow_handler_does_not_block_loop(self):
+        slow = self.request('/sleep?t=1')
+        time.sleep(0.1)
+        a = time.monotonic()
+        fast = self.read(self.request('/index.html'))
+        self.assertLess(time.monotonic() - a, 0.5)
+        self.assertTrue(fast.startswith(b'HTTP/1.1 200 OK'))
+        self.assertTrue(self.read(slow).startswith(b'HTTP/1.1 200 OK'))
+
+    def test_inline_route_runs_on_loop_thread(self):
+        res = self.read(self.request('/sleep_inline'))
+        self.assertEqual(res.split(b'\r\n\r\n', 1)[1],
+                         str(self.loop.ident).encode())
+        res = self.read(self.request('/sleep'))
+        self.assertNotEqual(res.split(b'\r\n\r\n', 1)[1],
+                            str(self.loop.ident).encode())
+
+    def test_handler_error_is_sent_from_loop(self):
+        res = self.read(self.request('/sleep?t=nan-value'))
+        self.assertTrue(res.startswith(b'HTTP/1.1 500'))
+
+    def test_malformed_request_behind_executor_request(self):
+        conn = socket.create_connection(self.address, timeout=5)
+        conn.sendall(b'GET /sleep?t=0.2 HTTP/1.1\r\nHost: x\r\n\r\n'
+                     b'GARBAGE\r\n\r\n')
+        res = self.read(conn)
+        self.assertTrue(res.startswith(b'HTTP/1.1 200 OK'))
+        self.assertEqual(res.count(b'HTTP/1.1 '), 2)
+        self.assertNotIn(b'HTTP/1.1 200 OK', res[1:])
+        # the loop is still serving
+        res = self.read(self.request('/index.html'))
+        self.assertTrue(res.startswith(b'HTTP/1.1 200 OK'))
+
+    def test_pipelined_responses_keep_order(self):
+        conn = socket.create_connection(self.address, timeout=5)
+        conn.sendall(b'GET /sleep?t=0.3 HTTP/1.1\r\nHost: x\r\n\r\n'
+                     b'GET /sleep_inline HTTP/1.1\r\nHost: x\r\n'
+                     b'Connection: close\r\n\r\n')
+        res = self.read(conn)
+        first, second = res.split(b'HTTP/1.1 200 OK')[1:]
+        self.assertFalse(first.endswith(str(self.loop.ident).encode()))
+        self.assertTrue(second.endswith(str(self.loop.ident).encode()))
+
+    def test_streamed_body_with_back_pressure(self):
+        data = os.urandom(1024 * 1024)
+        conn = socket.create_connection(self.address, timeout=5)
+        conn.sendall(f'POST /digest HTTP/1.1\r\nHost: x\r\n'
+                     f'Content-Length: {len(data)}\r\n\r\n'.encode())
+        conn.sendall(data)
+        conn.sendall(b'GET /sleep_inline HTTP/1.1\r\nHost: x\r\n'
+                     b'Connection: close\r\n\r\n')
+        res = self.read(conn)
+        first, second = res.split(b'HTTP/1.1 200 OK')[1:]
+        self.assertTrue(first.endswith(hashlib.sha256(data).hexdigest()
+                                       .encode()))
+        self.assertTrue(second.endswith(str(self.loop.ident).encode()))
+
+
+if __name__ == '__main__':
+    unittest.main()
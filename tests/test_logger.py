@@ -0,0 +1,94 @@
+import gc
+import logging
+import os
+import tempfile
+import unittest
+import weakref
+
+from ihttpy.exceptions import logger
+from ihttpy.exceptions.logger import BatchFileHandler, Logger, LogLevel
+
+
+class Formatted:
+    calls = 0
+
+    def __str__(self):
+        Formatted.calls += 1
+        return 'formatted'
+
+
+class LoggerTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.info = os.path.join(self.dir.name, 'info.log')
+        self.debug = os.path.join(self.dir.name, 'debug.log')
+
+    def tearDown(self):
+        Logger.configure(LogLevel.LOGGING)
+        self.dir.cleanup()
+
+    def test_disabled_debug_does_not_format(self):
+        Logger.configure(LogLevel.LOGGING)
+        self.assertFalse(Logger.DEBUG)
+        Formatted.calls = 0
+        Logger.debug_info('Request %s', Formatted())
+        self.assertEqual(Formatted.calls, 0)
+
+    def test_background_writer(self):
+        Logger.configure(LogLevel.LOGGING, self.info, self.debug)
+        self.assertTrue(Logger.DEBUG)
+        for i in range(1000):
+            Logger.access('GET', f'/{i}', 200, '127.0.0.1')
+        Logger.debug_info('Request %s', Formatted())
+        Logger.configure(LogLevel.LOGGING)
+
+        with open(self.info) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 1000)
+        self.assertIn('<GET> "/999" (200) "127.0.0.1"', lines[-1])
+        with open(self.debug) as f:
+            self.assertIn('Request formatted', f.read())
+
+    def test_reconfigure_keeps_one_handler(self):
+        Logger.configure(LogLevel.LOGGING, self.info)
+        Logger.configure(LogLevel.LOGGING, self.info)
+        handlers = logging.getLogger('info_logger').handlers
+        self.assertEqual(len(handlers), 1)
+        self.assertIsInstance(handlers[0], BatchFileHandler)
+
+    def test_closed_handler_is_released(self):
+        handler = BatchFileHandler(self.info)
+        self.assertIn(handler, logger._batch_handlers)
+        handler.close()
+        self.assertNotIn(handler, logger._batch_handlers)
+        ref = weakref.ref(handler)
+        del handler
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_message_is_rendered_when_logged(self):
+        handler = BatchFileHandler(self.info)
+        state = ['before']
+        handler.emit(logging.makeLogRecord({'msg': 'state %s',
+                                            'args': (state,)}))
+        state[0] = 'after'
+        handler.close()
+        with open(self.info) as f:
+            self.assertEqual(f.read(), "state ['before']\n")
+
+    def test_full_queue_drops(self):
+        class Small(BatchFileHandler):
+            QUEUE_SIZE = 1
+
+        handler = Small(self.info)
+        # a writer that is gone leaves the queue to fill up
+        handler.queue.put(None)
+        handler.thread.join()
+        for i in range(5):
+            handler.emit(logging.makeLogRecord({'msg': f'{i}'}))
+        self.assertEqual(handler.dropped, 4)
+        handler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
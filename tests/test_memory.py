@@ -0,0 +1,161 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.memory import MemoryTracker, connection_state
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import get_config, write_config
+
+LEAK = []
+
+
+def leaky():
+    LEAK.append(bytearray(200000))
+
+
+class MemoryTrackerTests(unittest.TestCase):
+    def setUp(self):
+        self.tracker = MemoryTracker(interval=0)
+        self.tracker.start()
+
+    def tearDown(self):
+        self.tracker.stop()
+        LEAK.clear()
+
+    def test_route_attribution_and_growth(self):
+        for _ in range(3):
+            self.tracker.call('/leak', leaky)
+        self.tracker.call('/noop', lambda: None)
+        self.tracker.tick(float('inf'))
+
+        report = self.tracker.report(limit=5)
+        leak = report['routes']['/leak']
+        self.assertEqual(leak['calls'], 3)
+        self.assertGreaterEqual(leak['allocated'], 3 * 200000)
+        self.assertLess(report['routes']['/noop']['max'], 200000)
+        self.assertTrue(report['growth'][0]['site'].startswith(__file__))
+        self.assertGreaterEqual(report['growth'][0]['size_diff'], 600000)
+        self.assertTrue(report['top'])
+        self.assertEqual(len(report['history']), 2)
+
+
+class ServerMemoryTests(unittest.TestCase):
+    def setUp(self):
+        self.tf = tempfile.NamedTemporaryFile(mode='w', delete=True)
+        with open(self.tf.name, 'w') as f:
+            f.write(get_config())
+        self.tracker = MemoryTracker()
+        self.server = Server(configurator=Configurator(self.tf.name),
+                             loglevel=LogLevel.CONSOLE, memory=self.tracker,
+                             memory_path='/memory')
+        self.tracker.start()
+
+    def tearDown(self):
+        self.tracker.stop()
+
+    def exchange(self, request):
+        ours, peer = socket.socketpair()
+        self.server._register(ours)
+        peer.sendall(request)
+        self.server._read(ours)
+        peer.settimeout(1)
+        received = b''
+        while True:
+            chunk = peer.recv(Server.MAX_LINE)
+            if not chunk:
+                break
+            received += chunk
+        peer.close()
+        return received
+
+    def test_endpoint_needs_an_executor(self):
+        received = self.exchange(b'GET /memory HTTP/1.1\r\nHost: x\r\n'
+                                 b'Connection: close\r\n\r\n')
+        self.assertIn(b'503 Service Unavailable', received)
+
+    def test_connection_tables_are_emptied(self):
+        self.exchange(b'POST /post HTTP/1.1\r\nHost: x\r\n'
+                      b'Content-Length: 10\r\nConnection: close\r\n\r\n'
+                      b'0123456789')
+        state = connection_state(self.server)
+        self.assertEqual(state['connections'], 0)
+        self.assertFalse(any(state['tables'].values()))
+
+    def test_partial_body_is_accounted(self):
+        ours, peer = socket.socketpair()
+        self.server._register(ours)
+        peer.sendall(b'POST /post HTTP/1.1\r\nHost: x\r\n'
+                     b'Content-Length: 100\r\n\r\n0123456789')
+        self.server._read(ours)
+        state = connection_state(self.server)
+        self.assertEqual(state['body_memory_bytes'], 10)
+        self.server.close(ours)
+        peer.close()
+
+
+class MemoryEndpointTests(unittest.TestCase):
+    def setUp(self):
+        cfg_path, config = write_config()
+        self.addCleanup(os.unlink, cfg_path)
+        self.address = (config['_host'], config['_port'])
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        self.server = Server(Configurator(cfg_path),
+                             loglevel=LogLevel.LOGGING, executor=executor,
+                             memory=MemoryTracker(), memory_path='/memory')
+        self.server.__enter__()
+        self.loop = threading.Thread(target=self.server.run)
+        self.loop.start()
+
+    def tearDown(self):
+        if self.loop.is_alive():
+            self.stop()
+
+    def stop(self):
+        self.server.shutdown()
+        self.loop.join()
+        self.server.__exit__(None, None, None)
+
+    def get(self, path):
+        with socket.create_connection(self.address, timeout=5) as conn:
+            conn.sendall(f'GET {path} HTTP/1.1\r\nHost: x\r\n'
+                         f'Connection: close\r\n\r\n'.encode())
+            received = b''
+            while True:
+                chunk = conn.recv(Server.MAX_LINE)
+                if not chunk:
+                    return received
+                received += chunk
+
+    def test_report_is_built_off_the_loop(self):
+        threads = []
+        serve = self.server.memory.report
+        self.server.memory.report = lambda *args: \
+            threads.append(threading.get_ident()) or serve(*args)
+        self.get('/2.html')
+        head, _, body = self.get('/memory').partition(b'\r\n\r\n')
+        self.assertIn(b'200 OK', head)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], self.loop.ident)
+        report = json.loads(body)
+        self.assertEqual(report['routes']['/2.html']['calls'], 1)
+        # the connection asking for the report is the only one left
+        self.assertEqual(report['connections']['connections'], 1)
+        self.assertEqual(report['connections']['tables']['requests'], 1)
+
+    def test_exit_stops_tracing(self):
+        self.assertIn(b'200 OK', self.get('/2.html'))
+        self.assertTrue(tracemalloc.is_tracing())
+        self.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+if __name__ == '__main__':
+    unittest.main()
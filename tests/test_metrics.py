@@ -0,0 +1,159 @@
+import socket
+import tempfile
+import unittest
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.metrics import Histogram, Metrics, OTHER_METHOD, UNMATCHED
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import get_config
+
+
+class HistogramTests(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        hist = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            hist.observe(value)
+        self.assertEqual(hist.cumulative(),
+                         [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(hist.count, 4)
+        self.assertAlmostEqual(hist.sum, 3.65)
+
+
+class MetricsTests(unittest.TestCase):
+    def test_prometheus_text(self):
+        metrics = Metrics(buckets=(0.5,))
+        metrics.observe('/[name].html', 'GET', 200, 0.1)
+        metrics.observe('/[name].html', 'GET', 404, 1)
+        metrics.observe(None, 'GET', 404, 0.2)
+        metrics.bytes_in += 10
+        metrics.gauge('open_connections', 'Open client connections',
+                      lambda: 3)
+        text = metrics.to_prometheus()
+        self.assertIn('ihttpy_request_duration_seconds_bucket'
+                      '{route="/[name].html",method="GET",le="0.5"} 1', text)
+        self.assertIn('ihttpy_request_duration_seconds_bucket'
+                      '{route="/[name].html",method="GET",le="+Inf"} 2', text)
+        self.assertIn('ihttpy_responses_total{route="/[name].html",'
+                      'method="GET",code="404"} 1', text)
+        self.assertIn(f'route="{UNMATCHED}"', text)
+        self.assertIn('ihttpy_received_bytes_total 10', text)
+        self.assertIn('# TYPE ihttpy_open_connections gauge', text)
+        self.assertIn('ihttpy_open_connections 3', text)
+
+    def test_label_escaping(self):
+        metrics = Metrics()
+        metrics.observe('/a"b\\c', 'GET', 200, 0)
+        self.assertIn(r'route="/a\"b\\c"', metrics.to_prometheus())
+
+    def test_unknown_methods_share_a_label(self):
+        metrics = Metrics()
+        for n in range(50):
+            metrics.observe('/', f'X{n}', 405, 0)
+        metrics.observe('/', 'GET', 200, 0)
+        self.assertEqual(sorted(metrics.latency),
+                         [('/', 'GET'), ('/', OTHER_METHOD)])
+        self.assertEqual(metrics.latency[('/', OTHER_METHOD)].count, 50)
+
+
+class ServerMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.tf = tempfile.NamedTemporaryFile(mode='w', delete=True)
+        with open(self.tf.name, 'w') as f:
+            f.write(get_config())
+
+    def exchange(self, server, request):
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        peer.sendall(request)
+        server._read(ours)
+        peer.settimeout(1)
+        received = b''
+        while True:
+            chunk = peer.recv(Server.MAX_LINE)
+            if not chunk:
+                break
+            received += chunk
+        peer.close()
+        return received
+
+    def test_requests_are_counted_per_rule(self):
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE)
+        request = (b'GET /2.html HTTP/1.1\r\nHost: x\r\n\r\n'
+                   b'GET /3.html HTTP/1.1\r\nHost: x\r\n\r\n'
+                   b'GET /nothing HTTP/1.1\r\nHost: x\r\n'
+                   b'Connection: close\r\n\r\n')
+        received = self.exchange(server, request)
+
+        data = server.metrics.snapshot()
+        self.assertEqual(data['responses'][('/2.html', 'GET', 200)], 1)
+        self.assertEqual(data['latency'][('/[name].html', 'GET')]['count'], 1)
+        unmatched = [k for k in data['responses'] if k[0] == UNMATCHED]
+        self.assertEqual(len(unmatched), 1)
+        self.assertEqual(data['bytes_in'], len(request))
+        self.assertEqual(data['bytes_out'], len(received))
+        self.assertEqual(data['open_connections'], 0)
+        self.assertEqual(data['in_flight_requests'], 0)
+        self.assertEqual(data['cache_misses_total'], 2)
+
+    def test_made_up_methods_are_not_labels(self):
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE)
+        for n in range(5):
+            self.exchange(server, f'X{n} / HTTP/1.1\r\nHost: x\r\n'
+                                  f'Connection: close\r\n\r\n'.encode())
+        methods = {method for _, method in server.metrics.latency}
+        self.assertEqual(methods, {OTHER_METHOD})
+        count = sum(h.count for h in server.metrics.latency.values())
+        self.assertEqual(count, 5)
+
+    def test_failed_send_is_observed_once(self):
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE)
+        send = server.send
+        failures = [ValueError('body can not be sent')]
+
+        def flaky_send(client, *responses):
+            if failures:
+                raise failures.pop()
+            send(client, *responses)
+
+        server.send = flaky_send
+        received = self.exchange(server, b'GET /2.html HTTP/1.1\r\n'
+                                         b'Host: x\r\n'
+                                         b'Connection: close\r\n\r\n')
+        self.assertNotIn(b'200 OK', received)
+        responses = server.metrics.snapshot()['responses']
+        self.assertEqual(sum(responses.values()), 1)
+        [(_, _, status)] = responses
+        self.assertNotEqual(status, 200)
+
+    def test_endpoint(self):
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE, metrics_path='/metrics')
+        self.exchange(server, b'GET / HTTP/1.1\r\nHost: x\r\n'
+                              b'Connection: close\r\n\r\n')
+        received = self.exchange(server, b'GET /metrics HTTP/1.1\r\n'
+                                         b'Host: x\r\n'
+                                         b'Connection: close\r\n\r\n')
+        head, _, body = received.partition(b'\r\n\r\n')
+        self.assertIn(b'200 OK', head)
+        self.assertIn(b'text/plain; version=0.0.4', head)
+        self.assertIn(b'ihttpy_responses_total{route="/",method="GET",'
+                      b'code="200"} 1', body)
+        self.assertIn(b'ihttpy_open_connections 1', body)
+
+    def test_disabled(self):
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE, metrics=False,
+                        metrics_path='/metrics')
+        self.assertIsNone(server.metrics)
+        received = self.exchange(server, b'GET /metrics HTTP/1.1\r\n'
+                                         b'Host: x\r\n'
+                                         b'Connection: close\r\n\r\n')
+        self.assertNotIn(b'200 OK', received)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from ihttpy.requests.mime import MimeResolver
+
+
+class MimeResolverTests(unittest.TestCase):
+    def test_extension_table(self):
+        resolver = MimeResolver()
+        self.assertEqual(resolver.resolve('/nowhere/a.CSS'), 'text/css')
+        self.assertEqual(resolver.resolve('/nowhere/b.png'), 'image/png')
+        self.assertEqual(resolver.resolve('/nowhere/c.html'), 'text/html')
+        self.assertIsNone(resolver._magic)
+
+    def test_custom_types(self):
+        resolver = MimeResolver({'.log': 'text/plain'})
+        self.assertEqual(resolver.resolve('/nowhere/a.log'), 'text/plain')
+
+    def test_sniffed_types_are_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'noext')
+            with open(path, 'wb') as f:
+                f.write(b'%PDF-1.4\n')
+            resolver = MimeResolver()
+            self.assertEqual(resolver.resolve(path), 'application/pdf')
+            self.assertEqual(len(resolver.cache), 1)
+            self.assertEqual(resolver.resolve(path), 'application/pdf')
+            self.assertEqual(len(resolver.cache), 1)
+
+            with open(path, 'wb') as f:
+                f.write(b'plain words here\n')
+            os.utime(path, ns=(0, 0))
+            self.assertEqual(resolver.resolve(path), 'text/plain')
+            self.assertEqual(len(resolver.cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from ihttpy.exceptions.errors import Errors
+from ihttpy.requests.multipart import MultipartReader, MultipartParser, \
+    get_boundary, PART, DATA, END
+from ihttpy.requests.parser import RequestParser
+
+BODY = (b'preamble\r\n'
+        b'--xyz\r\n'
+        b'Content-Disposition: form-data; name="title"\r\n\r\n'
+        b'hello\r\n'
+        b'--xyz\r\n'
+        b'Content-Disposition: form-data; name="file"; '
+        b'filename="a \\"b\\".bin"\r\n'
+        b'Content-Type: application/octet-stream\r\n\r\n'
+        b'\r\n--xy\r\n-xyz' + bytes(range(256)) * 100 + b'\r\n'
+        b'--xyz--\r\n'
+        b'epilogue')
+FILE_DATA = b'\r\n--xy\r\n-xyz' + bytes(range(256)) * 100
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class MultipartTests(unittest.TestCase):
+    def test_boundary(self):
+        self.assertEqual(get_boundary('multipart/form-data; boundary=xyz'),
+                         b'xyz')
+        self.assertEqual(get_boundary('multipart/form-data; '
+                                      'boundary="a b"; x=1'), b'a b')
+        with self.assertRaises(type(Errors.MALFORMED_MULTIPART)):
+            get_boundary('multipart/form-data')
+
+    def test_events_do_not_depend_on_chunking(self):
+        for size in (1, 7, 64 * 1024):
+            parser = MultipartParser(b'xyz')
+            events = []
+            for chunk in split(BODY, size):
+                events.extend(parser.feed(chunk))
+            parser.close()
+            kinds = [kind for kind, _ in events]
+            self.assertEqual(kinds[0], PART)
+            self.assertEqual(kinds[-1], END)
+            self.assertEqual(kinds.count(PART), 2)
+            data = b''.join(value for kind, value in events if kind == DATA)
+            self.assertEqual(data, b'hello' + FILE_DATA)
+
+    def test_fields_and_files(self):
+        parts = []
+        for part in MultipartReader(split(BODY, 1000), b'xyz'):
+            parts.append((part.name, part.filename, part.content_type,
+                          part.read()))
+        self.assertEqual(parts, [
+            ('title', None, 'text/plain', b'hello'),
+            ('file', 'a "b".bin', 'application/octet-stream', FILE_DATA)])
+
+    def test_save_renames_into_place(self):
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'upload.bin')
+            for part in MultipartReader(split(BODY, 4096), b'xyz'):
+                if part.filename:
+                    self.assertEqual(part.save(target), len(FILE_DATA))
+            self.assertEqual(os.listdir(directory), ['upload.bin'])
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), FILE_DATA)
+
+    def test_truncated_body_leaves_no_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'upload.bin')
+            reader = MultipartReader([BODY[:-30]], b'xyz')
+            with self.assertRaises(type(Errors.MALFORMED_MULTIPART)):
+                for part in reader:
+                    if part.filename:
+                        part.save(target)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_from_request(self):
+        raw = (b'POST /save HTTP/1.1\r\n'
+               b'Content-Type: multipart/form-data; boundary=xyz\r\n'
+               b'Content-Length: ' + str(len(BODY)).encode() + b'\r\n\r\n'
+               + BODY)
+        req = RequestParser().feed(raw)
+        names = [part.name for part in MultipartReader.from_request(req)]
+        self.assertEqual(names, ['title', 'file'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from ihttpy.exceptions.errors import Errors
+from ihttpy.requests.body import BodyStream
+from ihttpy.requests.parser import RequestParser
+
+GET = (b'GET /index.html?a=1&b=2 HTTP/1.1\r\n'
+       b'Host: 0.0.0.0:8000\r\n'
+       b'Accept: */*\r\n'
+       b'Connection: keep-alive\r\n\r\n')
+
+POST = (b'POST /post HTTP/1.1\r\n'
+        b'Host: 0.0.0.0:8000\r\n'
+        b'Content-Type: application/x-www-form-urlencoded\r\n'
+        b'Content-Length: 20\r\n\r\n'
+        b'username=me&post=hi!')
+
+
+class RequestParserTests(unittest.TestCase):
+    def setUp(self):
+        self.parser = RequestParser()
+
+    def read_body(self, req):
+        req.body_file.seek(0)
+        return req.body_file.read()
+
+    def test_parses_get(self):
+        req = self.parser.feed(GET)
+        self.assertTupleEqual((req.method, req.target, req.version),
+                              ('GET', '/index.html?a=1&b=2', 'HTTP/1.1'))
+        self.assertEqual(req.path, '/index.html')
+        self.assertDictEqual(req.query, {'a': ['1'], 'b': ['2']})
+        self.assertEqual(req.headers.get('Host'), '0.0.0.0:8000')
+        self.assertEqual(req.headers.get('Connection'), 'keep-alive')
+        self.assertTrue(req.filled)
+        self.assertFalse(req.insufficient())
+
+    def test_resumes_across_partial_reads(self):
+        for i in range(len(POST) - 1):
+            self.assertIsNone(self.parser.feed(POST[i:i + 1]))
+        req = self.parser.feed(POST[-1:])
+        self.assertEqual(req.method, 'POST')
+        self.assertEqual(req.headers.get('Content-Length'), '20')
+        self.assertEqual(self.read_body(req), b'username=me&post=hi!')
+
+    def test_accepts_bare_lf_and_leading_empty_lines(self):
+        req = self.parser.feed(b'\r\nGET / HTTP/1.1\nHost: x\n\n')
+        self.assertEqual(req.path, '/')
+        self.assertEqual(req.headers.get('Host'), 'x')
+
+    def test_keeps_next_request_buffered(self):
+        req = self.parser.feed(POST + GET)
+        self.assertEqual(req.method, 'POST')
+        self.assertEqual(self.read_body(req), b'username=me&post=hi!')
+        req = self.parser.feed()
+        self.assertEqual(req.method, 'GET')
+        self.assertIsNone(self.parser.feed())
+
+    def test_headers_are_latin_1(self):
+        req = self.parser.feed(b'GET / HTTP/1.1\r\nX-Name: caf\xe9\r\n\r\n')
+        self.assertEqual(req.headers.get('X-Name'), 'caf\xe9')
+
+    def test_folded_header(self):
+        req = self.parser.feed(b'GET / HTTP/1.1\r\nX-Long: a\r\n b\r\n\r\n')
+        self.assertEqual(req.headers.get('X-Long'), 'a b')
+
+    def test_malformed_start_line(self):
+        with self.assertRaises(type(Errors.MALFORMED_REQ)) as ctx:
+            self.parser.feed(b'GET /\r\n\r\n')
+        self.assertIs(ctx.exception, Errors.MALFORMED_REQ)
+
+    def test_too_many_headers(self):
+        headers = b''.join(b'X-%d: 1\r\n' % i
+                           for i in range(RequestParser.MAX_HEADERS + 1))
+        with self.assertRaises(type(Errors.TOO_MANY_HEADERS)) as ctx:
+            self.parser.feed(b'GET / HTTP/1.1\r\n' + headers + b'\r\n')
+        self.assertIs(ctx.exception, Errors.TOO_MANY_HEADERS)
+
+    def test_line_too_long(self):
+        with self.assertRaises(type(Errors.REQ_TOO_LONG)) as ctx:
+            self.parser.feed(b'G' * (RequestParser.MAX_LINE + 1))
+        self.assertIs(ctx.exception, Errors.REQ_TOO_LONG)
+
+    def test_streamed_body_is_left_to_the_sink(self):
+        parser = RequestParser(streams=lambda req: req.path == '/up')
+        req = parser.feed(b'POST /up HTTP/1.1\r\nContent-Length: 6\r\n\r\nab')
+        self.assertEqual(req.path, '/up')
+        self.assertIsNone(req.body)
+        self.assertTrue(parser.streaming)
+        self.assertEqual(parser.take_body(10), b'ab')
+
+        parser.sink = sink = BodyStream(4)
+        self.assertIsNone(parser.feed(b'cd'))
+        self.assertEqual(parser.feed(b'efGET / HTTP/1.1\r\n\r\n').path, '/')
+        self.assertEqual(sink.read(), b'cdef')
+        self.assertFalse(parser.streaming)
+
+    def test_bad_content_length(self):
+        with self.assertRaises(type(Errors.CONTENT_LENGTH_REQUIRED)):
+            self.parser.feed(b'POST / HTTP/1.1\r\nContent-Length: x\r\n\r\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
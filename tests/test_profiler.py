@@ -0,0 +1,126 @@
+import json
+import os
+import pstats
+import signal
+import socket
+import tempfile
+import time
+import unittest
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.profiler import Profiler
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import get_config
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+class ProfilerTests(unittest.TestCase):
+    def test_sampling_by_route(self):
+        profiler = Profiler(sample_rate=1, routes=['/a'])
+        trace = profiler.begin()
+        profiler.sample(trace, '/a')
+        self.assertTrue(trace.profile)
+        trace = profiler.begin()
+        profiler.sample(trace, '/b')
+        self.assertFalse(trace.profile)
+
+        profiler = Profiler(sample_rate=0)
+        trace = profiler.begin()
+        profiler.sample(trace, '/a')
+        self.assertFalse(trace.profile)
+
+    def test_profiles_are_aggregated_per_route(self):
+        profiler = Profiler(sample_rate=1)
+        for _ in range(3):
+            trace = profiler.begin()
+            profiler.sample(trace, '/[name].html')
+            self.assertEqual(profiler.call(trace, busy, 1000),
+                             busy(1000))
+        self.assertEqual(profiler.samples, {'/[name].html': 3})
+        with tempfile.TemporaryDirectory() as directory:
+            [path] = profiler.dump(directory)
+            self.assertTrue(path.endswith('-name_.html.pstats'))
+            stats = pstats.Stats(path)
+            calls = [v[1] for k, v in stats.stats.items() if k[2] == 'busy']
+            self.assertEqual(calls, [3])
+
+    def test_dump_signal_while_aggregating(self):
+        previous = signal.getsignal(signal.SIGUSR1)
+        self.addCleanup(signal.signal, signal.SIGUSR1, previous)
+        with tempfile.TemporaryDirectory() as directory:
+            profiler = Profiler(sample_rate=1, dump_dir=directory,
+                                dump_signal=signal.SIGUSR1)
+            profiler.install()
+            trace = profiler.begin()
+            profiler.sample(trace, '/a')
+            profiler.call(trace, busy, 10)
+            # the signal arrives while _add holds the lock
+            with profiler._lock:
+                os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(profiler.dump_pending)
+            self.assertFalse(os.listdir(directory))
+            profiler.tick()
+            self.assertFalse(profiler.dump_pending)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_slow_requests(self):
+        class Req:
+            method, path = 'GET', '/x'
+
+        profiler = Profiler(slow_threshold=0.01)
+        trace = profiler.begin()
+        profiler.sample(trace, None)
+        profiler.finish(trace, Req, 200)
+        self.assertFalse(profiler.slow)
+
+        trace = profiler.begin()
+        time.sleep(0.02)
+        trace.mark('handler')
+        profiler.finish(trace, Req, 200)
+        [record] = profiler.slow
+        self.assertEqual(record['route'], '<unmatched>')
+        self.assertEqual(list(record['phases_ms']), ['handler', 'respond'])
+        self.assertGreaterEqual(record['phases_ms']['handler'], 20)
+
+
+class ServerProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.tf = tempfile.NamedTemporaryFile(mode='w', delete=True)
+        with open(self.tf.name, 'w') as f:
+            f.write(get_config())
+
+    def test_server_traces_requests(self):
+        log = f'{self.tf.name}.slow.log'
+        profiler = Profiler(sample_rate=1, slow_threshold=0, slow_log=log)
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE, profiler=profiler)
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        peer.sendall(b'GET /2.html HTTP/1.1\r\nHost: x\r\n'
+                     b'Connection: close\r\n\r\n')
+        server._read(ours)
+        peer.close()
+        profiler.close()
+        try:
+            with open(log) as f:
+                [record] = [json.loads(line) for line in f]
+        finally:
+            os.unlink(log)
+
+        self.assertEqual(profiler.samples, {'/2.html': 1})
+        self.assertEqual((record['route'], record['status']), ('/2.html', 200))
+        self.assertEqual(list(record['phases_ms']),
+                         ['route', 'queue', 'handler', 'compress', 'respond'])
+
+    def test_off_by_default(self):
+        server = Server(configurator=Configurator(self.tf.name),
+                        loglevel=LogLevel.CONSOLE)
+        self.assertIsNone(server.profiler)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.requests.request import Request
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import TEST_DATA_DIR, write_config
+
+HANDLER = '''from ihttpy.requests.response import Response
+
+
+def version(req, server):
+    return Response(200, 'OK', [('Content-Length', {size})], b'{body}')
+'''
+
+
+class ReloadTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_path, self.config = write_config()
+        self.address = (self.config['_host'], self.config['_port'])
+        self.dir = tempfile.TemporaryDirectory()
+        self.handler = os.path.join(self.dir.name, 'versioned.py')
+        self.write_handler('v1')
+
+    def tearDown(self):
+        self.dir.cleanup()
+        os.unlink(self.cfg_path)
+
+    def write_handler(self, body):
+        stat = os.stat(self.handler) if os.path.exists(self.handler) \
+            else None
+        with open(self.handler, 'w') as f:
+            f.write(HANDLER.format(size=len(body), body=body))
+        if stat:
+            # a rewrite within the mtime granularity still has to show
+            os.utime(self.handler, ns=(stat.st_atime_ns,
+                                       stat.st_mtime_ns + 1000))
+
+    def write_rules(self, **rules):
+        config = dict(self.config)
+        config['rules'] = dict(config['rules'], **rules)
+        with open(self.cfg_path, 'w') as f:
+            json.dump(config, f)
+
+    def versioned(self):
+        return {'handler': {'source': self.handler, 'GET': 'version'}}
+
+    def get(self, server, path):
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        peer.sendall(f'GET {path} HTTP/1.1\r\nHost: x\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        server._read(ours)
+        peer.settimeout(1)
+        received = b''
+        while True:
+            chunk = peer.recv(Server.MAX_LINE)
+            if not chunk:
+                break
+            received += chunk
+        peer.close()
+        return received
+
+    def test_refresh_replaces_rules(self):
+        configurator = Configurator(self.cfg_path)
+        rules = configurator._get_rules()
+        self.assertIn('/index.html', rules)
+        self.config['rules'] = {'/only': 'index.html'}
+        self.write_rules()
+        configurator.refresh()
+        self.assertEqual(list(configurator._get_rules()), ['/only'])
+        # the rules handed out before are left as they were
+        self.assertIn('/index.html', rules)
+
+    def test_swap_routes(self):
+        server = Server(Configurator(self.cfg_path),
+                        loglevel=LogLevel.CONSOLE)
+        self.assertNotIn(b'200 OK', self.get(server, '/fresh'))
+        old_router = server.router
+
+        self.write_rules(**{
+            '/fresh': os.path.join(TEST_DATA_DIR, 'index.html'),
+            '/version': self.versioned()})
+        server._build_routes()
+        # nothing changes until the loop swaps the routes in
+        self.assertIs(server.router, old_router)
+        server._swap_routes()
+        self.assertIn(b'200 OK', self.get(server, '/fresh'))
+        self.assertTrue(self.get(server, '/version').endswith(b'v1'))
+
+        handlers = dict(server.router.handlers)
+        self.write_handler('v2')
+        server._build_routes()
+        server._swap_routes()
+        self.assertTrue(self.get(server, '/version').endswith(b'v2'))
+        for path, module in handlers.items():
+            if path != self.handler:
+                self.assertIs(server.router.handlers[path], module)
+
+    def test_request_in_flight_keeps_its_routes(self):
+        server = Server(Configurator(self.cfg_path),
+                        loglevel=LogLevel.CONSOLE)
+        first = os.path.join(self.dir.name, 'first.txt')
+        with open(first, 'w') as f:
+            f.write('first.txt')
+        self.write_rules(**{'/moved': first})
+        server._build_routes()
+        server._swap_routes()
+
+        req = Request.fill_from_line(
+            b'GET /moved HTTP/1.1\r\nHost: x\r\n\r\n')
+        _, handle = server.find_route(req)
+        old = req.routes
+        table = old.router.table
+        # the reload lands while the handler is on an executor thread
+        self.write_rules(**{'/moved': os.path.join(TEST_DATA_DIR,
+                                                   'index.html')})
+        server._build_routes()
+        server._swap_routes()
+        new_table = server.router.table
+
+        res = handle(req, server)
+        self.assertEqual(bytes(res.body), b'first.txt')
+        # neither table was compiled again
+        self.assertIs(old.router.table, table)
+        self.assertIs(server.router.table, new_table)
+
+    def test_swap_drops_cached_responses(self):
+        server = Server(Configurator(self.cfg_path),
+                        loglevel=LogLevel.CONSOLE, cache_max_size=1e6)
+        self.addCleanup(server.cache.close)
+        first = os.path.join(self.dir.name, 'first.txt')
+        second = os.path.join(self.dir.name, 'second.txt')
+        for path in (first, second):
+            with open(path, 'w') as f:
+                f.write(os.path.basename(path))
+        self.write_rules(**{'/moved': first})
+        server._build_routes()
+        server._swap_routes()
+        self.assertTrue(self.get(server, '/moved').endswith(b'first.txt'))
+        self.assertEqual(len(server.cache.l2), 1)
+
+        self.write_rules(**{'/moved': second})
+        server._build_routes()
+        # the disk is cleared by the reload thread, not by the loop
+        self.assertEqual(len(server.cache.l2), 0)
+        server._swap_routes()
+        self.assertTrue(self.get(server, '/moved').endswith(b'second.txt'))
+
+    def test_broken_config_keeps_the_old_one(self):
+        server = Server(Configurator(self.cfg_path),
+                        loglevel=LogLevel.CONSOLE)
+        with open(self.cfg_path, 'w') as f:
+            f.write('{"rules": ')
+        server._build_routes()
+        self.assertFalse(server.reloaded)
+        self.assertIn(b'200 OK', self.get(server, '/index.html'))
+
+    def test_watch(self):
+        server = Server(Configurator(self.cfg_path),
+                        loglevel=LogLevel.LOGGING, watch_interval=0.05)
+        server.__enter__()
+        loop = threading.Thread(target=server.run)
+        loop.start()
+        try:
+            time.sleep(0.1)
+            self.write_rules(**{'/version': self.versioned()})
+            deadline = time.monotonic() + 5
+            while True:
+                with socket.create_connection(self.address, 1) as conn:
+                    conn.sendall(b'GET /version HTTP/1.1\r\nHost: x\r\n'
+                                 b'Connection: close\r\n\r\n')
+                    received = b''
+                    while not received.endswith(b'v1'):
+                        chunk = conn.recv(Server.MAX_LINE)
+                        if not chunk:
+                            break
+                        received += chunk
+                if received.endswith(b'v1') or time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            self.assertTrue(received.endswith(b'v1'))
+        finally:
+            server.shutdown()
+            loop.join()
+            server.__exit__(None, None, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,8 @@ import tempfile
 import unittest
 
 from ihttpy.requests.request import Request
-from ihttpy.requests.response import Response
+from ihttpy.requests.response import FileBody, Response, ChunkedTransfer, \
+    MultiBody
 
 
 class SockMock:
@@ -73,7 +74,7 @@ class TestResponse(unittest.TestCase):
         self.assertEqual(res.status, 206)
         self.assertEqual(res.reason, 'Partial Content')
         self.assertEqual(res.headers.get('Content-Length'), 10)
-        self.assertEqual(res.body, b'0123456789')
+        self.assertEqual(bytes(res.body), b'0123456789')
 
     def test_range_res_no_start(self):
         req = Request()
@@ -86,7 +87,7 @@ class TestResponse(unittest.TestCase):
         self.assertEqual(res.status, 206)
         self.assertEqual(res.reason, 'Partial Content')
         self.assertEqual(res.headers.get('Content-Length'), 2)
-        self.assertEqual(res.body, b'89')
+        self.assertEqual(bytes(res.body), b'89')
 
     def test_range_res_no_end(self):
         req = Request()
@@ -99,7 +100,183 @@ class TestResponse(unittest.TestCase):
         self.assertEqual(res.status, 206)
         self.assertEqual(res.reason, 'Partial Content')
         self.assertEqual(res.headers.get('Content-Length'), 1)
-        self.assertEqual(res.body, b'9')
+        self.assertEqual(bytes(res.body), b'9')
+
+    def test_file_body_sent_with_sendfile(self):
+        file = tempfile.NamedTemporaryFile(mode='w+b')
+        file.write(b'0123456789' * 10000)
+        file.flush()
+        body = FileBody(file.name, 5, 99990)
+        self.assertEqual(len(body), 99990)
+
+        ours, peer = socket.socketpair()
+        transfer = body.open()
+        received = b''
+        with ours, peer:
+            while transfer.remaining:
+                transfer.send(ours)
+                received += peer.recv(len(body))
+            transfer.close()
+            while len(received) < len(body):
+                received += peer.recv(len(body))
+        self.assertEqual(received, bytes(body))
+        self.assertTrue(received.startswith(b'56789'))
+        self.assertTrue(received.endswith(b'01234'))
+
+    def test_file_body_copy_fallback(self):
+        file = tempfile.NamedTemporaryFile(mode='w+b')
+        file.write(b'0123456789')
+        file.flush()
+        sock = SockMock()
+        transfer = FileBody(file.name, 2, 3).open()
+        while transfer.remaining:
+            transfer.send(sock)
+        transfer.close()
+        self.assertEqual(b''.join(sock.received), b'234')
+
+    def test_chunked_transfer_pulls_lazily(self):
+        produced = []
+
+        def chunks():
+            for data in (b'hello', b'', 'world'):
+                produced.append(data)
+                yield data
+
+        sock = SockMock()
+        transfer = ChunkedTransfer(chunks())
+        transfer.send(sock)
+        self.assertEqual(produced, [b'hello'])
+        while transfer.remaining:
+            transfer.send(sock)
+        self.assertEqual(b''.join(sock.received),
+                         b'5\r\nhello\r\n5\r\nworld\r\n0\r\n\r\n')
+
+    def test_stream_response_to_bytes(self):
+        res = Response(200, 'OK', [('Content-Length', 10)],
+                       iter([b'ab', b'c']))
+        self.assertTrue(res.is_stream())
+        data = res.to_bytes()
+        self.assertNotIn(b'Content-Length', data)
+        self.assertIn(b'Transfer-Encoding: chunked\r\n', data)
+        self.assertTrue(data.endswith(b'\r\n\r\n2\r\nab\r\n'
+                                      b'1\r\nc\r\n0\r\n\r\n'))
+        self.assertFalse(Response(200, 'OK', body=b'ab').is_stream())
+
+    def make_file(self, data=b'0123456789'):
+        file = tempfile.NamedTemporaryFile(mode='w+b')
+        file.write(data)
+        file.flush()
+        return file
+
+    def test_file_res_has_validators(self):
+        file = self.make_file()
+        res = Response.build_file_res(Request(), file.name, 'text/html')
+        self.assertTrue(res.headers.get('ETag').startswith('"'))
+        self.assertTrue(res.headers.get('Last-Modified').endswith('GMT'))
+
+    def range_res(self, value, **headers):
+        file = self.make_file()
+        req = Request()
+        req.headers['Range'] = value
+        req.headers.update(headers)
+        return Response.build_file_res(req, file.name, 'text/plain'), file
+
+    def test_range_end_is_inclusive(self):
+        res, _ = self.range_res('bytes=2-4')
+        self.assertEqual(res.status, 206)
+        self.assertEqual(bytes(res.body), b'234')
+        self.assertEqual(res.headers['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(res.headers['Content-Length'], 3)
+
+    def test_unsatisfiable_range(self):
+        res, _ = self.range_res('bytes=10-20')
+        self.assertEqual(res.status, 416)
+        self.assertEqual(res.headers['Content-Range'], 'bytes */10')
+
+    def test_invalid_range_is_ignored(self):
+        for value in ('bytes=4-2', 'items=0-1', 'bytes=a-b', 'bytes=,'):
+            res, _ = self.range_res(value)
+            self.assertEqual(res.status, 200, value)
+            self.assertEqual(len(res.body), 10)
+
+    def test_multiple_ranges(self):
+        res, _ = self.range_res('bytes=0-1, 20-30, -2')
+        self.assertEqual(res.status, 206)
+        content_type = res.headers['Content-Type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; '))
+        boundary = content_type.split('boundary=')[1]
+        self.assertIsInstance(res.body, MultiBody)
+        body = bytes(res.body)
+        self.assertEqual(res.headers['Content-Length'], len(body))
+        self.assertEqual(body, (
+            f'--{boundary}\r\nContent-Type: text/plain\r\n'
+            f'Content-Range: bytes 0-1/10\r\n\r\n01\r\n'
+            f'--{boundary}\r\nContent-Type: text/plain\r\n'
+            f'Content-Range: bytes 8-9/10\r\n\r\n89\r\n'
+            f'--{boundary}--\r\n').encode())
+
+    def test_if_range(self):
+        res, file = self.range_res('bytes=0-1')
+        etag = res.headers['ETag']
+        last_modified = res.headers['Last-Modified']
+        req = Request()
+        for if_range, status in ((etag, 206), ('"other"', 200),
+                                 (f'W/{etag}', 200), (last_modified, 206),
+                                 ('Thu, 01 Jan 1970 00:00:00 GMT', 200)):
+            req.headers = {'Range': 'bytes=0-1', 'If-Range': if_range}
+            res = Response.build_file_res(req, file.name, 'text/plain')
+            self.assertEqual(res.status, status, if_range)
+
+    def test_file_body_views_share_a_map(self):
+        file = self.make_file()
+        FileBody.MAPS.clear()
+        self.assertEqual(bytes(FileBody(file.name, 1, 2)), b'12')
+        self.assertEqual(FileBody(file.name, 8, 2).view().tobytes(), b'89')
+        self.assertEqual(len(FileBody.MAPS.maps), 1)
+
+    def test_if_none_match_gives_not_modified(self):
+        file = self.make_file()
+        res = Response.build_file_res(Request(), file.name, 'text/html')
+        req = Request()
+        req.method = 'GET'
+        req.headers['If-None-Match'] = f'"x", W/{res.headers["ETag"]}'
+
+        res = Response.build_file_res(req, file.name, 'text/html')
+
+        self.assertEqual(res.status, 304)
+        self.assertIsNone(res.body)
+        self.assertNotIn('Content-Length', res.headers)
+        self.assertTrue(res.to_bytes().endswith(b'\r\n\r\n'))
+
+    def test_if_none_match_changed_file(self):
+        file = self.make_file()
+        req = Request()
+        req.method = 'GET'
+        req.headers['If-None-Match'] = '"0-0"'
+        res = Response.build_file_res(req, file.name, 'text/html')
+        self.assertEqual(res.status, 200)
+
+    def test_if_modified_since(self):
+        file = self.make_file()
+        res = Response.build_file_res(Request(), file.name, 'text/html')
+        req = Request()
+        req.method = 'GET'
+        req.headers['If-Modified-Since'] = res.headers['Last-Modified']
+        self.assertEqual(
+            Response.build_file_res(req, file.name, 'text/html').status, 304)
+        req.headers['If-Modified-Since'] = 'Thu, 01 Jan 1970 00:00:00 GMT'
+        self.assertEqual(
+            Response.build_file_res(req, file.name, 'text/html').status, 200)
+
+    def test_if_none_match_wins_over_if_modified_since(self):
+        file = self.make_file()
+        res = Response.build_file_res(Request(), file.name, 'text/html')
+        req = Request()
+        req.method = 'GET'
+        req.headers['If-None-Match'] = '"other"'
+        req.headers['If-Modified-Since'] = res.headers['Last-Modified']
+        self.assertEqual(
+            Response.build_file_res(req, file.name, 'text/html').status, 200)
 
 
 if __name__ == '__main__':
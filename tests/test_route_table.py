@@ -0,0 +1,83 @@
+import os
+import re
+import unittest
+from tempfile import NamedTemporaryFile
+
+from ihttpy.routing.configurator import Configurator
+from ihttpy.routing.page import Page
+from ihttpy.routing.router import Router
+from ihttpy.routing.table import RouteTable, to_pattern
+from tests.defenitions_for_test import get_config
+
+
+def linear_matches(url, rules):
+    for i, key in enumerate(rules):
+        m = re.fullmatch(to_pattern(key), url)
+        if m:
+            yield i, m.groupdict()
+
+
+class RouteTableTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_file = NamedTemporaryFile(delete=False)
+        self.cfg_file.write(get_config().encode())
+        self.cfg_file.close()
+        self.rules = Configurator(self.cfg_file.name)._get_rules()
+
+    def tearDown(self):
+        os.unlink(self.cfg_file.name)
+
+    def test_same_matches_as_linear_scan(self):
+        table = RouteTable(self.rules)
+        urls = ['/', '/index.html', '/2.html', '/any.html', '/123.css',
+                '/1.2.3.txt', '/c.png', '/favicon.ico', '/pictures/png/1',
+                '/27-me/09/2000', '/11/11/2019', '/mime/', '/big',
+                '/page-load-errors1.css', '/png/1.png', '/no/such/page',
+                '/a.b.c', '/posts', '/post', '/%2E%2E/secret']
+        for url in urls:
+            self.assertListEqual(list(table.matches(url)),
+                                 list(linear_matches(url, self.rules)), url)
+
+    def test_pattern_declared_first_shadows_literal(self):
+        rules = {'/[name].html': Page('a', {}),
+                 '/index.html': Page('b', {})}
+        table = RouteTable(rules)
+        self.assertEqual(table.match('/index.html'), (0, {'name': 'index'}))
+        self.assertListEqual([i for i, _ in table.matches('/index.html')],
+                             [0, 1])
+
+    def test_cache_is_bounded(self):
+        table = RouteTable(self.rules, cache_size=8)
+        for i in range(100):
+            table.match(f'/{i}.html')
+        self.assertEqual(len(table.cache), 8)
+
+    def test_router_recompiles_changed_rules(self):
+        router = Router()
+        rules = {'/a': Page('a', {})}
+        self.assertEqual(router.find_page_description('/a', rules).path, 'a')
+        rules['/b'] = Page('b', {})
+        self.assertEqual(router.find_page_description('/b', rules).path, 'b')
+
+    def test_large_table(self):
+        rules = {}
+        for i in range(2000):
+            rules[f'/static/{i}/[name].[ext]'] = Page(f'{i}', {})
+            rules[f'/literal/{i}'] = Page(f'l{i}', {})
+        table = RouteTable(rules, cache_size=0)
+        self.assertEqual(table.match('/static/1999/a.png'),
+                         (3998, {'name': 'a', 'ext': 'png'}))
+        self.assertEqual(table.match('/literal/1999'), (3999, {}))
+        self.assertIsNone(table.match('/static/x'))
+
+        self.assertLess(len(table.candidates('/static/1999/a.png')), 3)
+
+    def test_prefix_stops_before_optional_char(self):
+        rules = {'/ab?c': Page('a', {}), '/x|/y': Page('b', {})}
+        table = RouteTable(rules)
+        self.assertEqual(table.match('/ac'), (0, {}))
+        self.assertEqual(table.match('/y'), (1, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
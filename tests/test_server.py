@@ -1,6 +1,8 @@
 import io
 import json
 import os
+import re
+import selectors
 import socket
 import tempfile
 import time
@@ -135,6 +137,157 @@ class ServerTests(unittest.TestCase):
         def sendall(self, data):
             self.recvd += data
 
+    def test_send_does_not_block_on_full_socket(self):
+        server = self.make_server()
+        ours, peer = socket.socketpair()
+        ours.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        server._register(ours)
+        num = ours.fileno()
+        body = b'x' * 1024 * 1024
+
+        server.send(ours, Response(200, 'OK',
+                                   [('Content-Length', len(body))], body))
+
+        self.assertTrue(server.out_buff[num])
+        key = server.poller.get_key(ours)
+        self.assertTrue(key.events & selectors.EVENT_WRITE)
+
+        received = b''
+        peer.settimeout(1)
+        while not received.endswith(body):
+            received += peer.recv(Server.MAX_LINE)
+            server._write(ours)
+        self.assertTrue(received.startswith(b'HTTP/1.1 200 OK\r\n'))
+        self.assertFalse(server.out_buff[num])
+        key = server.poller.get_key(ours)
+        self.assertEqual(key.events, selectors.EVENT_READ)
+        server.close(ours)
+        peer.close()
+        self.assertNotIn(num, server.out_buff)
+
+    def test_idle_connection_is_reaped(self):
+        cfg = Configurator(self.cfg_path)
+        server = Server(configurator=cfg, loglevel=LogLevel.CONSOLE,
+                        keep_alive_timeout=1)
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        num = ours.fileno()
+
+        for expired in server.timers.advance(time.monotonic() + 0.5):
+            server._expire(expired)
+        self.assertIn(num, server.conns)
+        for expired in server.timers.advance(time.monotonic() + 2):
+            server._expire(expired)
+
+        self.assertNotIn(num, server.conns)
+        self.assertNotIn(num, server.requests)
+        self.assertNotIn(num, server.out_buff)
+        peer.settimeout(1)
+        self.assertEqual(peer.recv(1), b'')
+        peer.close()
+
+    def test_max_keep_alive_requests(self):
+        cfg = Configurator(self.cfg_path)
+        server = Server(configurator=cfg, loglevel=LogLevel.CONSOLE,
+                        max_keep_alive_requests=2)
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        num = ours.fileno()
+        req = b'GET /index.html HTTP/1.1\r\nHost: x\r\n\r\n'
+
+        peer.sendall(req)
+        server._read(ours)
+        self.assertIn(num, server.conns)
+        peer.sendall(req)
+        server._read(ours)
+
+        self.assertNotIn(num, server.conns)
+        peer.settimeout(1)
+        received = b''
+        while True:
+            chunk = peer.recv(Server.MAX_LINE)
+            if not chunk:
+                break
+            received += chunk
+        self.assertEqual(received.count(b'HTTP/1.1 200 OK'), 2)
+        self.assertEqual(received.count(b'Connection: close'), 1)
+        peer.close()
+
+    def test_pipelined_requests_answered_in_order(self):
+        cfg = Configurator(self.cfg_path)
+        server = Server(configurator=cfg, loglevel=LogLevel.CONSOLE)
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        peer.sendall(b'GET /index.html HTTP/1.1\r\nHost: x\r\n\r\n'
+                     b'GET /missing_page HTTP/1.1\r\nHost: x\r\n\r\n'
+                     b'GET /index.html HTTP/1.1\r\nHost: x\r\n'
+                     b'Connection: close\r\n\r\n'
+                     b'GET /index.html HTTP/1.1\r\nHost: x\r\n\r\n')
+        server._read(ours)
+
+        peer.settimeout(1)
+        received = b''
+        while True:
+            chunk = peer.recv(Server.MAX_LINE)
+            if not chunk:
+                break
+            received += chunk
+        statuses = re.findall(rb'HTTP/1\.1 (\d{3}) ', received)
+        self.assertEqual(statuses[0], b'200')
+        self.assertNotEqual(statuses[1], b'200')
+        self.assertEqual(statuses[2], b'200')
+        # nothing is answered after the connection asked to be closed
+        self.assertEqual(len(statuses), 3)
+        peer.close()
+
+    def stream(self, request):
+        cfg = Configurator(self.cfg_path)
+        server = Server(configurator=cfg, loglevel=LogLevel.CONSOLE)
+        ours, peer = socket.socketpair()
+        server._register(ours)
+        peer.sendall(request)
+        server._read(ours)
+        peer.settimeout(1)
+        received = b''
+        try:
+            while not received.endswith(b'0\r\n\r\n'):
+                chunk = peer.recv(Server.MAX_LINE)
+                if not chunk:
+                    break
+                received += chunk
+        finally:
+            peer.close()
+        return received.split(b'\r\n\r\n', 1)
+
+    def test_generator_body_is_chunked(self):
+        head, body = self.stream(
+            b'GET /stream?n=12 HTTP/1.1\r\nHost: x\r\n\r\n')
+        self.assertIn(b'Transfer-Encoding: chunked', head)
+        self.assertNotIn(b'Content-Length', head)
+        self.assertTrue(body.startswith(b'2\r\n0\n\r\n'))
+        self.assertIn(b'3\r\n11\n\r\n', body)
+        self.assertTrue(body.endswith(b'0\r\n\r\n'))
+
+    def test_generator_body_for_http10_closes(self):
+        head, body = self.stream(
+            b'GET /stream?n=3 HTTP/1.0\r\nHost: x\r\n\r\n')
+        self.assertNotIn(b'Transfer-Encoding', head)
+        self.assertIn(b'Connection: close', head)
+        self.assertEqual(body, b'0\n1\n2\n')
+
+    def test_multiple_ranges_sent(self):
+        head, body = self.stream(
+            b'GET /1.2.3.txt HTTP/1.1\r\nHost: x\r\n'
+            b'Range: bytes=0-0,-1\r\nConnection: close\r\n\r\n')
+        self.assertIn(b'206 Partial Content', head)
+        length = int(re.search(rb'Content-Length: (\d+)', head).group(1))
+        self.assertEqual(len(body), length)
+        self.assertTrue(body.endswith(b'--\r\n'))
+        with open(os.path.join(TEST_DATA_DIR, '1.2.3.txt'), 'rb') as f:
+            data = f.read()
+        self.assertIn(b'\r\n\r\n' + data[:1] + b'\r\n', body)
+        self.assertIn(b'\r\n\r\n' + data[-1:] + b'\r\n', body)
+
     def test_get_picture(self):
         req_line = b'GET /c.png HTTP/1.1\r\n' \
                    b'Host: 0.0.0.0\r\n' \
@@ -143,7 +296,23 @@ class ServerTests(unittest.TestCase):
         req = Request.fill_from_line(req_line)
         res: Response = server.handle_req(req)
         with open(os.path.join(TEST_DATA_DIR, 'c.png'), 'rb') as pic:
-            self.assertEqual(res.body, pic.read())
+            self.assertEqual(bytes(res.body), pic.read())
+
+    def test_cached_picture_not_modified(self):
+        server = self.make_server()
+        req_line = b'GET /c.png HTTP/1.1\r\nHost: 0.0.0.0\r\n\r\n'
+        res: Response = server.handle_req(Request.fill_from_line(req_line))
+        etag = res.headers.get('ETag')
+
+        req = Request.fill_from_line(
+            b'GET /c.png HTTP/1.1\r\nHost: 0.0.0.0\r\n'
+            b'If-None-Match: ' + etag.encode() + b'\r\n\r\n')
+        res = server.handle_req(req)
+
+        self.assertEqual(res.status, 304)
+        self.assertEqual(res.headers.get('ETag'), etag)
+        self.assertIsNone(res.body)
+        self.assertEqual(server.cache.hits, 1)
 
     # todo rewrite handler to save to specific
     # def test_show_files(self):
@@ -0,0 +1,41 @@
+import unittest
+
+from ihttpy.timers import TimerWheel
+
+
+class TimerWheelTests(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimerWheel(tick=1, slots=8)
+
+    def test_expires_after_timeout(self):
+        self.wheel.touch('a', 3, now=0)
+        self.assertListEqual(self.wheel.advance(2.5), [])
+        self.assertListEqual(self.wheel.advance(3), ['a'])
+        self.assertNotIn('a', self.wheel)
+
+    def test_touch_postpones(self):
+        self.wheel.touch('a', 3, now=0)
+        self.wheel.touch('a', 3, now=2)
+        self.assertListEqual(self.wheel.advance(4), [])
+        self.assertListEqual(self.wheel.advance(5), ['a'])
+
+    def test_timeout_longer_than_wheel(self):
+        self.wheel.touch('a', 20, now=0)
+        for now in range(1, 20):
+            self.assertListEqual(self.wheel.advance(now), [])
+        self.assertListEqual(self.wheel.advance(20), ['a'])
+
+    def test_cancel(self):
+        self.wheel.touch('a', 1, now=0)
+        self.wheel.cancel('a')
+        self.assertListEqual(self.wheel.advance(5), [])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_long_pause_expires_everything_due(self):
+        for i in range(10):
+            self.wheel.touch(i, i + 1, now=0)
+        self.assertListEqual(sorted(self.wheel.advance(100)), list(range(10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
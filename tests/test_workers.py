@@ -0,0 +1,134 @@
+import json
+import os
+import signal
+import socket
+import time
+import unittest
+
+from ihttpy.exceptions.logger import LogLevel
+from ihttpy.httpserver import Server
+from ihttpy.routing.configurator import Configurator
+from tests.defenitions_for_test import write_config
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'fork is required')
+class WorkersTests(unittest.TestCase):
+    def setUp(self):
+        self.cfg_path, config = write_config()
+        self.port = config['_port']
+
+    def tearDown(self):
+        os.unlink(self.cfg_path)
+
+    def start_master(self, **kwargs):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                server = Server(Configurator(self.cfg_path),
+                                loglevel=LogLevel.LOGGING, **kwargs)
+                with server as s:
+                    s.run()
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        return pid
+
+    def get(self, path='/'):
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                conn = socket.create_connection(('127.0.0.1', self.port), 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        with conn:
+            conn.sendall(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+                         f'Connection: close\r\n\r\n'.encode())
+            return conn.recv(Server.MAX_LINE)
+
+    def stop_master(self, pid):
+        os.kill(pid, signal.SIGTERM)
+        _, status = os.waitpid(pid, 0)
+        self.assertTrue(os.WIFEXITED(status))
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+    def worker_pid(self):
+        return int(self.get('/pid').split(b'\r\n\r\n', 1)[1])
+
+    def test_workers_serve_requests(self):
+        pid = self.start_master(workers=2)
+        try:
+            for _ in range(4):
+                self.assertTrue(self.get().startswith(b'HTTP/1.1 200 OK'))
+        finally:
+            self.stop_master(pid)
+
+    def test_dead_worker_is_replaced(self):
+        pid = self.start_master(workers=2)
+        try:
+            deadline = time.monotonic() + 10
+            workers = set()
+            while len(workers) < 2:
+                workers.add(self.worker_pid())
+                self.assertLess(time.monotonic(), deadline)
+            dead = workers.pop()
+            os.kill(dead, signal.SIGKILL)
+            while True:
+                try:
+                    if self.worker_pid() not in workers | {dead}:
+                        break
+                except OSError:
+                    pass
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.05)
+        finally:
+            self.stop_master(pid)
+
+    @unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'),
+                         'SO_REUSEPORT is required')
+    def test_workers_with_reuse_port(self):
+        pid = self.start_master(workers=2, reuse_port=True)
+        try:
+            for _ in range(4):
+                self.assertTrue(self.get().startswith(b'HTTP/1.1 200 OK'))
+        finally:
+            self.stop_master(pid)
+
+    def test_sighup_reloads_without_dropping_connections(self):
+        pid = self.start_master(workers=2, hot_reload=True)
+        try:
+            self.get()
+            conn = socket.create_connection(('127.0.0.1', self.port), 5)
+            with conn:
+                request = (b'GET /fresh HTTP/1.1\r\nHost: localhost\r\n'
+                           b'\r\n')
+                conn.sendall(request)
+                self.assertFalse(conn.recv(Server.MAX_LINE)
+                                 .startswith(b'HTTP/1.1 200 OK'))
+                with open(self.cfg_path) as f:
+                    config = json.load(f)
+                config['rules']['/fresh'] = config['rules']['/index.html']
+                with open(self.cfg_path, 'w') as f:
+                    json.dump(config, f)
+                os.kill(pid, signal.SIGHUP)
+
+                deadline = time.monotonic() + 5
+                while True:
+                    conn.sendall(request)
+                    head = conn.recv(Server.MAX_LINE)
+                    if head.startswith(b'HTTP/1.1 200 OK') or \
+                            time.monotonic() > deadline:
+                        break
+                    time.sleep(0.05)
+                # the same keep-alive connection got the new rule
+                self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        finally:
+            self.stop_master(pid)
+
+
+if __name__ == '__main__':
+    unittest.main()